@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Disk use and startup cost of idle users in hot files versus cold storage segments.
+
+Generates users who completed onboarding and went quiet, ages their files past the
+archive threshold, then archives them. Reports hot and cold sizes (with the size the
+same records would take compressed one by one without the shared dictionary), store
+startup time before and after, and the latency of restoring a returning user.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_cold_storage.py [--users 20000]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.conversation_store import ConversationStore
+
+QUESTIONS = [
+    "hey! 👋 I'm Olivia from Series. so now I'll ask u a few Qs to create ur acct. what's ur full name?",
+    "nice to meet u {name}! what's ur email? if ur a student, ur school email works best 📚",
+    "got it! now tell me a bit about urself, like \"student @UCLA running a tech startup\"",
+    "love that. what are 3 types of people u know? e.g. \"tech founders in SF\"",
+    "and who do u want to meet? the more specific the better!",
+    "awesome, ur all set! we'll text u when we find someone u should meet 🙌",
+]
+NAMES = ["Ava Chen", "Noah Patel", "Mia Johnson", "Liam Garcia", "Zoe Kim", "Ethan Brown", "Sofia Rossi", "Leo Nguyen"]
+SCHOOLS = ["UCLA", "Stanford", "MIT", "NYU", "Berkeley", "CMU", "Georgia Tech", "UT Austin"]
+TOPICS = ["climate tech", "fintech", "AI tooling", "consumer social", "biotech", "edtech", "robotics", "creator economy"]
+
+
+def generate(store: ConversationStore, users: int) -> None:
+    """Write onboarding conversations for idle users."""
+    rng = random.Random(7)
+    started = datetime.datetime(2025, 1, 1)
+    for i in range(users):
+        user_id = f"user_{i:06d}"
+        name, school, topic = rng.choice(NAMES), rng.choice(SCHOOLS), rng.choice(TOPICS)
+        answers = [
+            name, f"{name.split()[0].lower()}{i}@{school.lower().replace(' ', '')}.edu",
+            f"{rng.choice(['junior', 'senior', 'grad student'])} @{school} building a {topic} startup",
+            f"{topic} founders, {rng.choice(SCHOOLS)} engineers, and VCs in {rng.choice(['SF', 'NYC', 'LA'])}",
+            f"people working on {rng.choice(TOPICS)} who have raised a seed round",
+            "thanks!!",
+        ]
+        profile = store.get_profile(user_id)
+        profile.name, profile.bio = name, answers[2]
+        timestamp = started + datetime.timedelta(minutes=i)
+        for question, answer in zip(QUESTIONS, answers):
+            profile.conversation_history.append({"role": "assistant", "content": question.format(name=name.split()[0]), "timestamp": timestamp})
+            timestamp += datetime.timedelta(seconds=40)
+            profile.conversation_history.append({"role": "user", "content": answer, "timestamp": timestamp})
+        profile.onboarding_step, profile.onboarding_complete = 11, True
+        store.save_profile(user_id)
+
+
+def age_files(data_dir: str, days: int) -> None:
+    """Backdate every profile header so its user counts as idle."""
+    old = time.time() - days * 86400
+    for root, _, files in os.walk(data_dir):
+        for name in files:
+            if name.endswith(".json"):
+                os.utime(os.path.join(root, name), (old, old))
+
+
+def startup(data_dir: str) -> float:
+    start = time.perf_counter()
+    ConversationStore(data_dir=data_dir, archive_after_days=0, write_behind=False).close()
+    return time.perf_counter() - start
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = ConversationStore(data_dir=data_dir, archive_after_days=0, write_behind=False)
+        generate(store, args.users)
+        store.close()
+        age_files(data_dir, 60)
+
+        store = ConversationStore(data_dir=data_dir, archive_after_days=0, write_behind=False)
+        hot = store.storage_stats()
+        hot_startup = startup(data_dir)
+        start = time.perf_counter()
+        store.archive_idle(30)
+        archive_time = time.perf_counter() - start
+        cold = store.storage_stats()
+        cold_files = len(os.listdir(store.cold.directory))
+        no_dictionary = sum(len(zlib.compress(store.cold.read(user_id), 9)) for user_id in list(store.cold)[:2000])
+        no_dictionary = no_dictionary * len(store.cold.entries) / min(2000, len(store.cold.entries))
+        store.close()
+        cold_startup = startup(data_dir)
+
+        store = ConversationStore(data_dir=data_dir, archive_after_days=0, write_behind=False)
+        returning = random.Random(1).sample(store.user_ids(), 200)
+        start = time.perf_counter()
+        for user_id in returning:
+            store.get_profile(user_id)
+        restore_ms = (time.perf_counter() - start) / len(returning) * 1000
+        store.close()
+
+    mb = 1024 * 1024
+    print(f"{args.users} idle users, {cold['cold_uncompressed_bytes'] / args.users:.0f} bytes of profile and history each")
+    print(f"hot:  {hot['hot_files']} files, {hot['hot_bytes'] / mb:.1f} MB data, {hot['hot_allocated_bytes'] / mb:.1f} MB allocated, startup {hot_startup * 1000:.0f} ms")
+    print(f"cold: {cold_files} files, "
+          f"{cold['cold_bytes'] / mb:.2f} MB ({cold['compression_ratio']:.1f}x; {no_dictionary / mb:.2f} MB without the shared dictionary), "
+          f"startup {cold_startup * 1000:.0f} ms")
+    print(f"archived in {archive_time:.1f}s, restore of a returning user {restore_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000, help="Idle users")
+    main(parser.parse_args())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Prompt tokens per turn over a long synthetic conversation.
+
+Compares sending the full history, the token-budget window alone, and the window plus
+the rolling summary of evicted turns. The LLM is replaced by a local function that
+records the prompt size and returns synthetic text, so no network is needed.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_context_tokens.py [--turns 500] [--budget 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.agent import SeriesAIAgent, SUMMARY_PROMPT
+from src.context_window import count_tokens, MESSAGE_OVERHEAD_TOKENS
+
+WORDS = "i am a student at ucla building a startup in climate tech and want to meet founders investors designers".split()
+
+
+class RecordingAgent(SeriesAIAgent):
+    """Agent whose LLM call records prompt sizes instead of hitting the network."""
+
+    def __init__(self, seed: int):
+        super().__init__()
+        self.rng = random.Random(seed)
+        self.turn_prompt_tokens: List[int] = []
+        self.summary_prompt_tokens: List[int] = []
+
+    async def _call_llm_with_messages(self, messages: List[Dict[str, str]], temperature: float = 0.7, **kwargs) -> str:
+        tokens = sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+        if messages[0]["content"] == SUMMARY_PROMPT:
+            self.summary_prompt_tokens.append(tokens)
+            return " ".join(self.rng.choice(WORDS) for _ in range(120))
+        self.turn_prompt_tokens.append(tokens)
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(15, 60)))
+
+
+async def run(label: str, turns: int, budget: int, summaries: bool) -> RecordingAgent:
+    agent = RecordingAgent(seed=7)
+    agent.context_token_budget = budget
+    agent.enable_summaries = summaries
+    rng = random.Random(42)
+
+    for turn in range(turns):
+        # Mostly short answers with the occasional long one
+        length = 400 if rng.random() < 0.03 else rng.randint(3, 80)
+        await agent.process_message(" ".join(rng.choice(WORDS) for _ in range(length)), "bench_user")
+        # Let the background summary task run between turns, as it would while the user types
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+    await agent.close()
+    return agent
+
+
+async def main(args: argparse.Namespace) -> None:
+    modes = [
+        ("full history", 10 ** 9, False),
+        ("window", args.budget, False),
+        ("window+summary", args.budget, True),
+    ]
+    results = [(label, await run(label, args.turns, budget, summaries)) for label, budget, summaries in modes]
+
+    checkpoints = [t for t in (10, 50, 100, 250, 500, 1000) if t < args.turns] + [args.turns]
+    print(f"Prompt tokens per LLM turn ({args.turns} turns, budget {args.budget})")
+    print(f"{'turn':>6}" + "".join(f"{label:>16}" for label, _ in results))
+    for turn in checkpoints:
+        # The first user turn is the canned welcome, so LLM turn n is user turn n + 1
+        index = min(turn, len(results[0][1].turn_prompt_tokens)) - 1
+        print(f"{turn:>6}" + "".join(f"{agent.turn_prompt_tokens[index]:>16}" for _, agent in results))
+
+    print(f"{'mean':>6}" + "".join(f"{sum(a.turn_prompt_tokens) / len(a.turn_prompt_tokens):>16.0f}" for _, a in results))
+    for label, agent in results:
+        if agent.summary_prompt_tokens:
+            print(f"{label}: {len(agent.summary_prompt_tokens)} background summary calls, "
+                  f"{sum(agent.summary_prompt_tokens) / len(agent.turn_prompt_tokens):.0f} tokens per turn amortized")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500, help="Number of user turns")
+    parser.add_argument("--budget", type=int, default=2000, help="Context token budget")
+    asyncio.run(main(parser.parse_args()))
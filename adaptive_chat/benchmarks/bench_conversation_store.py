@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Cost of ConversationStore.add_message as a conversation grows.
+
+Compares the previous full-file rewrite (the whole profile, history included, dumped
+with indent=2 on every message) with the append-only message log, timing a batch of
+writes once the conversation has reached 10, 100, 1,000 and 10,000 messages.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_conversation_store.py [--samples 50]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.conversation_store import ConversationStore
+from src.models import MessageRole
+
+CHECKPOINTS = (10, 100, 1000, 10000)
+TEXT = "sounds good! what kind of founders are u hoping to meet, and what stage are they at?"
+
+
+class FullRewriteStore(ConversationStore):
+    """The previous save path: rewrite the entire profile on every message."""
+
+    def save_profile(self, user_id: str, touch: bool = True) -> None:
+        profile = self.profiles[user_id]
+        profile.last_updated = datetime.datetime.now()
+        profile_dict = profile.model_dump()
+        profile_dict["created_at"] = profile_dict["created_at"].isoformat()
+        profile_dict["last_updated"] = profile_dict["last_updated"].isoformat()
+        for message in profile_dict["conversation_history"]:
+            message["timestamp"] = message["timestamp"].isoformat()
+        with open(self.data_dir / f"{user_id}.full", 'w') as f:
+            json.dump(profile_dict, f, indent=2)
+
+
+def measure(store_class, samples: int) -> dict:
+    """Mean add_message time in milliseconds at each checkpoint."""
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = store_class(data_dir=data_dir, write_behind=False)
+        profile = store.get_profile("bench_user")
+        for checkpoint in CHECKPOINTS:
+            # Grow the history in memory, then persist it once before timing
+            while len(profile.conversation_history) < checkpoint:
+                profile.conversation_history.append(
+                    {"role": "user", "content": TEXT, "timestamp": datetime.datetime.now()}
+                )
+            store.save_profile("bench_user")
+
+            start = time.perf_counter()
+            for _ in range(samples):
+                store.add_message("bench_user", MessageRole.ASSISTANT, TEXT)
+            results[checkpoint] = (time.perf_counter() - start) / samples * 1000
+        store.close()
+    return results
+
+
+def main(args: argparse.Namespace) -> None:
+    full = measure(FullRewriteStore, args.samples)
+    log = measure(ConversationStore, args.samples)
+
+    print(f"Mean add_message time, {args.samples} writes per checkpoint")
+    print(f"{'messages':>9}{'full rewrite ms':>18}{'append log ms':>16}")
+    for checkpoint in CHECKPOINTS:
+        print(f"{checkpoint:>9}{full[checkpoint]:>18.3f}{log[checkpoint]:>16.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=50, help="Writes timed at each checkpoint")
+    main(parser.parse_args())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+ConversationStore write throughput under each fsync policy.
+
+Runs the same workload (each turn stores a user message and the assistant reply) with
+fsync_policy always, batched and never, each with synchronous saves and with
+write-behind. Reports turn latency, turns per second and how many fsync rounds were
+issued, so a deployment can pick a policy knowing its cost.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_durability.py [--users 200] [--turns 10] [--interval-ms 100]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.conversation_store import ConversationStore, FSYNC_POLICIES
+from src.models import MessageRole
+
+TEXT = "sounds good! what kind of founders are u hoping to meet, and what stage are they at?"
+
+
+def run(policy: str, write_behind: bool, args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = ConversationStore(
+            data_dir=data_dir, write_behind=write_behind, archive_after_days=0,
+            fsync_policy=policy, fsync_interval_ms=args.interval_ms,
+        )
+        latencies: List[float] = []
+        start_all = time.perf_counter()
+        for turn in range(args.turns):
+            for user in range(args.users):
+                start = time.perf_counter()
+                store.add_message(f"user_{user}", MessageRole.USER, TEXT)
+                store.add_message(f"user_{user}", MessageRole.ASSISTANT, TEXT)
+                latencies.append(time.perf_counter() - start)
+        store.close()
+        # Includes the final flush and sync, so every mode ends with the same data on disk
+        elapsed = time.perf_counter() - start_all
+
+        latencies.sort()
+        label = f"{policy}{' + write-behind' if write_behind else ''}"
+        print(f"{label:<24}{latencies[len(latencies) // 2] * 1e6:>9.0f}{latencies[int(0.99 * len(latencies))] * 1e6:>10.0f}"
+              f"{args.users * args.turns / elapsed:>10.0f}{store.syncs:>8}")
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"{args.users} users x {args.turns} turns, two add_message calls per turn, batched interval {args.interval_ms:.0f} ms")
+    print(f"{'policy':<24}{'p50 us':>9}{'p99 us':>10}{'turns/s':>10}{'syncs':>8}")
+    for write_behind in (False, True):
+        for policy in FSYNC_POLICIES:
+            run(policy, write_behind, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="Number of users")
+    parser.add_argument("--turns", type=int, default=10, help="Turns per user")
+    parser.add_argument("--interval-ms", type=float, default=100, help="Sync interval of the batched policy")
+    main(parser.parse_args())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Cost of reading one page of a long conversation.
+
+Compares the previous get_conversation_history (build a Message for every entry, then
+slice) with the tail read and cursor pagination, for a profile already in memory and for
+a cold profile read straight from its files and from SQLite.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_history_pagination.py [--messages 100000] [--page 20]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+from src.conversation_store import ConversationStore
+from src.sqlite_store import SQLiteConversationStore
+from src.models import Message
+from migrate_json_to_sqlite import migrate
+
+TEXT = "sounds good! what kind of founders are u hoping to meet, and what stage are they at?"
+
+
+def timed(function, repeats: int) -> float:
+    """Mean time of a call in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = ConversationStore(data_dir=data_dir)
+        profile = store.get_profile("long_user")
+        start = datetime.datetime(2025, 1, 1)
+        for seq in range(args.messages):
+            profile.conversation_history.append({
+                "role": "user" if seq % 2 == 0 else "assistant", "content": TEXT,
+                "timestamp": start + datetime.timedelta(seconds=seq),
+            })
+        store.save_profile("long_user")
+        store.close()
+        migrate(data_dir, os.path.join(data_dir, "conversations.sqlite3"))
+
+        middle = args.messages // 2
+        middle_time = start + datetime.timedelta(seconds=middle)
+        resident = ConversationStore(data_dir=data_dir, write_behind=False)
+        resident.get_profile("long_user")
+        history = resident.profiles["long_user"].conversation_history
+
+        def full_build_then_slice():
+            messages = [Message(role=m["role"], content=m["content"], timestamp=m["timestamp"]) for m in history]
+            return messages[-args.page:]
+
+        def cold(read):
+            def run():
+                store = ConversationStore(data_dir=data_dir, write_behind=False)
+                read(store)
+                store.close()
+            return run
+
+        sqlite = SQLiteConversationStore(db_path=os.path.join(data_dir, "conversations.sqlite3"))
+        rows = [
+            ("previous: build all, slice", timed(full_build_then_slice, 5)),
+            ("memory: tail", timed(lambda: resident.get_conversation_history("long_user", args.page), 200)),
+            ("memory: before id", timed(lambda: resident.get_conversation_history("long_user", args.page, before=middle), 200)),
+            ("memory: after timestamp", timed(lambda: resident.get_conversation_history("long_user", args.page, after=middle_time), 200)),
+            ("files: tail (cold)", timed(cold(lambda s: s.get_conversation_history("long_user", args.page)), 50)),
+            ("files: before id (cold)", timed(cold(lambda s: s.get_conversation_history("long_user", args.page, before=middle)), 50)),
+            ("files: after ts (cold)", timed(cold(lambda s: s.get_conversation_history("long_user", args.page, after=middle_time)), 50)),
+            ("sqlite: tail", timed(lambda: sqlite.get_conversation_history("long_user", args.page), 200)),
+            ("sqlite: before id", timed(lambda: sqlite.get_conversation_history("long_user", args.page, before=middle), 200)),
+        ]
+        sqlite.close()
+        resident.close()
+
+    print(f"Page of {args.page} from a {args.messages}-message conversation")
+    for label, ms in rows:
+        print(f"{label:<30}{ms:>10.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000, help="Messages in the conversation")
+    parser.add_argument("--page", type=int, default=20, help="Page size")
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for SeriesAIAgent LLM calls at 1, 10 and 100 concurrent users.
+
+Runs the agent against a local stub completion server and compares the pooled async
+transport with the previous blocking requests.post call path.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_llm_concurrency.py [--latency 0.1] [--turns 3]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Dict, List
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from src.agent import SeriesAIAgent
+from stub_completion_server import StubCompletionServer
+
+
+class BlockingSeriesAIAgent(SeriesAIAgent):
+    """The agent with the old blocking transport, kept for comparison."""
+
+    async def _call_llm_with_messages(self, messages: List[Dict[str, str]], temperature: float = 0.7, **kwargs) -> str:
+        response = requests.post(
+            f"{self.llm_client.base_url}/chat/completions",
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"},
+            json={"model": self.model_name, "messages": messages, "temperature": temperature, "max_tokens": 1000},
+        )
+        return response.json()['choices'][0]['message']['content']
+
+
+async def run_users(agent: SeriesAIAgent, users: int, turns: int) -> float:
+    """Run `users` concurrent conversations of `turns` LLM turns each and return calls per second."""
+    user_ids = [f"bench_user_{i}" for i in range(users)]
+    # The first message returns the canned welcome text without calling the LLM
+    for user_id in user_ids:
+        await agent.process_message("blue", user_id)
+    # Pay one-off client setup (TLS context, pool creation) outside the timed section
+    await agent._call_llm_with_messages([{"role": "user", "content": "warm up"}])
+
+    async def converse(user_id: str) -> None:
+        for turn in range(turns):
+            await agent.process_message(f"message {turn}", user_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(converse(user_id) for user_id in user_ids))
+    elapsed = time.perf_counter() - start
+    return users * turns / elapsed
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = StubCompletionServer(latency=args.latency)
+    os.environ["OPENROUTER_BASE_URL"] = server.start()
+    # Measure the transport itself, not the agent's concurrency and admission limits
+    os.environ["MAX_CONCURRENT_USERS"] = "100"
+    os.environ["LLM_MAX_IN_FLIGHT"] = "100"
+    # Every user sends the same messages, which would otherwise be served from the response cache
+    os.environ["ENABLE_RESPONSE_CACHE"] = "false"
+
+    print(f"Stub latency {args.latency * 1000:.0f} ms, {args.turns} turns per user")
+    print(f"{'users':>6} {'transport':>10} {'calls/s':>10} {'connections':>12}")
+    try:
+        for users in (1, 10, 100):
+            agents = [("async", SeriesAIAgent())]
+            if not args.skip_blocking:
+                agents.append(("blocking", BlockingSeriesAIAgent()))
+            for label, agent in agents:
+                opened_before = server.connections_opened
+                throughput = await run_users(agent, users, args.turns)
+                await agent.close()
+                opened = server.connections_opened - opened_before
+                print(f"{users:>6} {label:>10} {throughput:>10.1f} {opened:>12}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1, help="Stub server latency in seconds")
+    parser.add_argument("--turns", type=int, default=3, help="LLM turns per user")
+    parser.add_argument("--skip-blocking", action="store_true", help="Only run the async transport")
+    asyncio.run(main(parser.parse_args()))
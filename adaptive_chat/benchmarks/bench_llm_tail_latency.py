@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tail latency of LLM calls against a faulty upstream.
+
+Runs concurrent completion calls against the local stub server with injected 500/429
+errors and occasional slow responses, and compares p50/p99 latency and the error rate
+with no resilience, with retries, and with retries plus hedging. A final run points the
+client at a fully failing upstream to show the circuit breaker failing fast.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_llm_tail_latency.py [--calls 400] [--error-rate 0.05] [--slow-rate 0.03]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from src.llm_client import LLMClient, LLMError, CircuitBreaker
+from stub_completion_server import StubCompletionServer
+
+import httpx
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 50}
+
+
+async def timed_call(client: LLMClient) -> Tuple[float, bool]:
+    """Make one call and return its latency and whether it succeeded."""
+    start = time.perf_counter()
+    try:
+        await client.chat_completion(PAYLOAD)
+        ok = True
+    except (LLMError, httpx.HTTPError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+async def run(label: str, base_url: str, calls: int, concurrency: int, **client_options) -> None:
+    client = LLMClient(api_key="bench", base_url=base_url, **client_options)
+    # Warm up the pool and, when hedging, the latency history it derives its delay from
+    for _ in range(3):
+        await asyncio.gather(*(timed_call(client) for _ in range(concurrency)))
+    client.retries = client.hedges_sent = client.hedges_won = 0
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded() -> Tuple[float, bool]:
+        async with semaphore:
+            return await timed_call(client)
+
+    results = await asyncio.gather(*(bounded() for _ in range(calls)))
+    await client.close()
+
+    latencies: List[float] = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    print(f"{label:<18}{percentile(0.50):>9.0f}{percentile(0.99):>9.0f}{100 * errors / calls:>9.1f}%"
+          f"{client.retries:>9}{client.hedges_sent:>9}{client.hedges_won:>9}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = StubCompletionServer(
+        latency=args.latency, error_rate=args.error_rate, slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency, seed=1,
+    )
+    base_url = server.start()
+    os.environ.setdefault("LLM_RETRY_BASE_DELAY", "0.05")
+
+    print(f"{args.calls} calls, concurrency {args.concurrency}, latency {args.latency * 1000:.0f} ms, "
+          f"{args.error_rate:.0%} errors, {args.slow_rate:.0%} slow ({args.slow_latency * 1000:.0f} ms)")
+    print(f"{'mode':<18}{'p50 ms':>9}{'p99 ms':>9}{'errors':>10}{'retries':>9}{'hedges':>9}{'won':>9}")
+    try:
+        await run("baseline", base_url, args.calls, args.concurrency, max_retries=0, hedge=False,
+                  breaker=CircuitBreaker(failure_threshold=10 ** 9))
+        await run("retries", base_url, args.calls, args.concurrency, hedge=False,
+                  breaker=CircuitBreaker(failure_threshold=10 ** 9))
+        await run("retries+hedging", base_url, args.calls, args.concurrency, hedge=True,
+                  breaker=CircuitBreaker(failure_threshold=10 ** 9))
+    finally:
+        server.stop()
+
+    # Fully failing upstream: once the breaker opens, calls fail without touching the network
+    outage = StubCompletionServer(latency=args.latency, error_rate=1.0, seed=1)
+    client = LLMClient(api_key="bench", base_url=outage.start(), max_retries=0,
+                       breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60))
+    try:
+        latencies = [(await timed_call(client))[0] for _ in range(20)]
+    finally:
+        await client.close()
+        outage.stop()
+    print(f"outage: {outage.requests_served} of 20 calls reached the upstream, "
+          f"mean latency after opening {sum(latencies[5:]) / 15 * 1000:.2f} ms "
+          f"(vs {sum(latencies[:5]) / 5 * 1000:.0f} ms before)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400, help="Calls per mode")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent calls")
+    parser.add_argument("--latency", type=float, default=0.05, help="Normal upstream latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Fraction of requests failing with 500/429")
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="Fraction of slow requests")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="Latency of slow requests in seconds")
+    asyncio.run(main(parser.parse_args()))
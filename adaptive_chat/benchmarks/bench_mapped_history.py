@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Reading a long conversation from the JSONL snapshot versus the memory-mapped format.
+
+Writes the same history both ways, then times opening it and reading the message
+count, one message in the middle, the last page, and the agent's context window
+(select_context_window within the default token budget). Each read starts from a fresh
+open, as for a profile loaded from disk. Also reports the Python heap allocated by the
+context window read.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_mapped_history.py [--messages 100000] [--page 20]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.context_window import select_context_window
+from src.mapped_history import MappedHistory, write_history
+
+TEXT = "sounds good! what kind of founders are u hoping to meet, and what stage are they at?"
+TOKEN_BUDGET = 6000
+
+
+def load_jsonl(path: Path):
+    """The previous loader: parse every entry of the snapshot."""
+    history = []
+    with open(path, "r") as f:
+        for line in f:
+            entry = json.loads(line)
+            entry.pop("seq")
+            entry["timestamp"] = datetime.datetime.fromisoformat(entry["timestamp"])
+            history.append(entry)
+    return history
+
+
+def timed(function, repeats: int) -> float:
+    """Mean time of a call in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def allocated(function) -> float:
+    """Peak Python heap allocated by a call, in MB."""
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def main(args: argparse.Namespace) -> None:
+    start = datetime.datetime(2025, 1, 1)
+    history = [
+        {"role": "user" if seq % 2 == 0 else "assistant", "content": f"{seq}: {TEXT}",
+         "timestamp": start + datetime.timedelta(seconds=seq)}
+        for seq in range(args.messages)
+    ]
+    middle = args.messages // 2
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        jsonl_path = Path(data_dir, "user.history.jsonl")
+        with open(jsonl_path, "w") as f:
+            for seq, message in enumerate(history):
+                f.write(json.dumps({"seq": seq, "role": message["role"], "content": message["content"],
+                                    "timestamp": message["timestamp"].isoformat()}) + "\n")
+        data_path, index_path = Path(data_dir, "user.history.dat"), Path(data_dir, "user.history.idx")
+        write_history(data_path, index_path, history)
+
+        def mapped(read):
+            def run():
+                view = MappedHistory(data_path, index_path)
+                read(view)
+                view.close()
+            return run
+
+        def jsonl(read):
+            return lambda: read(load_jsonl(jsonl_path))
+
+        def window(view):
+            return select_context_window(view, TOKEN_BUDGET)
+
+        reads = [
+            ("count", len),
+            (f"message {middle}", lambda h: h[middle]["content"]),
+            (f"last {args.page}", lambda h: h[-args.page:]),
+            ("context window", window),
+        ]
+        rows = []
+        for label, read in reads:
+            rows.append((label, timed(jsonl(read), 3), timed(mapped(read), 200)))
+        heap = (allocated(jsonl(window)), allocated(mapped(window)))
+
+    print(f"{args.messages}-message history, times in ms per read from a fresh open")
+    print(f"{'read':<22}{'jsonl':>10}{'mapped':>10}")
+    for label, jsonl_ms, mapped_ms in rows:
+        print(f"{label:<22}{jsonl_ms:>10.2f}{mapped_ms:>10.3f}")
+    print(f"{'heap MB (window)':<22}{heap[0]:>10.1f}{heap[1]:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000, help="Messages in the conversation")
+    parser.add_argument("--page", type=int, default=20, help="Page size")
+    main(parser.parse_args())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Turn latency and estimated spend with and without model routing.
+
+Plays scripted onboarding conversations against the local stub server, where the fast
+model answers quicker than the large one, and compares sending every turn to the large
+model with routing simple structured turns to the fast model.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_model_routing.py [--users 20] [--fast-latency 0.15] [--large-latency 0.6]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stub_completion_server import StubCompletionServer
+
+FAST_MODEL = "bench/fast"
+LARGE_MODEL = "bench/large"
+
+# (user message, the assistant question that follows it)
+SCRIPT = [
+    ("Sam Rivera", "nice to meet u Sam! what's ur email? school email if ur a student"),
+    ("sam.rivera@ucla.edu", "got it! now tell me a bit about urself, like \"student @UCLA running a tech startup\""),
+    ("third year cs student at ucla, building a climate data startup with two friends and doing research on grid storage",
+     "love that!! what are 3 types of ppl u know?"),
+    ("tech founders in sf, ucla cs students, climate researchers", "nice. who do u want to meet?"),
+    ("investors", "can u be a bit more specific? what kind of investors?"),
+    ("seed stage climate investors in LA who back student founders", "perfect, ready to finish up ur profile?"),
+    ("yes", "last thing, send me a selfie!"),
+    ("ok sending now", "all set, welcome to Series!"),
+]
+
+
+def scripted_reply(payload: dict) -> str:
+    """Reply with the next onboarding question, based on how far the conversation got."""
+    turn = sum(1 for message in payload["messages"] if message["role"] == "assistant") - 1
+    return SCRIPT[min(max(turn, 0), len(SCRIPT) - 1)][1]
+
+
+async def run(routing: bool, users: int) -> None:
+    from src.agent import SeriesAIAgent
+
+    agent = SeriesAIAgent()
+    agent.router.enabled = routing
+    latencies: List[float] = []
+
+    async def converse(user_id: str) -> None:
+        await agent.process_message("blue", user_id)
+        for message, _ in SCRIPT:
+            start = time.perf_counter()
+            await agent.process_message(message, user_id)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(converse(f"bench_user_{i}") for i in range(users)))
+    tiers = agent.get_metrics()["model_tiers"]
+    await agent.close()
+
+    latencies.sort()
+    cost = sum(tier["estimated_cost_usd"] for tier in tiers.values())
+    label = "routed" if routing else "large only"
+    print(f"{label:<12}{tiers['fast']['calls']:>7}{tiers['large']['calls']:>7}"
+          f"{latencies[len(latencies) // 2] * 1000:>10.0f}{sum(latencies) / len(latencies) * 1000:>10.0f}"
+          f"{latencies[int(0.95 * len(latencies))] * 1000:>10.0f}{cost * 1000:>12.3f}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = StubCompletionServer(
+        reply=scripted_reply,
+        model_latencies={FAST_MODEL: args.fast_latency, LARGE_MODEL: args.large_latency},
+    )
+    os.environ.update({
+        "OPENROUTER_BASE_URL": server.start(),
+        "FAST_MODEL_NAME": FAST_MODEL,
+        "LARGE_MODEL_NAME": LARGE_MODEL,
+        "FAST_MODEL_COST_PER_1K_TOKENS": str(args.fast_cost),
+        "LARGE_MODEL_COST_PER_1K_TOKENS": str(args.large_cost),
+        "MAX_CONCURRENT_USERS": str(args.users),
+        "LLM_MAX_IN_FLIGHT": str(args.users),
+        # Both runs send the same prompts; measure the models, not the response cache
+        "ENABLE_RESPONSE_CACHE": "false",
+    })
+
+    print(f"{args.users} users x {len(SCRIPT)} turns, fast {args.fast_latency * 1000:.0f} ms, "
+          f"large {args.large_latency * 1000:.0f} ms")
+    print(f"{'mode':<12}{'fast':>7}{'large':>7}{'p50 ms':>10}{'mean ms':>10}{'p95 ms':>10}{'cost m$':>12}")
+    try:
+        for routing in (False, True):
+            # Start every run from empty profiles
+            with tempfile.TemporaryDirectory() as spill_dir:
+                os.environ["PROFILE_SPILL_DIR"] = spill_dir
+                await run(routing, args.users)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Concurrent conversations")
+    parser.add_argument("--fast-latency", type=float, default=0.15, help="Fast model latency in seconds")
+    parser.add_argument("--large-latency", type=float, default=0.6, help="Large model latency in seconds")
+    parser.add_argument("--fast-cost", type=float, default=0.0002, help="Fast model USD per 1K tokens")
+    parser.add_argument("--large-cost", type=float, default=0.003, help="Large model USD per 1K tokens")
+    asyncio.run(main(parser.parse_args()))
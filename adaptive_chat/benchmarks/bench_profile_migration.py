@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Moving a ConversationStore corpus into the Supabase tables: one user at a time versus
+the bulk migration.
+
+Generates a JSON store (by default 10,000 users with 100 messages each, 1M messages),
+then copies it into the local SQLite stand-in for the Supabase tables two ways:
+
+- one user at a time, as db_client.SupabaseClient stores profiles: an upsert of the
+  profile and one of its messages, committed per user (timed over a sample of users
+  and extrapolated to the corpus)
+- ProfileMigrator: parsing and validation in a process pool, bounded batches of
+  upserts, a checkpoint after every batch
+
+Each upsert waits --latency-ms first, standing in for the round trip to the remote
+database. Reports rows/s and the time to move the whole corpus.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_profile_migration.py [--users 10000] [--messages 100] [--latency-ms 10] [--workers N]
+"""
+
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.conversation_store import ConversationStore
+from src.models import UserProfile
+from src.profile_migration import MESSAGE_TABLE, PROFILE_TABLE, ProfileMigrator, SQLiteTables, profile_to_rows
+
+REPLIES = [
+    "sounds good! what kind of founders are u hoping to meet, and what stage are they at?",
+    "mostly pre-seed climate founders in SF, ideally technical",
+    "love that. anyone specific in mind, or should we surprise u? 👀",
+    "surprise me, but bonus points if they've shipped hardware",
+]
+
+
+def generate(data_dir: str, users: int, messages: int) -> None:
+    """Write a corpus of users with `messages` messages each."""
+    store = ConversationStore(data_dir=data_dir, write_behind=False, archive_after_days=0, fsync_policy="never")
+    started = datetime.datetime(2025, 1, 1)
+    for i in range(users):
+        profile = UserProfile(user_id=f"user_{i:06d}", name=f"User {i}", interests=["climate", "hardware"],
+                              onboarding_step=11, onboarding_complete=True, total_messages=messages)
+        profile.conversation_history = [
+            {"role": "user" if seq % 2 else "assistant", "content": REPLIES[seq % len(REPLIES)],
+             "timestamp": started + datetime.timedelta(minutes=i, seconds=seq)}
+            for seq in range(messages)
+        ]
+        store.import_profile(profile)
+    store.close()
+
+
+def one_at_a_time(data_dir: str, db_path: str, users: int, latency_ms: float) -> float:
+    """Copy the first `users` users the way db_client does and return rows per second."""
+    store = ConversationStore(data_dir=data_dir, write_behind=False, archive_after_days=0)
+    tables = SQLiteTables(db_path, latency_ms)
+    rows = 0
+    start = time.perf_counter()
+    for user_id in sorted(store.user_ids())[:users]:
+        profile_row, message_rows = profile_to_rows(store.export_profile(user_id))
+        tables.upsert(PROFILE_TABLE, [profile_row])
+        tables.upsert(MESSAGE_TABLE, message_rows)
+        tables.commit()
+        rows += 1 + len(message_rows)
+    elapsed = time.perf_counter() - start
+    tables.close()
+    store.close()
+    return rows / elapsed
+
+
+def main(args: argparse.Namespace) -> None:
+    total_rows = args.users * (args.messages + 1)
+    with tempfile.TemporaryDirectory() as directory:
+        data_dir = os.path.join(directory, "data")
+        start = time.perf_counter()
+        generate(data_dir, args.users, args.messages)
+        print(f"Generated {args.users} users, {args.users * args.messages} messages in {time.perf_counter() - start:.1f}s")
+
+        serial_rate = one_at_a_time(data_dir, os.path.join(directory, "serial.sqlite3"), args.sample, args.latency_ms)
+
+        os.environ["MIGRATION_STANDIN_LATENCY_MS"] = str(args.latency_ms)
+        db_path = os.path.join(directory, "bulk.sqlite3")
+        migrator = ProfileMigrator(
+            f"json:{data_dir}", f"sqlite:{db_path}", os.path.join(directory, "checkpoint.json"),
+            workers=args.workers, batch_rows=args.batch_rows,
+        )
+        stats = migrator.run()
+        with sqlite3.connect(db_path) as db:
+            copied = sum(db.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in (PROFILE_TABLE, MESSAGE_TABLE))
+        assert copied == total_rows, f"copied {copied} rows, expected {total_rows}"
+
+    print(f"{total_rows} rows, {args.latency_ms:g} ms per upsert, {migrator.workers} workers, batches of {migrator.batch_rows} rows")
+    print(f"{'':<18}{'rows/s':>12}{'corpus time':>14}")
+    print(f"{'one at a time':<18}{serial_rate:>12,.0f}{total_rows / serial_rate:>13.0f}s   (extrapolated from {args.sample} users)")
+    print(f"{'bulk':<18}{stats['rows_per_second']:>12,.0f}{stats['seconds']:>13.0f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000, help="Users in the corpus")
+    parser.add_argument("--messages", type=int, default=100, help="Messages per user")
+    parser.add_argument("--sample", type=int, default=200, help="Users copied one at a time")
+    parser.add_argument("--latency-ms", type=float, default=10, help="Simulated round trip per upsert")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-rows", type=int, default=None, help="Rows per write batch (default 5000)")
+    main(parser.parse_args())
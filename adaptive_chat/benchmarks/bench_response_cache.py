@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+LLM calls saved by the response cache.
+
+Runs scripted onboarding conversations against the local stub server, where users pick
+their answers from small pools so some prompts repeat across users. Then restarts the
+agent on the same cache file and replays every conversation, as happens when a backlog
+of iMessage deliveries is processed again after a crash.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_response_cache.py [--users 50] [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stub_completion_server import StubCompletionServer
+from bench_model_routing import SCRIPT, scripted_reply
+
+ANSWER_POOLS = [
+    ["Sam Rivera", "Alex Chen", "Jordan Lee"],
+    ["sam@ucla.edu", "alex@stanford.edu", "jordan@gmail.com"],
+    ["cs student at ucla building a startup", "founder of a climate startup", "designer at a fintech"],
+    ["founders, engineers, designers", "students, researchers, investors"],
+    ["investors", "other founders"],
+    ["seed investors in LA", "climate founders in SF"],
+    ["yes", "yep"],
+    ["ok sending now"],
+]
+
+
+def conversations(users: int, seed: int) -> List[List[str]]:
+    rng = random.Random(seed)
+    return [[rng.choice(pool) for pool in ANSWER_POOLS] for _ in range(users)]
+
+
+async def run(label: str, server: StubCompletionServer, scripts: List[List[str]], cache: bool) -> None:
+    from src.agent import SeriesAIAgent
+
+    # Fresh profiles every run; only the response cache file carries over
+    spill_dir = tempfile.TemporaryDirectory()
+    os.environ["PROFILE_SPILL_DIR"] = spill_dir.name
+    os.environ["ENABLE_RESPONSE_CACHE"] = "true" if cache else "false"
+    agent = SeriesAIAgent()
+    served_before = server.requests_served
+    latencies: List[float] = []
+
+    async def converse(user_id: str, answers: List[str]) -> None:
+        await agent.process_message("blue", user_id)
+        for answer in answers:
+            start = time.perf_counter()
+            await agent.process_message(answer, user_id)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(converse(f"user_{i}", answers) for i, answers in enumerate(scripts)))
+    stats = agent.response_cache.stats()
+    await agent.close()
+    spill_dir.cleanup()
+
+    latencies.sort()
+    print(f"{label:<22}{server.requests_served - served_before:>10}{stats['memory_hits']:>8}{stats['disk_hits']:>8}"
+          f"{stats['hit_rate']:>9.0%}{latencies[len(latencies) // 2] * 1000:>9.0f}{sum(latencies) / len(latencies) * 1000:>10.0f}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = StubCompletionServer(latency=args.latency, reply=scripted_reply)
+    os.environ.update({
+        "OPENROUTER_BASE_URL": server.start(),
+        "MAX_CONCURRENT_USERS": str(args.users),
+        "LLM_MAX_IN_FLIGHT": str(args.users),
+        "ENABLE_CONVERSATION_SUMMARIES": "false",
+    })
+    scripts = conversations(args.users, seed=3)
+
+    print(f"{args.users} users x {len(SCRIPT)} turns, stub latency {args.latency * 1000:.0f} ms")
+    print(f"{'run':<22}{'LLM calls':>10}{'mem':>8}{'disk':>8}{'hit rate':>9}{'p50 ms':>9}{'mean ms':>10}")
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            os.environ["RESPONSE_CACHE_PATH"] = os.path.join(cache_dir, "responses.sqlite3")
+            await run("no cache", server, scripts, cache=False)
+            await run("cache, first pass", server, scripts, cache=True)
+            await run("restart + replay", server, scripts, cache=True)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Number of conversations")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub server latency in seconds")
+    asyncio.run(main(parser.parse_args()))
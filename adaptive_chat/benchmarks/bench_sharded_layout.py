@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Profile lookup and create latency in a flat versus a hash-sharded data directory.
+
+Fills a directory with synthetic profile headers, once flat and once with two levels of
+shard directories, then times header lookups (open + read) of random existing users,
+creates of new users, and the startup index scan. Finally reshards the flat directory
+with the re-sharding tool.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_sharded_layout.py [--files 1000000] [--samples 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+from src.conversation_store import ConversationStore
+from reshard_conversation_store import reshard
+
+HEADER = b'{"user_id": "%s", "onboarding_step": 6, "total_messages": 10}'
+
+
+def fill(store: ConversationStore, files: int) -> None:
+    """Write header files directly, the way a long-running store would have left them."""
+    for i in range(files):
+        user_id = f"user_{i:07d}"
+        directory = store.shard_dir(user_id)
+        if directory not in store._created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            store._created_dirs.add(directory)
+        with open(directory / f"{user_id}.json", "wb") as f:
+            f.write(HEADER % user_id.encode())
+
+
+def percentiles(samples):
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6, samples[int(0.99 * len(samples))] * 1e6
+
+
+def measure(label: str, data_dir: str, depth: int, files: int, samples: int) -> None:
+    store = ConversationStore(data_dir=data_dir, shard_depth=depth, warm_profiles=0, write_behind=False)
+    start = time.perf_counter()
+    fill(store, files)
+    fill_time = time.perf_counter() - start
+
+    rng = random.Random(7)
+    lookups = []
+    for _ in range(samples):
+        user_id = f"user_{rng.randrange(files):07d}"
+        start = time.perf_counter()
+        with open(store.profile_path(user_id), "rb") as f:
+            f.read()
+        lookups.append(time.perf_counter() - start)
+
+    creates = []
+    for i in range(samples):
+        start = time.perf_counter()
+        store.get_profile(f"new_user_{i}")
+        creates.append(time.perf_counter() - start)
+    store.close()
+
+    start = time.perf_counter()
+    ConversationStore(data_dir=data_dir, shard_depth=depth, warm_profiles=0, write_behind=False).close()
+    scan_time = time.perf_counter() - start
+
+    lookup_p50, lookup_p99 = percentiles(lookups)
+    create_p50, create_p99 = percentiles(creates)
+    print(f"{label:<10}{fill_time:>9.0f}{lookup_p50:>10.1f}{lookup_p99:>10.1f}{create_p50:>10.1f}{create_p99:>10.1f}{scan_time:>10.1f}")
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"{args.files} profiles, {args.samples} lookups and creates")
+    print(f"{'layout':<10}{'fill s':>9}{'get p50':>10}{'get p99':>10}{'new p50':>10}{'new p99':>10}{'scan s':>10}   (us)")
+    with tempfile.TemporaryDirectory() as flat_dir:
+        measure("flat", flat_dir, 0, args.files, args.samples)
+        with tempfile.TemporaryDirectory() as sharded_dir:
+            measure("sharded", sharded_dir, 2, args.files, args.samples)
+        reshard(flat_dir, depth=2, batch=args.files // 4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000000, help="Number of profiles")
+    parser.add_argument("--samples", type=int, default=2000, help="Timed lookups and creates")
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+SQLite store against the JSON file store.
+
+Measures add_message throughput across many users, a cold "last 20 messages" read for a
+user with a long history (fresh store instance, nothing in memory), and the JSON to
+SQLite migration rate.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_sqlite_store.py [--users 200] [--messages 50] [--long-history 10000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+from src.conversation_store import ConversationStore
+from src.sqlite_store import SQLiteConversationStore
+from src.models import MessageRole
+from migrate_json_to_sqlite import migrate
+
+TEXT = "sounds good! what kind of founders are u hoping to meet, and what stage are they at?"
+
+
+def fill(store, users: int, messages: int) -> float:
+    """Interleave messages across users and return writes per second."""
+    start = time.perf_counter()
+    for turn in range(messages):
+        role = MessageRole.USER if turn % 2 == 0 else MessageRole.ASSISTANT
+        for user in range(users):
+            store.add_message(f"user_{user}", role, TEXT)
+    if hasattr(store, "flush"):
+        store.flush()
+    return users * messages / (time.perf_counter() - start)
+
+
+def cold_tail_read(make_store, repeats: int = 20) -> float:
+    """Mean time in ms for a fresh store to return the last 20 messages of the long conversation."""
+    total = 0.0
+    for _ in range(repeats):
+        store = make_store()
+        start = time.perf_counter()
+        history = store.get_conversation_history("long_user", limit=20)
+        total += time.perf_counter() - start
+        assert len(history) == 20
+        store.close()
+    return total / repeats * 1000
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as json_dir, tempfile.TemporaryDirectory() as sqlite_dir:
+        db_path = os.path.join(sqlite_dir, "conversations.sqlite3")
+        make_json = lambda: ConversationStore(data_dir=json_dir, warm_profiles=0, write_behind=False)
+        make_sqlite = lambda: SQLiteConversationStore(db_path=db_path)
+
+        results = {}
+        for label, make_store in (("json files", make_json), ("sqlite", make_sqlite)):
+            store = make_store()
+            writes = fill(store, args.users, args.messages)
+            for turn in range(args.long_history):
+                store.add_message("long_user", MessageRole.USER if turn % 2 == 0 else MessageRole.ASSISTANT, TEXT)
+            store.close()
+            results[label] = (writes, cold_tail_read(make_store))
+
+        print(f"{args.users} users x {args.messages} messages, tail read over {args.long_history} messages")
+        print(f"{'store':<12}{'writes/s':>10}{'cold last-20 ms':>18}")
+        for label, (writes, tail) in results.items():
+            print(f"{label:<12}{writes:>10.0f}{tail:>18.2f}")
+
+        start = time.perf_counter()
+        migrated = migrate(json_dir, os.path.join(sqlite_dir, "migrated.sqlite3"))
+        print(f"migration: {migrated / (time.perf_counter() - start):.0f} profiles/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="Number of users")
+    parser.add_argument("--messages", type=int, default=50, help="Messages per user")
+    parser.add_argument("--long-history", type=int, default=10000, help="Messages in the long conversation")
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+ConversationStore startup time and memory with many stored profiles.
+
+Generates synthetic profiles on disk, then starts a fresh store in a child process per
+mode: eager (every profile parsed at startup, the previous behaviour), lazy (index only)
+and lazy with a warm-up of the most recently active users. Reports startup time, peak
+RSS and the latency of a first get_profile for a cold user.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_store_startup.py [--profiles 100000] [--messages 20]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.mapped_history import write_history
+
+MODES = {
+    "eager": "store.load_all_profiles()",
+    "lazy": "",
+    "lazy + warm 1000": "store.warm_up(1000)",
+}
+
+
+def generate(data_dir: str, profiles: int, messages: int) -> None:
+    """Write synthetic profile headers and history snapshots."""
+    now = datetime.datetime.now()
+    for i in range(profiles):
+        user_id = f"user_{i:06d}"
+        header = {
+            "user_id": user_id, "created_at": now.isoformat(), "last_updated": now.isoformat(),
+            "name": f"User {i}", "email": f"user{i}@example.edu", "onboarding_step": 6, "total_messages": messages // 2,
+        }
+        with open(os.path.join(data_dir, f"{user_id}.json"), "w") as f:
+            json.dump(header, f)
+        write_history(Path(data_dir, f"{user_id}.history.dat"), Path(data_dir, f"{user_id}.history.idx"), [
+            {"role": "user" if seq % 2 else "assistant",
+             "content": "sounds good! what kind of founders are u hoping to meet?", "timestamp": now}
+            for seq in range(messages)
+        ], sync=False)
+
+
+def child(data_dir: str, mode: str) -> None:
+    """Start a store in this process and print timings and peak RSS."""
+    from src.conversation_store import ConversationStore
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    store = ConversationStore(data_dir=data_dir, warm_profiles=0)
+    exec(MODES[mode], {"store": store})
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.get_profile("user_000000")
+    first_get = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    store.close()
+    print(json.dumps({"startup": startup, "first_get": first_get, "rss_mb": (peak_kb - baseline_kb) / 1024,
+                      "resident": len(store.profiles)}))
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        generate(data_dir, args.profiles, args.messages)
+        print(f"Generated {args.profiles} profiles x {args.messages} messages in {time.perf_counter() - start:.1f}s")
+        print(f"{'mode':<18}{'startup s':>11}{'RSS MB':>9}{'resident':>10}{'first get ms':>14}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, "--data-dir", data_dir],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<18}{result['startup']:>11.2f}{result['rss_mb']:>9.0f}{result['resident']:>10}"
+                  f"{result['first_get'] * 1000:>14.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=100000, help="Number of synthetic profiles")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per profile")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    if parsed.child:
+        child(parsed.data_dir, parsed.child)
+    else:
+        main(parsed)
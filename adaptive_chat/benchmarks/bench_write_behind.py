@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Time a request spends in ConversationStore writes, with and without write-behind.
+
+Each simulated turn stores the user message and the assistant reply, as the FastAPI
+handlers do, and the time spent inside those two add_message calls is what the request
+(and the event loop) would block on. Also reports how many disk writes the saves were
+coalesced into, and how long the final flush takes.
+
+Usage (from adaptive_chat/):
+    python benchmarks/bench_write_behind.py [--users 200] [--turns 20]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.conversation_store import ConversationStore
+from src.models import MessageRole
+
+TEXT = "sounds good! what kind of founders are u hoping to meet, and what stage are they at?"
+
+
+def run(write_behind: bool, users: int, turns: int) -> None:
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = ConversationStore(data_dir=data_dir, write_behind=write_behind)
+        latencies: List[float] = []
+        start_all = time.perf_counter()
+        for turn in range(turns):
+            for user in range(users):
+                start = time.perf_counter()
+                store.add_message(f"user_{user}", MessageRole.USER, TEXT)
+                store.add_message(f"user_{user}", MessageRole.ASSISTANT, TEXT)
+                latencies.append(time.perf_counter() - start)
+        elapsed = time.perf_counter() - start_all
+
+        start = time.perf_counter()
+        store.close()
+        close_time = time.perf_counter() - start
+
+        latencies.sort()
+        label = "write-behind" if write_behind else "synchronous"
+        print(f"{label:<14}{latencies[len(latencies) // 2] * 1e6:>9.0f}{latencies[int(0.99 * len(latencies))] * 1e6:>9.0f}"
+              f"{users * turns / elapsed:>11.0f}{store.saves:>8}{store.profile_writes:>8}{close_time * 1000:>11.1f}")
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"{args.users} users x {args.turns} turns, two add_message calls per turn")
+    print(f"{'mode':<14}{'p50 us':>9}{'p99 us':>9}{'turns/s':>11}{'saves':>8}{'writes':>8}{'close ms':>11}")
+    run(False, args.users, args.turns)
+    run(True, args.users, args.turns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="Number of users")
+    parser.add_argument("--turns", type=int, default=20, help="Turns per user")
+    main(parser.parse_args())
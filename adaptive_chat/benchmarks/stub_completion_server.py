@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenRouter chat completions endpoint, used by the benchmarks.
+
+Speaks just enough HTTP/1.1 (with keep-alive) to answer POST /api/v1/chat/completions
+after a configurable delay, either as one JSON body or as an SSE stream when the request
+sets `stream: true`. Optional fault injection returns 500/429 errors and occasional
+slow responses to exercise retries, hedging and the circuit breaker. It runs on its own event loop in a background thread so it
+keeps serving even when the client under test blocks its own loop.
+"""
+
+import asyncio
+import json
+import random
+import threading
+from typing import Callable, Dict, Optional, Set, Union
+
+
+class StubCompletionServer:
+    """Minimal OpenAI-compatible completion server for local benchmarks."""
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        reply: Union[str, Callable[[dict], str]] = "sounds good! what's ur email?",
+        token_interval: float = 0.0,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 2.0,
+        seed: Optional[int] = None,
+        model_latencies: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Args:
+            latency: Seconds to wait before answering each request (time to first token when streaming)
+            reply: Assistant content returned for every completion, or a function of the request payload
+            token_interval: Seconds between streamed tokens
+            error_rate: Fraction of requests answered with a 500 or a 429 (with Retry-After)
+            slow_rate: Fraction of requests delayed by `slow_latency` instead of `latency`
+            slow_latency: Delay in seconds for slow requests
+            seed: Seed for the fault injection, for repeatable runs
+            model_latencies: Per-model latency overriding `latency`, keyed by the requested model
+        """
+        self.latency = latency
+        self.reply = reply
+        self.token_interval = token_interval
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.model_latencies = model_latencies or {}
+        self._rng = random.Random(seed)
+        self.requests_served = 0
+        self.errors_injected = 0
+        self.connections_opened = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._handlers: Set[asyncio.Task] = set()
+        self.base_url = ""
+
+    def start(self) -> str:
+        """Start serving in a background thread and return the API base URL."""
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_connection, "127.0.0.1", 0, backlog=1024)
+            )
+            port = self._server.sockets[0].getsockname()[1]
+            self.base_url = f"http://127.0.0.1:{port}/api/v1"
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.base_url
+
+    def stop(self) -> None:
+        """Stop the server thread."""
+        if self._loop is None:
+            return
+
+        async def shutdown() -> None:
+            self._server.close()
+            for task in list(self._handlers):
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until the client closes it."""
+        self.connections_opened += 1
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                payload = json.loads(body or b"{}")
+
+                slow = self._rng.random() < self.slow_rate
+                latency = self.model_latencies.get(payload.get("model"), self.latency)
+                await asyncio.sleep(self.slow_latency if slow else latency)
+                if self._rng.random() < self.error_rate:
+                    await self._write_error(writer, 429 if self._rng.random() < 0.3 else 500)
+                    self.errors_injected += 1
+                elif payload.get("stream"):
+                    await self._write_stream(writer, payload)
+                else:
+                    await self._write_completion(writer, payload)
+                self.requests_served += 1
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    def _reply_for(self, payload: dict) -> str:
+        """Assistant content for a request."""
+        return self.reply(payload) if callable(self.reply) else self.reply
+
+    async def _write_completion(self, writer: asyncio.StreamWriter, payload: dict) -> None:
+        """Write a regular JSON completion response."""
+        body = json.dumps({
+            "id": "stub-completion",
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self._reply_for(payload)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/json\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: keep-alive\r\n\r\n" + body
+        )
+        await writer.drain()
+
+    async def _write_error(self, writer: asyncio.StreamWriter, status: int) -> None:
+        """Write an error response in the OpenRouter format."""
+        reason = b"Too Many Requests" if status == 429 else b"Internal Server Error"
+        body = json.dumps({"error": {"code": status, "message": reason.decode()}}).encode()
+        retry_after = b"Retry-After: 0\r\n" if status == 429 else b""
+        writer.write(
+            b"HTTP/1.1 " + str(status).encode() + b" " + reason + b"\r\n"
+            b"Content-Type: application/json\r\n" + retry_after +
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: keep-alive\r\n\r\n" + body
+        )
+        await writer.drain()
+
+    async def _write_stream(self, writer: asyncio.StreamWriter, payload: dict) -> None:
+        """Write the reply word by word as a chunked server-sent events stream."""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+
+        def write_chunk(data: bytes) -> None:
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        write_chunk(b": OPENROUTER PROCESSING\n\n")
+        words = self._reply_for(payload).split(" ")
+        for i, word in enumerate(words):
+            token = word if i == len(words) - 1 else word + " "
+            event = {"choices": [{"index": 0, "delta": {"content": token}}], "model": payload.get("model", "stub")}
+            write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            await writer.drain()
+            if self.token_interval:
+                await asyncio.sleep(self.token_interval)
+        write_chunk(b"data: [DONE]\n\n")
+        write_chunk(b"")
+        await writer.drain()
+
+
+if __name__ == "__main__":
+    import time
+
+    server = StubCompletionServer()
+    print(f"Stub completion server listening on {server.start()}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -3,8 +3,19 @@ Adaptive Chat - A personalized LLM chat application that adapts to users.
 
 This package contains the following modules:
 - agent: Core agent implementation using Agent SDK
+- llm_client: Pooled async HTTP client for the OpenRouter API
+- user_actors: Per-user actor scheduler that serializes each user's messages
+- context_window: Token-budget selection of conversation history for the LLM
+- profile_cache: Bounded LRU of user profiles that spills to disk
+- admission: Priority admission control in front of LLM calls
+- model_router: Routes each turn to a fast or large model tier
+- response_cache: LRU + TTL cache of LLM responses with a SQLite tier
 - models: Data models for the application
 - conversation_store: Storage for user profiles and conversation history
+- sqlite_store: SQLite (WAL) backend with the same interface as conversation_store
+- mapped_history: Memory-mapped on-disk conversation history with a fixed-width index
+- cold_storage: Compressed segment archive for idle users' profiles and histories
+- profile_migration: Parallel, checkpointed bulk copy of profiles between storage backends
 - question_bank: Repository of insightful questions categorized by type
 - style_matcher: Utilities for adapting communication style
 - main: FastAPI application entry point
@@ -0,0 +1,157 @@
+import os
+import time
+import heapq
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when an LLM call cannot be admitted: the wait queue is full or the wait
+    exceeded its limit. Callers should map it to a 503 or defer the reply.
+    """
+
+    def __init__(self, reason: str, queue_depth: int):
+        super().__init__(f"LLM admission rejected ({reason}, queue depth {queue_depth})")
+        self.reason = reason
+        self.queue_depth = queue_depth
+
+
+class AdmissionScheduler:
+    """
+    Admission control in front of the LLM API.
+
+    At most `max_in_flight` calls run at once. Further calls wait in a priority queue of
+    at most `max_queue` entries (higher priority first, FIFO within a priority); a call
+    that finds the queue full, or waits longer than `max_wait` seconds, is rejected with
+    AdmissionRejected instead of piling onto a saturated upstream.
+    """
+
+    def __init__(self, max_in_flight: Optional[int] = None, max_queue: Optional[int] = None, max_wait: Optional[float] = None):
+        """
+        Initialize the scheduler. Unset arguments fall back to environment variables.
+
+        Args:
+            max_in_flight: Maximum concurrent LLM calls
+            max_queue: Maximum calls waiting for a slot
+            max_wait: Maximum seconds a call may wait for a slot
+        """
+        self.max_in_flight = max_in_flight or int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("LLM_MAX_QUEUE", "64"))
+        self.max_wait = max_wait or float(os.getenv("LLM_ADMISSION_MAX_WAIT", "30"))
+
+        self.in_flight = 0
+        self.queue_depth = 0
+        # Heap entries are [-priority, sequence, future]; cancelled waiters are skipped lazily
+        self._waiters: List[List[Any]] = []
+        self._sequence = 0
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=1000)
+
+    @asynccontextmanager
+    async def admit(self, priority: int = 0) -> AsyncIterator[None]:
+        """
+        Hold an in-flight slot for the duration of the block.
+
+        Args:
+            priority: Higher values are admitted first when calls are queued
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out
+        """
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int) -> None:
+        """Take a slot immediately or wait in the queue for one."""
+        if self.in_flight < self.max_in_flight and self.queue_depth == 0:
+            self.in_flight += 1
+            self._record_wait(0.0)
+            return
+
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("queue full", self.queue_depth)
+
+        future = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        heapq.heappush(self._waiters, [-priority, self._sequence, future])
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        started = time.monotonic()
+
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+
+        if not done:
+            self._abandon(future)
+            self.timed_out += 1
+            self.rejected += 1
+            raise AdmissionRejected("wait timed out", self.queue_depth)
+
+        # The slot was handed over by _release, so in_flight already counts this call
+        self._record_wait(time.monotonic() - started)
+
+    def _abandon(self, future: asyncio.Future) -> None:
+        """Give up a queued wait, returning the slot if one was handed over meanwhile."""
+        if future.done():
+            self._release()
+        else:
+            future.cancel()
+            self.queue_depth -= 1
+
+    def _release(self) -> None:
+        """Hand the slot to the highest priority waiter, or free it."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.queue_depth -= 1
+            future.set_result(None)
+            return
+        self.in_flight -= 1
+
+    def _record_wait(self, wait: float) -> None:
+        """Record how long an admitted call waited for its slot."""
+        self.admitted += 1
+        self.total_wait_time += wait
+        self.max_wait_time = max(self.max_wait_time, wait)
+        self._recent_waits.append(wait)
+
+    def stats(self) -> Dict[str, float]:
+        """Return queue depth, throughput and wait time metrics."""
+        recent = sorted(self._recent_waits)
+
+        def percentile(p: float) -> float:
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "mean_wait_seconds": self.total_wait_time / self.admitted if self.admitted else 0.0,
+            "p50_wait_seconds": percentile(0.50),
+            "p95_wait_seconds": percentile(0.95),
+            "max_wait_seconds": self.max_wait_time,
+        }
@@ -1,13 +1,21 @@
 import os
-from typing import Dict, List, Any, Optional
+import time
+import asyncio
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
 import datetime
 import json
 import re
 from dotenv import load_dotenv
-import requests
 import logging
 
 from .models import UserProfile
+from .llm_client import LLMClient, LLMError
+from .user_actors import UserActorScheduler
+from .context_window import select_context_window, message_tokens, count_tokens
+from .profile_cache import ProfileCache
+from .admission import AdmissionScheduler, AdmissionRejected
+from .model_router import ModelRouter, FAST_TIER, LARGE_TIER
+from .response_cache import ResponseCache
 # from .db_client import SupabaseClient
 
 # Configure logging
@@ -16,20 +24,87 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+SYSTEM_PROMPT = """You are SeriesAI (Olivia), an SMS-style onboarding assistant for a social network that matches students and founders.
+
+CONVERSATION STYLE:
+- Use a casual, friendly tone with abbreviated text language (u, ur, ppl, etc.)
+- Be conversational, warm, and engaging
+- Avoid overly formal language
+- Use emojis occasionally but not excessively
+- Keep responses concise - short paragraphs with line breaks for readability
+
+ONBOARDING SEQUENCE:
+1. After user shares their full name, ask for their email (encourage school email if they're a student)
+2. Ask for a brief bio about themselves (offer examples like "student @UCLA running a tech startup")
+3. Ask about 3 types of people they know (offer examples like "tech founders in SF")
+4. Ask who they want to meet (ask for specific details if they're vague)
+5. After they confirm they're ready, ask for a selfie to complete their profile
+
+IMPORTANT GUIDELINES:
+- Guide the user through the exact sequence above
+- If user provides vague or minimal responses, gently ask for more specific details
+- If the conversation gets off track, steer it back to the next step in the sequence
+- Store important user details to reference later in the conversation
+- Match the user's energy level and communication style
+- Act as if you've already been connected via text message as "Olivia"
+- READ AND REFERENCE THE FULL CONVERSATION HISTORY to provide coherent and contextual responses
+- Remember details the user has shared previously and use them appropriately
+"""
+
+SUMMARY_PROMPT = """You maintain a running summary of an onboarding conversation between Olivia (the assistant) and a user.
+Update the current summary with the new messages. Keep every concrete detail the user shared (name, email, school, bio,
+the types of people they know, who they want to meet) and any open question Olivia is waiting on.
+Reply with the updated summary only, in at most 150 words."""
+
+# LLM admission priorities: onboarding progress ranks in between these two
+ONBOARDING_COMPLETE_PRIORITY = 100
+SUMMARY_PRIORITY = -1
+
+MAX_RESPONSE_TOKENS = 1000
+
+FALLBACK_MESSAGE = "I'm having trouble connecting right now. Could you try again in a moment?"
+
+WELCOME_MESSAGE = """Hey it's Olivia! Go ahead and save my contact and then we can get started:)
+
+If you got that wrapped up, awesome. Series is the first AI social network—so the way this works is I get to know you, then talk to other AI Friends to connect you to real people based on who you want to meet, kinda like a middleman.
+
+So now I'll ask you a few Qs to create your acct with Series. Alright, let's get this rolling—what's your full name?"""
+
 class SeriesAIAgent:
     def __init__(self, agent_id: str = "series_ai"):
         self.agent_id = agent_id
-        self.user_profiles: Dict[str, UserProfile] = {}
+        # Bounded LRU of profiles; least recently used ones spill to disk and are rehydrated on demand
+        self.user_profiles = ProfileCache()
         self.api_key = os.getenv("OPENROUTER_API_KEY")
         self.model_name = os.getenv("MODEL_NAME", "meta-llama/llama-4-maverick:free")
-        self.max_context_length = int(os.getenv("MAX_CONTEXT_LENGTH", "30"))
+        # Optional hard cap on the number of history messages; the token budget is the main limit
+        self.max_context_length = int(os.getenv("MAX_CONTEXT_LENGTH", "0")) or None
+        self.context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+        self.pinned_context_messages = int(os.getenv("PINNED_CONTEXT_MESSAGES", "3"))
+        self._system_prompt_tokens: Optional[int] = None
+        self.enable_summaries = os.getenv("ENABLE_CONVERSATION_SUMMARIES", "true").lower() == "true"
+        self.summary_batch_messages = int(os.getenv("SUMMARY_BATCH_MESSAGES", "10"))
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+        self.llm_client = LLMClient(api_key=self.api_key)
+        # Serializes each user's messages while letting different users run in parallel
+        self.actors = UserActorScheduler()
+        # Caps concurrent LLM calls and queues the rest by priority
+        self.admission = AdmissionScheduler()
+        # Sends simple structured turns to a fast model and open-ended ones to a large model
+        self.router = ModelRouter(default_model=self.model_name)
+        # Identical prompts (replays, retries, common answers) are served without calling the LLM.
+        # Off by default: replies are sampled, so caching them makes repeated prompts get the same answer
+        self.enable_response_cache = os.getenv("ENABLE_RESPONSE_CACHE", "false").lower() == "true"
+        # A disabled cache keeps no file and no writer thread
+        self.response_cache = ResponseCache(path=None if self.enable_response_cache else "")
         
         # self.db_client = SupabaseClient()
         
     async def initialize_user(self, user_id: str) -> UserProfile:
         """Create a new user profile if one doesn't exist or fetch from Supabase."""
-        if user_id in self.user_profiles:
-            return self.user_profiles[user_id]
+        user_profile = self.user_profiles.get(user_id)
+        if user_profile is not None:
+            return user_profile
             
         # if self.db_client.is_connected():
         #     supabase_profile = await self.db_client.fetch_user_profile(user_id)
@@ -57,18 +132,103 @@ class SeriesAIAgent:
         #         except Exception as e:
         #             logger.error(f"Error converting Supabase profile: {str(e)}")
         
-        self.user_profiles[user_id] = UserProfile(
+        user_profile = UserProfile(
             user_id=user_id
         )
+        self.user_profiles[user_id] = user_profile
         
         # Store the new profile in Supabase if connected
         # if self.db_client.is_connected():
-        #     await self.db_client.store_user_profile(self.user_profiles[user_id].dict())
+        #     await self.db_client.store_user_profile(user_profile.dict())
             
-        return self.user_profiles[user_id]
+        return user_profile
     
     async def process_message(self, message_content: str, user_id: str = "default_user") -> str:
         """Process incoming messages and generate responses based on the SMS onboarding flow."""
+        return await self.actors.run(user_id, lambda: self._process_message(message_content, user_id))
+    
+    async def process_message_stream(self, message_content: str, user_id: str = "default_user") -> AsyncIterator[str]:
+        """
+        Streaming variant of process_message.
+        Yields response chunks as the LLM generates them, then stores the assembled reply
+        in the conversation history exactly like process_message does.
+        """
+        chunks: asyncio.Queue = asyncio.Queue()
+        
+        async def produce() -> None:
+            async for chunk in self._process_message_stream(message_content, user_id):
+                chunks.put_nowait(chunk)
+        
+        # The whole stream runs inside the user's actor; chunks are handed over through the queue
+        turn = asyncio.ensure_future(self.actors.run(user_id, produce))
+        turn.add_done_callback(lambda _: chunks.put_nowait(None))
+        
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+        
+        # Surface any error raised while processing the turn
+        await turn
+    
+    async def _process_message(self, message_content: str, user_id: str) -> str:
+        """Run one turn for a user. Must only be called from the user's actor."""
+        user_profile = await self._start_turn(message_content, user_id)
+        
+        # If this is the first message, return the standard welcome response
+        if self._is_first_message(user_profile):
+            response = WELCOME_MESSAGE
+        else:
+            messages = self._build_llm_messages(user_profile)
+            try:
+                response = await self._call_llm_with_messages(
+                    messages,
+                    priority=self._admission_priority(user_profile),
+                    tier=self.router.classify(user_profile),
+                )
+            except AdmissionRejected:
+                # Leave history as it was so the caller can retry the same message later
+                self._abandon_turn(user_profile)
+                raise
+        
+        self._finish_turn(user_id, user_profile, response)
+        return response
+    
+    async def _process_message_stream(self, message_content: str, user_id: str) -> AsyncIterator[str]:
+        """Streaming version of _process_message. Must only be called from the user's actor."""
+        user_profile = await self._start_turn(message_content, user_id)
+        chunks: List[str] = []
+        rejected = False
+        
+        try:
+            if self._is_first_message(user_profile):
+                chunks.append(WELCOME_MESSAGE)
+                yield WELCOME_MESSAGE
+            else:
+                messages = self._build_llm_messages(user_profile)
+                stream = self._stream_llm_with_messages(
+                    messages,
+                    priority=self._admission_priority(user_profile),
+                    tier=self.router.classify(user_profile),
+                )
+                try:
+                    async for chunk in stream:
+                        chunks.append(chunk)
+                        yield chunk
+                finally:
+                    await stream.aclose()
+        except AdmissionRejected:
+            rejected = True
+            self._abandon_turn(user_profile)
+            raise
+        finally:
+            # Runs even if the consumer stops early, so history never holds a dangling user turn
+            if not rejected:
+                self._finish_turn(user_id, user_profile, "".join(chunks))
+    
+    async def _start_turn(self, message_content: str, user_id: str) -> UserProfile:
+        """Record an incoming user message and return the user's profile."""
         user_profile = await self.initialize_user(user_id)
         
         # Update profile metrics
@@ -93,72 +253,48 @@ class SeriesAIAgent:
         # Extract information from conversation to update the profile
         # self._update_profile_from_conversation(user_profile)
         
-        # Check if this is the first message (user sharing their color)
-        is_first_message = len(user_profile.conversation_history) == 1
+        return user_profile
+    
+    def _abandon_turn(self, user_profile: UserProfile) -> None:
+        """Undo _start_turn for a message that could not be answered."""
+        user_profile.conversation_history.pop()
+        user_profile.total_messages -= 1
+    
+    def _admission_priority(self, user_profile: UserProfile) -> int:
+        """Users further along in onboarding are admitted to the LLM first."""
+        if user_profile.onboarding_complete:
+            return ONBOARDING_COMPLETE_PRIORITY
+        return max(user_profile.onboarding_step, user_profile.total_messages)
+    
+    def _is_first_message(self, user_profile: UserProfile) -> bool:
+        """Check if this is the first message (user sharing their color)."""
+        return len(user_profile.conversation_history) == 1
+    
+    def _build_llm_messages(self, user_profile: UserProfile) -> List[Dict[str, str]]:
+        """Build the system prompt plus the conversation context for the LLM."""
+        # System message with instructions for the AI
+        system_message = {"role": "system", "content": SYSTEM_PROMPT}
         
-        # If this is the first message, return the standard welcome response
-        if is_first_message:
-            response = """Hey it's Olivia! Go ahead and save my contact and then we can get started:)
-
-If you got that wrapped up, awesome. Series is the first AI social network—so the way this works is I get to know you, then talk to other AI Friends to connect you to real people based on who you want to meet, kinda like a middleman.
-
-So now I'll ask you a few Qs to create your acct with Series. Alright, let's get this rolling—what's your full name?"""
-        else:
-            # System message with instructions for the AI
-            system_message = {
-                "role": "system", 
-                "content": """You are SeriesAI (Olivia), an SMS-style onboarding assistant for a social network that matches students and founders.
-
-CONVERSATION STYLE:
-- Use a casual, friendly tone with abbreviated text language (u, ur, ppl, etc.)
-- Be conversational, warm, and engaging
-- Avoid overly formal language
-- Use emojis occasionally but not excessively
-- Keep responses concise - short paragraphs with line breaks for readability
-
-ONBOARDING SEQUENCE:
-1. After user shares their full name, ask for their email (encourage school email if they're a student)
-2. Ask for a brief bio about themselves (offer examples like "student @UCLA running a tech startup")
-3. Ask about 3 types of people they know (offer examples like "tech founders in SF")
-4. Ask who they want to meet (ask for specific details if they're vague)
-5. After they confirm they're ready, ask for a selfie to complete their profile
-
-IMPORTANT GUIDELINES:
-- Guide the user through the exact sequence above
-- If user provides vague or minimal responses, gently ask for more specific details
-- If the conversation gets off track, steer it back to the next step in the sequence
-- Store important user details to reference later in the conversation
-- Match the user's energy level and communication style
-- Act as if you've already been connected via text message as "Olivia"
-- READ AND REFERENCE THE FULL CONVERSATION HISTORY to provide coherent and contextual responses
-- Remember details the user has shared previously and use them appropriately
-"""
-            }
-            
-            # Build the conversation history with all past messages
-            messages = [system_message]
-            
-            # Get all conversation history, limited by max_context_length
-            # If we have more messages than max_context_length, take the most recent ones
-            # But always include the first message for context
-            if len(user_profile.conversation_history) > self.max_context_length:
-                # Always include the first few messages for context about who they are
-                initial_context = user_profile.conversation_history[:3]
-                # Then include the most recent messages up to max_context_length - 3
-                recent_messages = user_profile.conversation_history[-(self.max_context_length - 3):]
-                history_to_include = initial_context + recent_messages
-            else:
-                history_to_include = user_profile.conversation_history
-            
-            # Format messages for the LLM
-            for message in history_to_include:
-                messages.append({
-                    "role": message["role"],
-                    "content": message["content"]
-                })
-
-            response = await self._call_llm_with_messages(messages)
+        # Build the conversation history with all past messages
+        messages = [system_message]
+        
+        # Turns that no longer fit in the window are represented by the rolling summary
+        if user_profile.conversation_summary:
+            messages.append(self._summary_message(user_profile))
         
+        history_to_include, _ = self._select_history(user_profile)
+        
+        # Format messages for the LLM
+        for message in history_to_include:
+            messages.append({
+                "role": message["role"],
+                "content": message["content"]
+            })
+        
+        return messages
+    
+    def _finish_turn(self, user_id: str, user_profile: UserProfile, response: str) -> None:
+        """Record the assistant reply and update the profile."""
         # Store assistant message in history locally
         user_profile.conversation_history.append({
             "role": "assistant",
@@ -183,40 +319,215 @@ IMPORTANT GUIDELINES:
         # if self.db_client.is_connected():
         #     await self.db_client.store_user_profile(user_profile.dict())
         
+        # Fold turns that fell out of the window into the summary, off the reply path
+        self._schedule_summary(user_id, user_profile)
+    
+    def _select_history(self, user_profile: UserProfile) -> Tuple[List[Dict], int]:
+        """
+        Fill the token budget with the pinned onboarding opener plus as much recent history as fits.
+        Token counts are cached on each history entry, so old messages are never re-tokenized.
+        Returns the selected entries and the index where the recent tail starts.
+        """
+        if self._system_prompt_tokens is None:
+            self._system_prompt_tokens = message_tokens({"role": "system", "content": SYSTEM_PROMPT})
+        
+        token_budget = self.context_token_budget - self._system_prompt_tokens
+        if user_profile.conversation_summary:
+            token_budget -= message_tokens(self._summary_message(user_profile))
+        
+        return select_context_window(
+            user_profile.conversation_history,
+            token_budget=token_budget,
+            pinned_messages=self.pinned_context_messages,
+            max_messages=self.max_context_length,
+        )
+    
+    def _summary_message(self, user_profile: UserProfile) -> Dict[str, str]:
+        """System message carrying the user's rolling summary."""
+        return {
+            "role": "system",
+            "content": f"Summary of the earlier conversation with this user:\n{user_profile.conversation_summary}"
+        }
+    
+    def _schedule_summary(self, user_id: str, user_profile: UserProfile) -> None:
+        """Start a background summary update if turns were evicted since the last one."""
+        if not self.enable_summaries or user_id in self._summary_tasks:
+            return
+        
+        _, window_start = self._select_history(user_profile)
+        if window_start <= max(user_profile.summarized_until, self.pinned_context_messages):
+            return
+        
+        # Also cover the oldest turns still in the window, so the next few evictions need no new call.
+        # The newest turns are never folded in ahead of time.
+        summarize_until = max(window_start, min(window_start + self.summary_batch_messages, len(user_profile.conversation_history) - 4))
+        task = asyncio.ensure_future(self._update_summary(user_profile, summarize_until))
+        self._summary_tasks[user_id] = task
+        task.add_done_callback(lambda _: self._summary_tasks.pop(user_id, None))
+    
+    async def _update_summary(self, user_profile: UserProfile, evicted_until: int) -> None:
+        """
+        Fold history entries that fell out of the context window into the user's rolling summary.
+        Only the newly evicted turns are sent, together with the previous summary.
+        """
+        history = user_profile.conversation_history
+        
+        while True:
+            start = max(user_profile.summarized_until, self.pinned_context_messages)
+            if start >= evicted_until:
+                return
+            
+            # Summarize at most one context budget's worth of turns per call
+            end = start
+            used = 0
+            while end < evicted_until and (end == start or used + message_tokens(history[end]) <= self.context_token_budget):
+                used += message_tokens(history[end])
+                end += 1
+            
+            new_turns = "\n".join(f"{message['role']}: {message['content']}" for message in history[start:end])
+            try:
+                # Background work yields to user-facing turns
+                summary = await self._call_llm_with_messages([
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Current summary:\n{user_profile.conversation_summary or '(none yet)'}\n\nNew messages:\n{new_turns}"}
+                ], temperature=0.2, priority=SUMMARY_PRIORITY, tier=FAST_TIER)
+            except AdmissionRejected:
+                return
+            
+            if summary == FALLBACK_MESSAGE:
+                # Try again after a later turn rather than storing the error text as the summary
+                return
+            
+            user_profile.conversation_summary = summary.strip()
+            user_profile.summarized_until = end
+    
+    
+    async def _call_llm_with_messages(self, messages: List[Dict[str, str]], temperature: float = 0.7, priority: int = 0, tier: str = LARGE_TIER) -> str:
+        """
+        Call OpenRouter API to generate text based on a conversation, using the model of the given tier.
+        Identical prompts are answered from the response cache without being admitted.
+        Raises AdmissionRejected if the LLM admission queue is full.
+        """
+        cache_key = self._response_cache_key(messages, temperature, tier)
+        if cache_key is not None:
+            cached = await self.response_cache.get_async(cache_key)
+            if cached is not None:
+                return cached
+        
+        async with self.admission.admit(priority):
+            response = await self._request_completion(messages, temperature, tier)
+        
+        if cache_key is not None and response != FALLBACK_MESSAGE:
+            self.response_cache.set(cache_key, response)
         return response
     
+    def _response_cache_key(self, messages: List[Dict[str, str]], temperature: float, tier: str) -> Optional[str]:
+        """Cache key for a call, or None if calls at this temperature are not cached."""
+        if not self.enable_response_cache or not self.response_cache.accepts(temperature):
+            return None
+        return self.response_cache.make_key(self.router.model_for(tier), messages, temperature, MAX_RESPONSE_TOKENS)
     
-    async def _call_llm_with_messages(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
-        """Call OpenRouter API to generate text based on a conversation."""
+    async def _request_completion(self, messages: List[Dict[str, str]], temperature: float, tier: str = LARGE_TIER) -> str:
+        """Send one completion request, returning the fallback message on errors."""
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}",
-                "HTTP-Referer": "https://series.app"  # Identifying the application
-            }
-            
             payload = {
-                "model": self.model_name,
+                "model": self.router.model_for(tier),
                 "messages": messages,
                 "temperature": temperature,
-                "max_tokens": 1000,
+                "max_tokens": MAX_RESPONSE_TOKENS,
             }
-                
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=payload
-            )
             
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            else:
-                logger.error(f"Error from OpenRouter API: {response.status_code} - {response.text}")
-                return "I'm having trouble connecting right now. Could you try again in a moment?"
+            started = time.monotonic()
+            response = await self.llm_client.chat_completion(payload)
+            content = response['choices'][0]['message']['content']
+            
+            usage = response.get("usage") or {}
+            self.router.record(
+                tier,
+                time.monotonic() - started,
+                usage.get("prompt_tokens") or self._estimate_prompt_tokens(messages),
+                usage.get("completion_tokens") or count_tokens(content),
+            )
+            return content
                 
+        except LLMError as e:
+            logger.error(f"Error from OpenRouter API: {e.status_code} - {e.text}")
+            return FALLBACK_MESSAGE
         except Exception as e:
             logger.error(f"Error calling OpenRouter: {str(e)}")
-            return "I'm having trouble connecting right now. Could you try again in a moment?"
+            return FALLBACK_MESSAGE
+    
+    async def _stream_llm_with_messages(self, messages: List[Dict[str, str]], temperature: float = 0.7, priority: int = 0, tier: str = LARGE_TIER) -> AsyncIterator[str]:
+        """
+        Stream a completion from OpenRouter, yielding text chunks as they arrive.
+        A cached response is yielded as a single chunk.
+        Raises AdmissionRejected before yielding anything if the LLM admission queue is full.
+        """
+        cache_key = self._response_cache_key(messages, temperature, tier)
+        if cache_key is not None:
+            cached = await self.response_cache.get_async(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        async with self.admission.admit(priority):
+            stream = self._request_completion_stream(messages, temperature, tier, cache_key)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+    
+    async def _request_completion_stream(self, messages: List[Dict[str, str]], temperature: float, tier: str = LARGE_TIER, cache_key: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream one completion request, yielding the fallback message if nothing arrived.
+        A reply that streamed to the end without errors is stored under `cache_key`.
+        """
+        payload = {
+            "model": self.router.model_for(tier),
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": MAX_RESPONSE_TOKENS,
+        }
+        received: List[str] = []
+        started = time.monotonic()
+        
+        stream = self.llm_client.stream_chat_completion(payload)
+        try:
+            async for chunk in stream:
+                received.append(chunk)
+                yield chunk
+            # Streams carry no usage block, so token counts are estimated locally
+            response = "".join(received)
+            self.router.record(tier, time.monotonic() - started, self._estimate_prompt_tokens(messages), count_tokens(response))
+            if cache_key is not None and response:
+                self.response_cache.set(cache_key, response)
+        except LLMError as e:
+            logger.error(f"Error from OpenRouter API: {e.status_code} - {e.text}")
+        except Exception as e:
+            logger.error(f"Error streaming from OpenRouter: {str(e)}")
+        finally:
+            # Close the HTTP stream promptly if the consumer stopped reading early
+            await stream.aclose()
+        
+        # Only fall back if nothing reached the user yet; a partial reply is kept as-is
+        if not received:
+            yield FALLBACK_MESSAGE
+    
+    def _estimate_prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Estimate prompt size when the API does not report usage."""
+        return sum(message_tokens(dict(message)) for message in messages)
+    
+    async def close(self) -> None:
+        """Stop the user actors and background summaries, then release the pooled LLM connections."""
+        await self.actors.close()
+        for task in list(self._summary_tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._summary_tasks.values(), return_exceptions=True)
+        # Persist resident profiles so the next process can rehydrate them
+        self.user_profiles.flush()
+        self.response_cache.close()
+        await self.llm_client.close()
         
     def get_state(self) -> Dict:
         """Return the current state of the agent."""
@@ -228,4 +539,16 @@ IMPORTANT GUIDELINES:
     def set_state(self, state: Dict) -> None:
         """Set the state of the agent."""
         self.agent_id = state.get("agent_id", self.agent_id)
-        self.user_profiles = state.get("user_profiles", {}) 
\ No newline at end of file
+        self.user_profiles.clear()
+        for user_id, profile in state.get("user_profiles", {}).items():
+            self.user_profiles[user_id] = profile
+    
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Return runtime counters for monitoring and tuning."""
+        return {
+            "profile_cache": self.user_profiles.stats(),
+            "llm_admission": self.admission.stats(),
+            "llm_client": self.llm_client.stats(),
+            "model_tiers": self.router.stats(),
+            "response_cache": self.response_cache.stats()
+        } 
\ No newline at end of file
@@ -0,0 +1,358 @@
+import os
+import json
+import zlib
+import struct
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAGIC = b"ZSEG"
+SEGMENT_HEADER = struct.Struct("<4sI")
+
+# zlib only looks back 32 KB, so a longer preset dictionary is wasted
+MAX_DICTIONARY_BYTES = 32 * 1024
+
+# Raw deflate streams: no zlib header or checksum per record
+WBITS = -15
+
+
+def build_dictionary(samples: Iterable[List[str]], max_bytes: int = MAX_DICTIONARY_BYTES) -> bytes:
+    """
+    Build a zlib preset dictionary from payload fragments of sample users.
+
+    Fragments that recur across users (profile field names and common values, the
+    assistant's onboarding questions, common answers) are the redundancy a per-user
+    stream cannot see. The most common are placed last, closest to the data, which is
+    where deflate finds them cheapest.
+
+    Args:
+        samples: Fragments of each sample user, encoded exactly as they appear in its payload
+        max_bytes: Maximum dictionary size
+
+    Returns:
+        The dictionary, empty if nothing recurs
+    """
+    counts: Counter = Counter()
+    for fragments in samples:
+        counts.update(set(fragments))
+
+    pieces: List[bytes] = []
+    size = 0
+    for fragment, count in counts.most_common():
+        if count < 2:
+            break
+        piece = fragment.encode()
+        if size + len(piece) > max_bytes:
+            continue
+        pieces.append(piece)
+        size += len(piece)
+    pieces.reverse()
+    return b"".join(pieces)
+
+
+class ColdStorage:
+    """
+    Archive of compressed user payloads, packed into append-only segment files.
+
+    Each segment starts with a shared zlib dictionary built from the users it holds,
+    followed by one raw deflate stream per user. `index.jsonl` maps each archived user
+    to its segment, offset and length; removals append a tombstone, and later lines win.
+    A segment is synced before its index lines are written, so the index never points
+    at missing data.
+
+    Restored users leave dead records behind. compact_segment() copies the live records
+    of a segment that is mostly dead into a new one (records are moved as they are, with
+    the segment's dictionary, so nothing is recompressed) and deletes it; compact_index()
+    rewrites the index without superseded lines once they outnumber the live ones.
+    """
+
+    def __init__(self, directory: Path):
+        """
+        Open the archive, reading its index.
+
+        Args:
+            directory: Directory holding the segments and the index
+        """
+        self.directory = Path(directory)
+        self.index_path = self.directory / "index.jsonl"
+        # user_id -> {"segment", "offset", "length", "size", "last_active"}
+        self.entries: Dict[str, Dict] = {}
+        self._dictionaries: Dict[str, bytes] = {}
+        # segment -> bytes of its records no entry points at anymore
+        self._segment_dead: Counter = Counter()
+        self._index_lines = 0
+        # Segments written but not indexed yet, which compaction must leave alone
+        self._unindexed: Set[str] = set()
+        self._naming_lock = threading.Lock()
+        self.archived = 0
+        self.compactions = 0
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """Read the index, applying tombstones."""
+        if not self.index_path.exists():
+            return
+        with open(self.index_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append
+                    logger.warning(f"Skipping unreadable entry in {self.index_path}")
+                    continue
+                self._index_lines += 1
+                user_id = entry.pop("user_id")
+                previous = self.entries.pop(user_id, None)
+                if previous is not None:
+                    self._retire(previous)
+                if not entry.get("removed"):
+                    self.entries[user_id] = entry
+
+    @property
+    def dead_bytes(self) -> int:
+        """Bytes of segment records that belong to no archived user."""
+        return sum(self._segment_dead.values())
+
+    def _retire(self, entry: Dict) -> None:
+        """Count a superseded or removed entry's record as dead space."""
+        self._segment_dead[entry["segment"]] += entry["length"]
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self.entries
+
+    def __iter__(self):
+        return iter(list(self.entries))
+
+    def last_active(self, user_id: str) -> float:
+        """Last activity time of an archived user."""
+        return self.entries[user_id]["last_active"]
+
+    def write_segment(self, payloads: Dict[str, Tuple[bytes, List[str], float]]) -> None:
+        """
+        Compress payloads into a new segment and add them to the index.
+
+        Args:
+            payloads: user_id -> (payload, fragments for the dictionary, last activity time)
+        """
+        if not payloads:
+            return
+        name, entries = self.build_segment(payloads)
+        self.add_segment(name, entries)
+
+    def build_segment(self, payloads: Dict[str, Tuple[bytes, List[str], float]]) -> Tuple[str, Dict[str, Dict]]:
+        """
+        Compress payloads into a new, synced segment file without indexing it yet.
+
+        Does not touch the index, so it can run while readers use the archive;
+        add_segment() then makes the users archived.
+
+        Args:
+            payloads: user_id -> (payload, fragments for the dictionary, last activity time)
+
+        Returns:
+            The segment name and the index entry of each user
+        """
+        dictionary = build_dictionary(fragments for _, fragments, _ in payloads.values())
+        records = bytearray(SEGMENT_HEADER.pack(SEGMENT_MAGIC, len(dictionary)) + dictionary)
+        entries = {}
+        for user_id, (payload, _, last_active) in payloads.items():
+            compressor = zlib.compressobj(9, zlib.DEFLATED, WBITS, zdict=dictionary)
+            record = compressor.compress(payload) + compressor.flush()
+            entries[user_id] = {
+                "offset": len(records), "length": len(record), "size": len(payload), "last_active": last_active,
+            }
+            records += record
+        name = self._write_segment_file(records)
+        self._dictionaries[name] = dictionary
+        for entry in entries.values():
+            entry["segment"] = name
+        return name, entries
+
+    def add_segment(self, name: str, entries: Dict[str, Dict]) -> None:
+        """
+        Index the users of a segment from build_segment().
+
+        Args:
+            name: The segment name
+            entries: user_id -> index entry, as returned by build_segment()
+        """
+        self._append_index([json.dumps({"user_id": user_id, **entry}) + "\n" for user_id, entry in entries.items()])
+        self._unindexed.discard(name)
+        for user_id, entry in entries.items():
+            previous = self.entries.get(user_id)
+            if previous is not None:
+                self._retire(previous)
+            self.entries[user_id] = entry
+        self.archived += len(entries)
+
+    def _write_segment_file(self, records: bytes) -> str:
+        """Write and sync a segment under a new name; return the name."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._naming_lock:
+            name = self._next_segment_name()
+            self._unindexed.add(name)
+            # Claims the name before the lock is released
+            tmp_path = self.directory / f"{name}.tmp"
+            open(tmp_path, "wb").close()
+        with open(tmp_path, "wb") as f:
+            f.write(records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.directory / name)
+        return name
+
+    def _next_segment_name(self) -> str:
+        """File name for a new segment, numbered after the existing ones."""
+        numbers = [int(path.name.split("-")[1].split(".")[0]) for path in self.directory.glob("segment-*.zseg*")]
+        return f"segment-{max(numbers, default=0) + 1:06d}.zseg"
+
+    def _append_index(self, lines: List[str]) -> None:
+        """Append lines to the index and sync them."""
+        with open(self.index_path, "a") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self._index_lines += len(lines)
+
+    def read(self, user_id: str) -> bytes:
+        """
+        Read and decompress an archived payload.
+
+        Args:
+            user_id: The archived user
+
+        Returns:
+            The payload as it was archived
+        """
+        entry = self.entries[user_id]
+        path = self.directory / entry["segment"]
+        with open(path, "rb") as f:
+            dictionary = self._dictionaries.get(entry["segment"])
+            if dictionary is None:
+                magic, length = SEGMENT_HEADER.unpack(f.read(SEGMENT_HEADER.size))
+                if magic != SEGMENT_MAGIC:
+                    raise ValueError(f"{path} is not a cold storage segment")
+                dictionary = f.read(length)
+                self._dictionaries[entry["segment"]] = dictionary
+            f.seek(entry["offset"])
+            record = f.read(entry["length"])
+        decompressor = zlib.decompressobj(WBITS, zdict=dictionary)
+        return decompressor.decompress(record) + decompressor.flush()
+
+    def remove(self, user_ids: List[str]) -> None:
+        """
+        Drop users from the archive once they are stored elsewhere again.
+        Their records become dead space in the segment until it is compacted.
+
+        Args:
+            user_ids: Users to remove
+        """
+        user_ids = [user_id for user_id in user_ids if user_id in self.entries]
+        if not user_ids:
+            return
+        self._append_index([json.dumps({"user_id": user_id, "removed": True}) + "\n" for user_id in user_ids])
+        for user_id in user_ids:
+            self._retire(self.entries.pop(user_id))
+
+    def sparse_segments(self) -> List[str]:
+        """Segments whose dead records take more space than their live ones."""
+        live: Counter = Counter()
+        for entry in self.entries.values():
+            live[entry["segment"]] += entry["length"]
+        segments = [path.name for path in self.directory.glob("segment-*.zseg")] if self.directory.exists() else []
+        return sorted(
+            name for name in segments
+            if name not in self._unindexed and (not live[name] or self._segment_dead[name] > live[name])
+        )
+
+    def compact_segment(self, name: str) -> int:
+        """
+        Move a segment's live records into a new segment and delete it.
+
+        The new segment is synced and indexed before the old one is deleted, so a crash
+        at any point leaves every user readable; a leftover copy holds no live users and
+        goes on the next compaction.
+
+        Args:
+            name: Segment to compact, from sparse_segments()
+
+        Returns:
+            The number of bytes reclaimed
+        """
+        path = self.directory / name
+        if name in self._unindexed or not path.exists():
+            return 0
+        users = [user_id for user_id, entry in self.entries.items() if entry["segment"] == name]
+        size = path.stat().st_size
+        moved = {}
+        if users:
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, length = SEGMENT_HEADER.unpack_from(data)
+            if magic != SEGMENT_MAGIC:
+                raise ValueError(f"{path} is not a cold storage segment")
+            dictionary_end = SEGMENT_HEADER.size + length
+            records = bytearray(data[:dictionary_end])
+            for user_id in users:
+                entry = self.entries[user_id]
+                moved[user_id] = {**entry, "offset": len(records)}
+                records += data[entry["offset"]:entry["offset"] + entry["length"]]
+            new_name = self._write_segment_file(records)
+            self._dictionaries[new_name] = data[SEGMENT_HEADER.size:dictionary_end]
+            for entry in moved.values():
+                entry["segment"] = new_name
+            self._append_index([json.dumps({"user_id": user_id, **entry}) + "\n" for user_id, entry in moved.items()])
+            self._unindexed.discard(new_name)
+            self.entries.update(moved)
+            size -= len(records)
+
+        path.unlink()
+        self._dictionaries.pop(name, None)
+        self._segment_dead.pop(name, None)
+        self.compactions += 1
+        return size
+
+    def compact_index(self) -> bool:
+        """
+        Rewrite the index with one line per archived user once superseded lines and
+        tombstones outnumber them. The new index replaces the old one atomically.
+
+        Returns:
+            Whether the index was rewritten
+        """
+        if self._index_lines <= 2 * len(self.entries):
+            return False
+        tmp_path = self.index_path.with_suffix(".jsonl.tmp")
+        with open(tmp_path, "w") as f:
+            f.write("".join(json.dumps({"user_id": user_id, **entry}) + "\n" for user_id, entry in self.entries.items()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._index_lines = len(self.entries)
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        """Return archived user count, compressed and uncompressed sizes and dead space."""
+        compressed = sum(entry["length"] for entry in self.entries.values())
+        raw = sum(entry["size"] for entry in self.entries.values())
+        segment_bytes = sum(path.stat().st_size for path in self.directory.glob("segment-*.zseg")) if self.directory.exists() else 0
+        return {
+            "cold_users": len(self.entries),
+            "cold_bytes": segment_bytes,
+            "cold_live_bytes": compressed,
+            "cold_dead_bytes": self.dead_bytes,
+            "cold_compactions": self.compactions,
+            "cold_uncompressed_bytes": raw,
+            "compression_ratio": raw / compressed if compressed else 0.0,
+            "archived": self.archived,
+        }
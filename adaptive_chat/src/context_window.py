@@ -0,0 +1,96 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to a character-based estimate
+    tiktoken = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Tokens the chat format adds around every message (role marker and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Key under which a message's token count is cached in its history entry
+TOKEN_COUNT_KEY = "token_count"
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Load the tokenizer once; None if tiktoken or its encoding files are unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding, estimating token counts: {str(e)}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in a piece of text."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Roughly four characters per token for English text
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: Dict) -> int:
+    """
+    Get the token cost of a history entry, counting it only the first time.
+
+    The count is cached on the entry itself under TOKEN_COUNT_KEY, so later turns
+    never re-tokenize old messages.
+    """
+    cached = message.get(TOKEN_COUNT_KEY)
+    if cached is None:
+        cached = count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+        message[TOKEN_COUNT_KEY] = cached
+    return cached
+
+
+def select_context_window(
+    history: Sequence[Dict],
+    token_budget: int,
+    pinned_messages: int = 3,
+    max_messages: Optional[int] = None,
+) -> Tuple[List[Dict], int]:
+    """
+    Pick the history entries to send to the LLM within a token budget.
+
+    The first `pinned_messages` entries (the onboarding opener) are always kept.
+    The rest of the budget is filled from the newest message backwards, stopping at
+    the first message that no longer fits, so the cost is proportional to the size of
+    the window rather than the length of the history. The newest message is always
+    included, even if it alone exceeds the budget.
+
+    Args:
+        history: The user's conversation history, oldest first
+        token_budget: Tokens available for history (excluding the system prompt)
+        pinned_messages: Number of leading entries that are always included
+        max_messages: Optional cap on the total number of entries selected
+
+    Returns:
+        A tuple of (selected entries in order, index in `history` where the recent tail starts).
+        Entries between the pinned head and that index were left out of the window.
+    """
+    pinned_count = min(pinned_messages, len(history))
+    used = sum(message_tokens(message) for message in history[:pinned_count])
+
+    start = len(history)
+    while start > pinned_count:
+        if max_messages is not None and pinned_count + len(history) - start >= max_messages:
+            break
+        cost = message_tokens(history[start - 1])
+        if used + cost > token_budget and start < len(history):
+            break
+        used += cost
+        start -= 1
+
+    return list(history[:pinned_count]) + list(history[start:]), start
@@ -1,183 +1,1256 @@
-# import json
-# import os
-# from typing import Dict, List, Optional
-# import datetime
-# from pathlib import Path
-
-# from .models import UserProfile, Message, MessageRole
-
-
-# class ConversationStore:
-#     """
-#     A class that manages persistent storage of user profiles and conversation histories.
-#     Uses simple JSON file storage, could be replaced with a database in production.
-#     """
-    
-#     def __init__(self, data_dir: str = "data"):
-#         """
-#         Initialize the conversation store with a data directory.
-        
-#         Args:
-#             data_dir: Directory where user profiles will be stored
-#         """
-#         self.data_dir = Path(data_dir)
-#         self.ensure_data_dir()
-#         self.profiles: Dict[str, UserProfile] = {}
-#         self.load_all_profiles()
-        
-#     def ensure_data_dir(self) -> None:
-#         """Ensure the data directory exists."""
-#         os.makedirs(self.data_dir, exist_ok=True)
-        
-#     def profile_path(self, user_id: str) -> Path:
-#         """Get the file path for a user profile."""
-#         return self.data_dir / f"{user_id}.json"
-        
-#     def load_all_profiles(self) -> None:
-#         """Load all user profiles from disk."""
-#         for profile_file in self.data_dir.glob("*.json"):
-#             user_id = profile_file.stem
-#             try:
-#                 with open(profile_file, 'r') as f:
-#                     profile_data = json.load(f)
-#                     # Parse dates from ISO format strings
-#                     if "created_at" in profile_data:
-#                         profile_data["created_at"] = datetime.datetime.fromisoformat(profile_data["created_at"])
-#                     if "last_updated" in profile_data:
-#                         profile_data["last_updated"] = datetime.datetime.fromisoformat(profile_data["last_updated"])
-                    
-#                     # Parse message timestamps
-#                     if "conversation_history" in profile_data:
-#                         for message in profile_data["conversation_history"]:
-#                             if "timestamp" in message:
-#                                 message["timestamp"] = datetime.datetime.fromisoformat(message["timestamp"])
-                    
-#                     self.profiles[user_id] = UserProfile(**profile_data)
-#             except Exception as e:
-#                 print(f"Error loading profile {user_id}: {str(e)}")
-                
-#     def get_profile(self, user_id: str) -> UserProfile:
-#         """
-#         Get a user profile by ID, creating it if it doesn't exist.
-        
-#         Args:
-#             user_id: The user ID to get the profile for
-            
-#         Returns:
-#             The user profile
-#         """
-#         if user_id not in self.profiles:
-#             self.profiles[user_id] = UserProfile(user_id=user_id)
-#             self.save_profile(user_id)
-#         return self.profiles[user_id]
-        
-#     def save_profile(self, user_id: str) -> None:
-#         """
-#         Save a user profile to disk.
-        
-#         Args:
-#             user_id: The user ID to save the profile for
-#         """
-#         if user_id not in self.profiles:
-#             return
-            
-#         profile = self.profiles[user_id]
-        
-#         # Update the last updated timestamp
-#         profile.last_updated = datetime.datetime.now()
-        
-#         # Prepare profile data for serialization
-#         profile_dict = profile.dict()
-        
-#         # Convert datetime objects to ISO format strings for JSON serialization
-#         profile_dict["created_at"] = profile_dict["created_at"].isoformat()
-#         profile_dict["last_updated"] = profile_dict["last_updated"].isoformat()
-            
-#         # Convert message timestamps
-#         for message in profile_dict["conversation_history"]:
-#             if "timestamp" in message:
-#                 message["timestamp"] = message["timestamp"].isoformat()
-                
-#         # Save to disk
-#         with open(self.profile_path(user_id), 'w') as f:
-#             json.dump(profile_dict, f, indent=2)
-            
-#     def add_message(self, user_id: str, role: MessageRole, content: str) -> None:
-#         """
-#         Add a message to a user's conversation history.
-        
-#         Args:
-#             user_id: The user ID to add the message for
-#             role: The role of the message sender (user or assistant)
-#             content: The message content
-#         """
-#         profile = self.get_profile(user_id)
-        
-#         message = {
-#             "role": role,
-#             "content": content,
-#             "timestamp": datetime.datetime.now()
-#         }
-        
-#         profile.conversation_history.append(message)
-        
-#         # Update onboarding step if it's a user message
-#         if role == MessageRole.USER and not profile.onboarding_complete:
-#             profile.onboarding_step += 1
-            
-#             # Mark onboarding as complete after all steps plus interest questions
-#             if profile.onboarding_step >= 11:  # 8 onboarding steps + 3 interest questions
-#                 profile.onboarding_complete = True
-        
-#         self.save_profile(user_id)
-        
-#     def get_conversation_history(self, user_id: str, limit: Optional[int] = None) -> List[Message]:
-#         """
-#         Get the conversation history for a user.
-        
-#         Args:
-#             user_id: The user ID to get the history for
-#             limit: Optional limit on the number of messages to return
-            
-#         Returns:
-#             The conversation history as a list of messages
-#         """
-#         profile = self.get_profile(user_id)
-        
-#         # Convert dict messages to Message objects
-#         messages = []
-#         for msg in profile.conversation_history:
-#             messages.append(Message(
-#                 role=msg["role"],
-#                 content=msg["content"],
-#                 timestamp=msg["timestamp"]
-#             ))
-        
-#         if limit is not None and limit > 0:
-#             return messages[-limit:]
-        
-#         return messages
-        
-#     def update_profile(self, user_id: str, profile: UserProfile) -> None:
-#         """
-#         Update a user profile with new data.
-        
-#         Args:
-#             user_id: The user ID to update the profile for
-#             profile: The new profile data
-#         """
-#         self.profiles[user_id] = profile
-#         self.save_profile(user_id)
-        
-#     def clear_history(self, user_id: str) -> None:
-#         """
-#         Clear the conversation history for a user.
-        
-#         Args:
-#             user_id: The user ID to clear the history for
-#         """
-#         profile = self.get_profile(user_id)
-#         profile.conversation_history = []
-#         profile.onboarding_step = 0
-#         profile.onboarding_complete = False
-#         self.save_profile(user_id) 
\ No newline at end of file
+import json
+import os
+import atexit
+import bisect
+import time
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple, Union
+import datetime
+from pathlib import Path
+import logging
+
+from pydantic import ValidationError
+
+from .models import UserProfile, Message, MessageRole
+from .mapped_history import COMPACT_SUFFIX, MappedHistory, append_history, read_history, write_history
+from .cold_storage import ColdStorage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Deepest shard nesting recognised when scanning the data directory
+MAX_SHARD_DEPTH = 4
+
+# A user's history files, including a compaction's staged pair; the profile header is `<user_id>.json`
+HISTORY_SUFFIXES = (
+    ".history.dat", ".history.idx", ".history.jsonl", ".log.jsonl",
+    ".history.dat" + COMPACT_SUFFIX, ".history.idx" + COMPACT_SUFFIX,
+)
+
+# When writes are flushed to stable storage
+FSYNC_POLICIES = ("always", "batched", "never")
+
+# Pagination cursor: a message id (position in the history) or a timestamp
+Cursor = Union[int, datetime.datetime]
+
+
+class NotAProfileError(Exception):
+    """Raised when a `.json` file in the data directory turns out not to be a profile header."""
+
+
+def _page_bounds(total: int, limit: Optional[int], before: Optional[int], after: Optional[int]) -> Tuple[int, int]:
+    """
+    Resolve a page request to a [start, end) range of message ids.
+
+    Without `after` the page is the newest `limit` messages older than `before`
+    (the whole tail when neither is given); with `after` it is the oldest `limit`
+    messages newer than `after`.
+    """
+    end = total if before is None else max(0, min(before, total))
+    if after is not None:
+        start = max(0, after + 1)
+        if limit is not None and limit > 0:
+            end = min(end, start + limit)
+        return start, max(start, end)
+    start = max(0, end - limit) if limit is not None and limit > 0 else 0
+    return start, end
+
+
+def _fsync_paths(paths) -> None:
+    """fsync files or directories by path, skipping any that were removed since."""
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _is_shard_name(name: str) -> bool:
+    """Whether a directory name is a two hex digit shard prefix."""
+    return len(name) == 2 and all(c in "0123456789abcdef" for c in name)
+
+
+def _parse_line(line: bytes) -> Optional[Dict]:
+    """Decode one JSONL entry, or None for a blank or torn line."""
+    try:
+        return json.loads(line) if line.strip() else None
+    except ValueError:
+        return None
+
+
+class ConversationStore:
+    """
+    A class that manages persistent storage of user profiles and conversation histories.
+    Uses simple file storage, could be replaced with a database in production.
+
+    Each user has these files in the data directory:
+    - `<user_id>.json`: small profile header, everything except the conversation history
+    - `<user_id>.log.jsonl`: append-only log of messages added since the last compaction
+    - `<user_id>.history.dat` and `<user_id>.history.idx`: snapshot of the compacted
+      history in the memory-mapped format of mapped_history (message contents plus a
+      fixed-width index), so a count, one message or the tail is read without parsing
+      the rest
+
+    Every message carries a sequence number (its index in the history), so adding a
+    message costs one appended line regardless of conversation length. Once a log grows
+    past `compact_threshold` entries it is folded into the snapshot in the background.
+    Loading skips log entries the snapshot already holds, so a crash mid-compaction
+    never duplicates or loses messages.
+
+    Profiles are loaded lazily: startup only scans the directory into an index of user
+    ids and header mtimes, and a profile is read the first time it is requested. The
+    `warm_profiles` most recently active users can be loaded up front. Histories of at
+    least `mmap_min_messages` messages stay mapped once loaded and messages are decoded
+    as they are accessed; shorter ones are decoded into a plain list.
+
+    With write-behind enabled, saves only mark the user dirty and return. A background
+    flusher writes dirty users every `flush_interval` seconds, or sooner once
+    `flush_batch` users are dirty, so repeated saves of one user cost a single write.
+    `flush()` and `close()` (also run at interpreter exit) write everything out.
+
+    Files live in hash-sharded subdirectories, `shard_depth` levels of two hex digits of
+    the SHA-1 of the user id (`data/3f/a2/<user_id>.json` at depth 2), so no directory
+    grows past a few thousand entries. Users found elsewhere, such as the legacy flat
+    layout, are read and written in place until `reshard()` moves them.
+
+    `archive_idle()` moves users idle for longer than `archive_after_days`, header and
+    history, into the compressed segments of a ColdStorage archive under `data/cold`,
+    which removes their files from the hot directories, and then compacts the archive.
+    It also runs in the background at startup when `archive_after_days` is set. An
+    archived user stays in the index and is restored to hot files the next time the
+    profile is requested.
+
+    Every file is replaced atomically (written to a temporary file, then renamed) or only
+    appended to, so a crash never leaves a half-written header. `fsync_policy` decides
+    when writes reach stable storage: `always` syncs every write before it returns,
+    `batched` syncs everything written in the last `fsync_interval_ms` from a background
+    thread, and `never` leaves it to the OS. Compaction and archiving always sync, since
+    they delete data that only the synced copy holds. Loading validates what a crash can
+    leave behind: temporary files older than `CONVERSATION_STALE_TMP_SECONDS` are removed,
+    a header that is not valid JSON is set aside and rebuilt from defaults around the
+    intact history, and torn log lines and index records are skipped. A header that is
+    valid JSON but does not match the profile schema is left as it is and loading it
+    raises, since resetting it would lose the profile.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+        compact_threshold: Optional[int] = None,
+        warm_profiles: Optional[int] = None,
+        write_behind: Optional[bool] = None,
+        flush_interval: Optional[float] = None,
+        flush_batch: Optional[int] = None,
+        shard_depth: Optional[int] = None,
+        mmap_min_messages: Optional[int] = None,
+        archive_after_days: Optional[float] = None,
+        fsync_policy: Optional[str] = None,
+        fsync_interval_ms: Optional[float] = None,
+    ):
+        """
+        Initialize the conversation store with a data directory.
+
+        Args:
+            data_dir: Directory where user profiles will be stored
+            compact_threshold: Log entries that trigger a background compaction
+            warm_profiles: Number of most recently active profiles to load at startup
+            write_behind: Acknowledge saves immediately and write them from a background thread
+            flush_interval: Maximum seconds a save waits before it is written
+            flush_batch: Number of dirty users that triggers an early flush
+            shard_depth: Levels of hash-prefix subdirectories (0 for a flat directory)
+            mmap_min_messages: Shortest history kept memory-mapped instead of decoded on load
+            archive_after_days: Idle days after which a user is moved to cold storage (0 to only archive on request)
+            fsync_policy: "always", "batched" or "never"
+            fsync_interval_ms: How often batched writes are synced
+        """
+        self.data_dir = Path(data_dir)
+        self.compact_threshold = compact_threshold or int(os.getenv("CONVERSATION_LOG_COMPACT_ENTRIES", "500"))
+        self.shard_depth = shard_depth if shard_depth is not None else int(os.getenv("CONVERSATION_SHARD_DEPTH", "2"))
+        self.mmap_min_messages = (
+            mmap_min_messages if mmap_min_messages is not None else int(os.getenv("CONVERSATION_MMAP_MIN_MESSAGES", "256"))
+        )
+        self.archive_after_days = (
+            archive_after_days if archive_after_days is not None else float(os.getenv("CONVERSATION_ARCHIVE_AFTER_DAYS", "0"))
+        )
+        self.archive_batch = int(os.getenv("CONVERSATION_ARCHIVE_BATCH", "1000"))
+        # Temporary files older than this are left over from a crash; younger ones may be another process's
+        self.stale_tmp_seconds = float(os.getenv("CONVERSATION_STALE_TMP_SECONDS", "3600"))
+        self.fsync_policy = (fsync_policy or os.getenv("CONVERSATION_FSYNC", "batched")).lower()
+        if self.fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {self.fsync_policy!r}, expected one of {', '.join(FSYNC_POLICIES)}")
+        self.fsync_interval = (fsync_interval_ms or float(os.getenv("CONVERSATION_FSYNC_INTERVAL_MS", "100"))) / 1000
+        self.ensure_data_dir()
+        self.cold = ColdStorage(self.data_dir / "cold")
+        self.restores = 0
+        self.profiles: Dict[str, UserProfile] = {}
+        # user_id -> header mtime for every profile on disk, loaded or not
+        self.index: Dict[str, float] = {}
+        # Users whose files are not (or not all) in their shard directory yet, and where they are instead
+        self._misplaced: Dict[str, Path] = {}
+        self._created_dirs: Set[Path] = set()
+        # Messages already written to disk and entries in the uncompacted log, per user
+        self._persisted_counts: Dict[str, int] = {}
+        self._log_entries: Dict[str, int] = {}
+        self._file_locks: Dict[str, threading.Lock] = {}
+        self._compactions: Dict[str, Future] = {}
+        self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-compactor")
+
+        if write_behind is None:
+            write_behind = os.getenv("CONVERSATION_STORE_WRITE_BEHIND", "true").lower() == "true"
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval or float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "0.2"))
+        self.flush_batch = flush_batch or int(os.getenv("CONVERSATION_FLUSH_BATCH", "100"))
+        # Serializes all file writes between the flusher and callers
+        self._io_lock = threading.RLock()
+        self._dirty: Set[str] = set()
+        self._needs_rewrite: Set[str] = set()
+        self._dirty_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._closed = False
+        self.saves = 0
+        self.profile_writes = 0
+        self.recovered_profiles = 0
+        # Files and directories written since the last batched sync
+        self._unsynced: Set[Path] = set()
+        self._sync_lock = threading.Lock()
+        self.syncs = 0
+        self._flusher: Optional[threading.Thread] = None
+        self._syncer: Optional[threading.Thread] = None
+        if self.write_behind:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="conversation-flusher", daemon=True)
+            self._flusher.start()
+        if self.fsync_policy == "batched":
+            self._syncer = threading.Thread(target=self._sync_periodically, name="conversation-fsync", daemon=True)
+            self._syncer.start()
+        if self._flusher is not None or self._syncer is not None:
+            atexit.register(self.close)
+
+        self.build_index()
+        self.warm_up(warm_profiles if warm_profiles is not None else int(os.getenv("CONVERSATION_STORE_WARM_PROFILES", "0")))
+        if self.archive_after_days > 0:
+            # Archiving reads and rewrites files, so it runs off the startup path
+            self._compactor.submit(self.archive_idle)
+
+    def ensure_data_dir(self) -> None:
+        """Ensure the data directory exists."""
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def shard_dir(self, user_id: str) -> Path:
+        """Get the directory a user's files belong in."""
+        if not self.shard_depth:
+            return self.data_dir
+        digest = hashlib.sha1(user_id.encode()).hexdigest()
+        return self.data_dir.joinpath(*(digest[2 * level:2 * level + 2] for level in range(self.shard_depth)))
+
+    def _path(self, user_id: str, suffix: str) -> Path:
+        """Path of one of a user's files, falling back to its old location until it is moved."""
+        path = self.shard_dir(user_id) / f"{user_id}{suffix}"
+        old_dir = self._misplaced.get(user_id)
+        if old_dir is not None and not path.exists():
+            old_path = old_dir / f"{user_id}{suffix}"
+            if old_path.exists():
+                return old_path
+        return path
+
+    def _ensure_shard_dir(self, user_id: str) -> None:
+        """Create a user's shard directory before the first file is written to it."""
+        directory = self.shard_dir(user_id)
+        if directory not in self._created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._created_dirs.add(directory)
+
+    def profile_path(self, user_id: str) -> Path:
+        """Get the file path for a user profile header."""
+        return self._path(user_id, ".json")
+
+    def log_path(self, user_id: str) -> Path:
+        """Get the file path for a user's append-only message log."""
+        return self._path(user_id, ".log.jsonl")
+
+    def history_paths(self, user_id: str) -> Tuple[Path, Path]:
+        """Get the data and index file paths for a user's compacted history snapshot."""
+        return self._path(user_id, ".history.dat"), self._path(user_id, ".history.idx")
+
+    def legacy_history_path(self, user_id: str) -> Path:
+        """Get the file path for a snapshot written before the mapped format."""
+        return self._path(user_id, ".history.jsonl")
+
+    def _lock_for(self, user_id: str) -> threading.Lock:
+        """Lock guarding a user's log and snapshot files."""
+        lock = self._file_locks.get(user_id)
+        if lock is None:
+            lock = self._file_locks.setdefault(user_id, threading.Lock())
+        return lock
+
+    def build_index(self) -> None:
+        """Record the user id and mtime of every profile on disk without reading any of them."""
+        self.index = {}
+        self._misplaced = {}
+        self._scan_dir(self.data_dir, 0)
+
+        # A crash between archiving or restoring a user and removing the other copy leaves
+        # both; the hot files are the newer ones
+        self.cold.remove([user_id for user_id in self.cold if user_id in self.index])
+        for user_id in self.cold:
+            self.index[user_id] = self.cold.last_active(user_id)
+
+    def _scan_dir(self, directory: Path, depth: int) -> None:
+        """Index the profile headers in a directory and its shard subdirectories."""
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if depth < MAX_SHARD_DEPTH and _is_shard_name(entry.name):
+                        self._scan_dir(Path(entry.path), depth + 1)
+                elif entry.name.endswith(".tmp"):
+                    # Left by a crash before the rename; the file it was replacing is intact
+                    try:
+                        if time.time() - entry.stat().st_mtime > self.stale_tmp_seconds:
+                            os.unlink(entry.path)
+                    except FileNotFoundError:
+                        # Renamed into place since the directory was listed
+                        pass
+                elif entry.name.endswith(".json"):
+                    # Indexed by name alone; a file that is not a profile is dropped when first read
+                    user_id = entry.name[:-len(".json")]
+                    self.index[user_id] = entry.stat().st_mtime
+                    if depth != self.shard_depth or directory != self.shard_dir(user_id):
+                        self._misplaced[user_id] = directory
+
+    def misplaced_users(self) -> List[str]:
+        """IDs of users still stored outside their shard directory."""
+        return list(self._misplaced)
+
+    def reshard(self, limit: Optional[int] = None) -> int:
+        """
+        Move users stored outside their shard directory (e.g. the legacy flat layout) into it.
+
+        Safe to run while the store is serving: each user is moved under its locks, one
+        file at a time with os.replace, header last. Reads fall back to the old location
+        per file, so an interrupted run loses nothing and simply resumes on the next call.
+
+        Args:
+            limit: Maximum number of users to move in this call
+
+        Returns:
+            The number of users moved
+        """
+        moved = 0
+        for user_id in list(self._misplaced)[:limit]:
+            with self._io_lock, self._lock_for(user_id):
+                old_dir = self._misplaced[user_id]
+                self._ensure_shard_dir(user_id)
+                target_dir = self.shard_dir(user_id)
+                for suffix in (*HISTORY_SUFFIXES, ".json"):
+                    source = old_dir / f"{user_id}{suffix}"
+                    if source.exists():
+                        os.replace(source, target_dir / source.name)
+                del self._misplaced[user_id]
+            moved += 1
+        return moved
+
+    def warm_up(self, count: int) -> None:
+        """
+        Load the most recently active profiles ahead of their first request.
+
+        Args:
+            count: Number of profiles to load
+        """
+        if count <= 0:
+            return
+        hot = [user_id for user_id in self.index if user_id not in self.cold]
+        recent = sorted(hot, key=self.index.get, reverse=True)[:count]
+        for user_id in recent:
+            self._try_hydrate(user_id)
+
+    def load_all_profiles(self) -> None:
+        """Load all user profiles from disk, leaving archived users in cold storage."""
+        for user_id in list(self.index):
+            if user_id not in self.cold:
+                self._try_hydrate(user_id)
+
+    def user_ids(self) -> List[str]:
+        """IDs of every known user, loaded or not."""
+        return list(self.index)
+
+    def _hydrate(self, user_id: str) -> Optional[UserProfile]:
+        """
+        Load an indexed profile into memory if it is not there already.
+        Returns None if the file turned out not to be a profile.
+
+        Raises:
+            OSError: If the profile's files could not be read
+            ValidationError: If the header does not match the profile schema
+        """
+        profile = self.profiles.get(user_id)
+        if profile is not None:
+            return profile
+        try:
+            with self._io_lock:
+                if user_id in self.cold:
+                    profile = self._restore(user_id)
+                else:
+                    profile = self._load_profile(user_id)
+                # Published under the lock so archive_idle never takes a profile that is in use
+                self.profiles[user_id] = profile
+        except NotAProfileError as e:
+            self._forget(user_id, e)
+            return None
+        return profile
+
+    def _try_hydrate(self, user_id: str) -> None:
+        """Load a profile ahead of its first request, logging rather than raising errors."""
+        try:
+            self._hydrate(user_id)
+        except Exception as e:
+            logger.error(f"Error loading profile {user_id}: {str(e)}")
+
+    def _load_profile(self, user_id: str, upgrade: bool = True) -> UserProfile:
+        """
+        Read a profile header and rebuild its history from the snapshot and the log.
+        With `upgrade`, a profile written before the message log is rewritten in the current
+        layout and kept in memory; without it, it is only read.
+        """
+        path = self.profile_path(user_id)
+        try:
+            with open(path, 'r') as f:
+                profile_data = json.load(f)
+        except ValueError as e:
+            # Torn JSON, only possible if the disk lost writes the rename depended on; keep the history
+            logger.error(f"Unreadable profile header {path}, rebuilding it around the stored history: {str(e)}")
+            os.replace(path, path.with_suffix(".json.corrupt"))
+            return self._recover_profile(user_id)
+        if not isinstance(profile_data, dict) or profile_data.get("user_id") != user_id:
+            # Another tool's file in the data directory; leave it alone
+            raise NotAProfileError(f"{path} is not a profile header")
+        # Profiles written before the message log keep their history inline
+        legacy_history = profile_data.pop("conversation_history", None)
+        try:
+            profile = UserProfile.model_validate(profile_data)
+        except ValidationError as e:
+            # Intact JSON from another version of the profile model, not crash damage: never reset it
+            logger.error(f"Profile header {path} does not match the profile schema, leaving it untouched: {str(e)}")
+            raise
+
+        if legacy_history is not None:
+            for message in legacy_history:
+                if isinstance(message.get("timestamp"), str):
+                    message["timestamp"] = datetime.datetime.fromisoformat(message["timestamp"])
+            profile.conversation_history = legacy_history
+            if not upgrade:
+                return profile
+            self.profiles[user_id] = profile
+            self._rewrite_history(user_id)
+            self._write_profile(user_id)
+            return profile
+
+        with self._lock_for(user_id):
+            self._migrate_legacy_snapshot(user_id)
+            history = read_history(*self.history_paths(user_id), mmap_min_messages=self.mmap_min_messages)
+            log_entries = self._read_entries(self.log_path(user_id), history)
+            self._check_sequence(user_id, history)
+
+        profile.conversation_history = history
+        self._persisted_counts[user_id] = len(history)
+        self._log_entries[user_id] = log_entries
+        return profile
+
+    def _forget(self, user_id: str, error: NotAProfileError) -> None:
+        """Drop a file that is not a profile from the index, without touching it."""
+        logger.warning(f"Ignoring {error}")
+        self.index.pop(user_id, None)
+        self._misplaced.pop(user_id, None)
+
+    def _recover_profile(self, user_id: str) -> UserProfile:
+        """Rebuild a profile whose header was lost from defaults and the stored history."""
+        profile = UserProfile(user_id=user_id)
+        with self._lock_for(user_id):
+            self._migrate_legacy_snapshot(user_id)
+            history = read_history(*self.history_paths(user_id), mmap_min_messages=self.mmap_min_messages)
+            self._log_entries[user_id] = self._read_entries(self.log_path(user_id), history)
+            self._check_sequence(user_id, history)
+        profile.conversation_history = history
+        profile.total_messages = len(history)
+        self._persisted_counts[user_id] = len(history)
+        self.profiles[user_id] = profile
+        self._write_profile(user_id)
+        self.recovered_profiles += 1
+        return profile
+
+    def _check_sequence(self, user_id: str, history: List[Dict]) -> None:
+        """
+        Schedule a rewrite if the files lost messages in a crash, so their sequence numbers
+        match history positions again, or if the log ends in a torn line the next append
+        would be glued onto. Must hold the user's lock.
+        """
+        log_path = self.log_path(user_id)
+        last_seq = self._last_seq(log_path)
+        if (last_seq >= 0 and last_seq != len(history) - 1) or self._ends_torn(log_path):
+            self._needs_rewrite.add(user_id)
+
+    def _ends_torn(self, path: Path) -> bool:
+        """Whether a JSONL file ends in a partial line."""
+        try:
+            with open(path, 'rb') as f:
+                if f.seek(0, os.SEEK_END) == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except FileNotFoundError:
+            return False
+
+    def _migrate_legacy_snapshot(self, user_id: str) -> None:
+        """Convert a JSONL snapshot to the mapped format. Must hold the user's lock."""
+        legacy_path = self.legacy_history_path(user_id)
+        if not legacy_path.exists():
+            return
+        history: List[Dict] = []
+        self._read_entries(legacy_path, history)
+        self._ensure_shard_dir(user_id)
+        write_history(*self.history_paths(user_id), history)
+        legacy_path.unlink()
+
+    def _read_entries(self, path: Path, history: List[Dict]) -> int:
+        """
+        Append the messages of a JSONL file to `history`, skipping sequence numbers it already holds.
+        Returns the number of entries read.
+        """
+        if not path.exists():
+            return 0
+
+        count = 0
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-append
+                    logger.warning(f"Skipping unreadable entry in {path}")
+                    continue
+                count += 1
+                seq = entry.pop("seq")
+                if seq < len(history):
+                    continue
+                if seq > len(history):
+                    logger.warning(f"Gap in message log {path}: expected seq {len(history)}, found {seq}")
+                entry["timestamp"] = datetime.datetime.fromisoformat(entry["timestamp"])
+                history.append(entry)
+        return count
+
+    def archive_idle(self, max_age_days: Optional[float] = None, limit: Optional[int] = None) -> int:
+        """
+        Move users idle for longer than `max_age_days` into cold storage, then reclaim
+        the space restored users left in it.
+
+        Users are written to a new segment in batches of `archive_batch`; their hot files
+        are deleted only once the segment and its index entries are synced. Profiles in
+        memory or with unsaved changes are left alone. The I/O lock is taken per user
+        and per segment, never for a whole batch.
+
+        Args:
+            max_age_days: Idle days before a user is archived (defaults to archive_after_days)
+            limit: Maximum number of users to archive in this call
+
+        Returns:
+            The number of users archived
+        """
+        max_age_days = self.archive_after_days if max_age_days is None else max_age_days
+        cutoff = time.time() - max_age_days * 86400
+        candidates = [
+            user_id for user_id, last_active in list(self.index.items())
+            if last_active < cutoff and user_id not in self.cold and user_id not in self.profiles
+        ][:limit]
+
+        archived = 0
+        for start in range(0, len(candidates), self.archive_batch):
+            if self._closed:
+                break
+            try:
+                archived += self._archive_batch(candidates[start:start + self.archive_batch])
+            except Exception as e:
+                logger.error(f"Error archiving idle users: {str(e)}")
+                break
+        if archived:
+            logger.info(f"Archived {archived} idle users to cold storage")
+        self.compact_cold_storage()
+        return archived
+
+    def compact_cold_storage(self) -> int:
+        """
+        Rewrite cold storage segments that are mostly records of restored users, and
+        the index once most of its lines are superseded.
+
+        Returns:
+            The number of bytes reclaimed
+        """
+        reclaimed = 0
+        try:
+            for segment in self.cold.sparse_segments():
+                if self._closed:
+                    break
+                with self._io_lock:
+                    reclaimed += self.cold.compact_segment(segment)
+            with self._io_lock:
+                self.cold.compact_index()
+        except Exception as e:
+            logger.error(f"Error compacting cold storage: {str(e)}")
+        if reclaimed:
+            logger.info(f"Reclaimed {reclaimed} bytes of cold storage")
+        return reclaimed
+
+    def _archive_batch(self, user_ids: List[str]) -> int:
+        """Write one segment of idle users and remove their hot files."""
+        payloads = {}
+        # Header file of each user as it was read, to spot users written again meanwhile
+        read_headers = {}
+        for user_id in user_ids:
+            with self._io_lock:
+                if user_id in self.profiles or user_id in self.cold or user_id in self._dirty:
+                    continue
+                try:
+                    profile = self._load_profile(user_id)
+                except NotAProfileError as e:
+                    self._forget(user_id, e)
+                    continue
+                except ValidationError:
+                    # Logged by _load_profile; stays hot until it can be read
+                    continue
+                if user_id in self.profiles:
+                    # Loading migrated or recovered the profile, which keeps it in memory
+                    continue
+                read_headers[user_id] = self._header_stamp(user_id)
+                last_active = self.index[user_id]
+            header = json.loads(profile.model_dump_json(exclude={"conversation_history"}))
+            history = [
+                [message["role"], message["content"], message["timestamp"].isoformat()]
+                for message in profile.conversation_history
+            ]
+            payload = json.dumps({"profile": header, "history": history}).encode()
+            # Header fields and messages as they are encoded in the payload, for the shared dictionary
+            fragments = [json.dumps({key: value})[1:-1] for key, value in header.items()]
+            fragments += [json.dumps(content) for _, content, _ in history]
+            payloads[user_id] = (payload, fragments, last_active)
+        if not payloads:
+            return 0
+
+        # Compressing and syncing the segment leaves the archive's index alone, so it runs unlocked
+        segment, entries = self.cold.build_segment(payloads)
+        with self._io_lock:
+            self.cold.add_segment(segment, entries)
+
+        archived = 0
+        for user_id in payloads:
+            with self._io_lock:
+                if (
+                    user_id in self.profiles or user_id in self._dirty
+                    or self._header_stamp(user_id) != read_headers[user_id]
+                ):
+                    # Loaded, saved or imported since it was read; the hot files are newer
+                    self.cold.remove([user_id])
+                    continue
+                with self._lock_for(user_id):
+                    # Header first: without it the user is no longer hot, even if a crash leaves the rest
+                    for suffix in (".json", *HISTORY_SUFFIXES):
+                        self._path(user_id, suffix).unlink(missing_ok=True)
+                self._misplaced.pop(user_id, None)
+                self._persisted_counts.pop(user_id, None)
+                self._log_entries.pop(user_id, None)
+            archived += 1
+        return archived
+
+    def _header_stamp(self, user_id: str) -> Optional[Tuple[int, int, int]]:
+        """Identity of a user's header file: inode, modification time and size."""
+        try:
+            stat = os.stat(self.profile_path(user_id))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read_archived(self, user_id: str) -> UserProfile:
+        """Decode an archived user's profile and history."""
+        payload = json.loads(self.cold.read(user_id))
+        profile = UserProfile.model_validate(payload["profile"])
+        profile.conversation_history = [
+            {"role": role, "content": content, "timestamp": datetime.datetime.fromisoformat(timestamp)}
+            for role, content, timestamp in payload["history"]
+        ]
+        return profile
+
+    def _restore(self, user_id: str) -> UserProfile:
+        """Bring an archived user back to hot files. Must hold the I/O lock."""
+        profile = self._read_archived(user_id)
+        self.profiles[user_id] = profile
+        self._persisted_counts[user_id] = 0
+        self._log_entries[user_id] = 0
+        self._needs_rewrite.add(user_id)
+        self._write_profile(user_id)
+        self.cold.remove([user_id])
+        self.restores += 1
+        return profile
+
+    def export_profile(self, user_id: str) -> Optional[UserProfile]:
+        """
+        Read a stored profile without keeping it in memory or restoring it from cold storage.
+        Used by the migration tool to stream every user out of the store.
+
+        Args:
+            user_id: The user ID to read
+
+        Returns:
+            The profile with its full history, or None for an unknown user
+        """
+        profile = self.profiles.get(user_id)
+        if profile is not None or user_id not in self.index:
+            return profile
+        with self._io_lock:
+            if user_id in self.cold:
+                return self._read_archived(user_id)
+            try:
+                profile = self._load_profile(user_id, upgrade=False)
+            except NotAProfileError as e:
+                self._forget(user_id, e)
+                return None
+            if user_id not in self.profiles:
+                # Loading only repaired files; nothing is tracked for a profile that is not in memory
+                self._persisted_counts.pop(user_id, None)
+                self._log_entries.pop(user_id, None)
+                self._needs_rewrite.discard(user_id)
+        return profile
+
+    def import_profile(self, profile: UserProfile) -> None:
+        """
+        Store a complete profile loaded from elsewhere, replacing any stored copy.
+        Used by the migration tools; the profile is not kept in memory.
+
+        Args:
+            profile: Profile with its full conversation history
+        """
+        user_id = profile.user_id
+        with self._io_lock:
+            with self._dirty_lock:
+                self._dirty.discard(user_id)
+            self.profiles[user_id] = profile
+            self._persisted_counts[user_id] = 0
+            self._log_entries[user_id] = 0
+            self._needs_rewrite.add(user_id)
+            try:
+                self._write_profile(user_id)
+                self.cold.remove([user_id])
+            finally:
+                self.profiles.pop(user_id, None)
+                self._persisted_counts.pop(user_id, None)
+                self._log_entries.pop(user_id, None)
+                self._needs_rewrite.discard(user_id)
+
+    def storage_stats(self) -> Dict[str, float]:
+        """Return the number and on-disk size of hot and archived users."""
+        hot_files = 0
+        hot_bytes = 0
+        # Small files occupy whole filesystem blocks, so allocated space is reported too
+        hot_allocated_bytes = 0
+        directories = [(self.data_dir, 0)]
+        while directories:
+            directory, depth = directories.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if depth < MAX_SHARD_DEPTH and _is_shard_name(entry.name):
+                            directories.append((Path(entry.path), depth + 1))
+                    elif entry.name.endswith((".json", *HISTORY_SUFFIXES)):
+                        stat = entry.stat()
+                        hot_files += 1
+                        hot_bytes += stat.st_size
+                        hot_allocated_bytes += stat.st_blocks * 512
+        return {
+            "hot_users": len(self.index) - len(self.cold.entries),
+            "hot_files": hot_files,
+            "hot_bytes": hot_bytes,
+            "hot_allocated_bytes": hot_allocated_bytes,
+            **self.cold.stats(),
+            "restores": self.restores,
+        }
+
+    def get_profile(self, user_id: str) -> UserProfile:
+        """
+        Get a user profile by ID, creating it if it doesn't exist.
+
+        Args:
+            user_id: The user ID to get the profile for
+
+        Returns:
+            The user profile
+
+        Raises:
+            OSError: If a stored profile could not be read; it is not replaced
+            ValidationError: If a stored header does not match the profile schema
+        """
+        profile = self.profiles.get(user_id)
+        if profile is None and user_id in self.index:
+            # Known user whose profile has not been read since startup
+            profile = self._hydrate(user_id)
+        if profile is not None:
+            return profile
+
+        self.profiles[user_id] = UserProfile(user_id=user_id)
+        self._persisted_counts[user_id] = 0
+        self._log_entries[user_id] = 0
+        self.save_profile(user_id)
+        return self.profiles[user_id]
+
+    def save_profile(self, user_id: str, touch: bool = True) -> None:
+        """
+        Save a user profile to disk.
+
+        Writes the profile header and appends any history entries not yet on disk.
+        With write-behind the write happens later on the flusher thread.
+
+        Args:
+            user_id: The user ID to save the profile for
+            touch: Whether to update the last updated timestamp
+        """
+        if user_id not in self.profiles:
+            return
+
+        # Update the last updated timestamp
+        if touch:
+            self.profiles[user_id].last_updated = datetime.datetime.now()
+        self.saves += 1
+
+        if not self.write_behind or self._closed:
+            with self._io_lock:
+                self._write_profile(user_id)
+            return
+
+        with self._dirty_lock:
+            self._dirty.add(user_id)
+            if len(self._dirty) >= self.flush_batch:
+                self._flush_requested.set()
+
+    def _flush_periodically(self) -> None:
+        """Flusher thread: write dirty users every flush interval, or early when a batch is full."""
+        while not self._closed:
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Write every pending save to disk now."""
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        for user_id in dirty:
+            # One user at a time, so a large batch never holds up loading other profiles
+            with self._io_lock:
+                if user_id not in self.profiles:
+                    # Replaced by import_profile since it was marked dirty
+                    continue
+                try:
+                    self._write_profile(user_id)
+                except Exception as e:
+                    logger.error(f"Error writing profile {user_id}, will retry: {str(e)}")
+                    with self._dirty_lock:
+                        self._dirty.add(user_id)
+
+    def _write_profile(self, user_id: str) -> None:
+        """Write a user's header and unsaved messages. Must hold the I/O lock."""
+        profile = self.profiles[user_id]
+        self._ensure_shard_dir(user_id)
+        if user_id in self._needs_rewrite:
+            self._needs_rewrite.discard(user_id)
+            self._rewrite_history(user_id)
+        else:
+            self._append_new_messages(user_id)
+
+        # The header never includes the history, so it stays small however long the conversation gets
+        header = profile.model_dump_json(exclude={"conversation_history"})
+        path = self.profile_path(user_id)
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(header)
+            if self.fsync_policy == "always":
+                # The contents must be on disk before the rename can be
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._written(path, path.parent)
+        self.index[user_id] = profile.last_updated.timestamp()
+        self.profile_writes += 1
+
+    def _append_new_messages(self, user_id: str) -> None:
+        """Append history entries added since the last save to the user's log."""
+        history = self.profiles[user_id].conversation_history
+        persisted = self._persisted_counts.get(user_id, 0)
+        if persisted > len(history):
+            # The history was replaced by a shorter one; the files must be rewritten
+            self._rewrite_history(user_id)
+            return
+        if persisted == len(history):
+            return
+
+        lines = "".join(self._encode_entry(seq, history[seq]) for seq in range(persisted, len(history)))
+        with self._lock_for(user_id):
+            log_path = self.log_path(user_id)
+            created = not log_path.exists()
+            with open(log_path, 'a') as f:
+                f.write(lines)
+            self._written(log_path, *([log_path.parent] if created else []))
+
+        self._persisted_counts[user_id] = len(history)
+        self._log_entries[user_id] = self._log_entries.get(user_id, 0) + len(history) - persisted
+        if self._log_entries[user_id] >= self.compact_threshold:
+            self._schedule_compaction(user_id)
+
+    def _encode_entry(self, seq: int, message: Dict) -> str:
+        """Serialize one history entry as a log line."""
+        timestamp = message.get("timestamp") or datetime.datetime.now()
+        return json.dumps({
+            "seq": seq,
+            "role": message["role"],
+            "content": message["content"],
+            "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime.datetime) else timestamp,
+        }) + "\n"
+
+    def _rewrite_history(self, user_id: str) -> None:
+        """Replace a user's snapshot with the in-memory history and clear the log."""
+        history = self.profiles[user_id].conversation_history
+        self._ensure_shard_dir(user_id)
+        with self._lock_for(user_id):
+            data_path, index_path = self.history_paths(user_id)
+            write_history(data_path, index_path, history, sync=self.fsync_policy == "always")
+            self.legacy_history_path(user_id).unlink(missing_ok=True)
+            self.log_path(user_id).unlink(missing_ok=True)
+            self._written(data_path, index_path, index_path.parent)
+        self._persisted_counts[user_id] = len(history)
+        self._log_entries[user_id] = 0
+
+    def _written(self, *paths: Path) -> None:
+        """Apply the fsync policy to files (and directories, for renames) just written."""
+        if self.fsync_policy == "always":
+            _fsync_paths(paths)
+            self.syncs += 1
+        elif self.fsync_policy == "batched":
+            with self._sync_lock:
+                self._unsynced.update(paths)
+
+    def _sync_periodically(self) -> None:
+        """Syncer thread: fsync batched writes every fsync interval."""
+        while not self._closed:
+            time.sleep(self.fsync_interval)
+            self.sync()
+
+    def sync(self) -> None:
+        """fsync every file written since the last sync."""
+        with self._sync_lock:
+            paths, self._unsynced = self._unsynced, set()
+        if not paths:
+            return
+        try:
+            _fsync_paths(paths)
+            self.syncs += 1
+        except OSError as e:
+            logger.error(f"Error syncing conversation store files, will retry: {str(e)}")
+            with self._sync_lock:
+                self._unsynced.update(paths)
+
+    def _schedule_compaction(self, user_id: str) -> None:
+        """Fold a user's log into the snapshot on the background thread."""
+        pending = self._compactions.get(user_id)
+        if self._closed or (pending is not None and not pending.done()):
+            return
+        self._log_entries[user_id] = 0
+        self._compactions[user_id] = self._compactor.submit(self.compact, user_id)
+
+    def compact(self, user_id: str) -> None:
+        """
+        Fold a user's message log into the history snapshot and truncate the log.
+
+        The log is appended to the snapshot (and synced) before it is truncated, so a
+        crash in between only leaves entries that loading skips by sequence number.
+
+        Args:
+            user_id: The user ID to compact
+        """
+        try:
+            with self._lock_for(user_id):
+                self._migrate_legacy_snapshot(user_id)
+                log_path = self.log_path(user_id)
+                if not log_path.exists():
+                    return
+                snapshot = MappedHistory(*self.history_paths(user_id))
+                try:
+                    # Entries the snapshot already holds (from an interrupted compaction) are skipped
+                    if not self._read_entries(log_path, snapshot):
+                        return
+                    append_history(*self.history_paths(user_id), snapshot[snapshot.mapped_length:])
+                finally:
+                    snapshot.close()
+                # Appends wait on the lock, so nothing can land in the log between the read and the truncation
+                open(log_path, 'w').close()
+        except Exception as e:
+            logger.error(f"Error compacting message log for {user_id}: {str(e)}")
+
+    def add_message(self, user_id: str, role: MessageRole, content: str) -> None:
+        """
+        Add a message to a user's conversation history.
+
+        Args:
+            user_id: The user ID to add the message for
+            role: The role of the message sender (user or assistant)
+            content: The message content
+        """
+        profile = self.get_profile(user_id)
+
+        message = {
+            "role": role,
+            "content": content,
+            "timestamp": datetime.datetime.now()
+        }
+
+        profile.conversation_history.append(message)
+
+        # Update onboarding step if it's a user message
+        if role == MessageRole.USER and not profile.onboarding_complete:
+            profile.onboarding_step += 1
+
+            # Mark onboarding as complete after all steps plus interest questions
+            if profile.onboarding_step >= 11:  # 8 onboarding steps + 3 interest questions
+                profile.onboarding_complete = True
+
+        self.save_profile(user_id)
+
+    def get_conversation_history(
+        self,
+        user_id: str,
+        limit: Optional[int] = None,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+    ) -> List[Message]:
+        """
+        Get the conversation history for a user, or one page of it.
+
+        Message ids are positions in the history, so pages can be requested relative to a
+        message id or a timestamp. Only the requested page is converted to messages; for a
+        profile that is not in memory, only that page is read from the mapped snapshot
+        and the log.
+
+        Args:
+            user_id: The user ID to get the history for
+            limit: Optional limit on the number of messages to return
+            before: Return the newest messages older than this message id or timestamp
+            after: Return the oldest messages newer than this message id or timestamp
+
+        Returns:
+            The conversation history as a list of messages, oldest first
+        """
+        profile = self.profiles.get(user_id)
+        if profile is None and user_id in self.index and (limit or before is not None or after is not None):
+            page = self._read_page_from_disk(user_id, limit, before, after)
+            if page is not None:
+                return page
+
+        history = self.get_profile(user_id).conversation_history
+        if isinstance(before, datetime.datetime):
+            before = bisect.bisect_left(history, before, key=lambda message: message["timestamp"])
+        if isinstance(after, datetime.datetime):
+            after = bisect.bisect_right(history, after, key=lambda message: message["timestamp"]) - 1
+
+        start, end = _page_bounds(len(history), limit, before, after)
+
+        # Convert dict messages to Message objects
+        messages = []
+        for seq in range(start, end):
+            msg = history[seq]
+            messages.append(Message(
+                id=seq,
+                role=msg["role"],
+                content=msg["content"],
+                timestamp=msg["timestamp"]
+            ))
+
+        return messages
+
+    def _read_page_from_disk(self, user_id: str, limit: Optional[int], before: Optional[Cursor], after: Optional[Cursor]) -> Optional[List[Message]]:
+        """
+        Read one page of a profile that is not in memory, from the mapped snapshot and the log.
+        Returns None for an archived user, which has to be restored first, and for one with
+        neither file, such as a legacy header that keeps its history inline.
+        """
+        with self._lock_for(user_id):
+            if user_id in self.cold:
+                return None
+            self._migrate_legacy_snapshot(user_id)
+            log_path = self.log_path(user_id)
+            if not log_path.exists() and not self.history_paths(user_id)[0].exists():
+                return None
+            snapshot = MappedHistory(*self.history_paths(user_id))
+            try:
+                total = max(len(snapshot) - 1, self._last_seq(log_path)) + 1
+
+                # Timestamp cursors are resolved to message ids by binary search on the snapshot index and the log
+                if isinstance(before, datetime.datetime):
+                    before = min(
+                        self._snapshot_seq_at(snapshot, before, total),
+                        self._seq_at(log_path, "timestamp", before.isoformat(), total),
+                    )
+                if isinstance(after, datetime.datetime):
+                    after = min(
+                        self._snapshot_seq_at(snapshot, after, total, inclusive=False),
+                        self._seq_at(log_path, "timestamp", after.isoformat(), total, inclusive=False),
+                    ) - 1
+
+                start, end = _page_bounds(total, limit, before, after)
+                entries: Dict[int, Dict] = {seq: snapshot[seq] for seq in range(start, min(end, len(snapshot)))}
+            finally:
+                snapshot.close()
+            entries.update(self._read_seq_range(log_path, start, end))
+
+        return [
+            Message(id=seq, role=entry["role"], content=entry["content"], timestamp=entry["timestamp"])
+            for seq, entry in sorted(entries.items())
+        ]
+
+    def _last_seq(self, path: Path) -> int:
+        """Sequence number of the last complete entry in a JSONL file, or -1 if there is none."""
+        if not path.exists():
+            return -1
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            block = b""
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                block = f.read(step) + block
+                lines = block.split(b"\n")
+                # Walk complete lines from the end; the first piece may be cut off unless we reached the start
+                for line in reversed(lines if position == 0 else lines[1:]):
+                    entry = _parse_line(line)
+                    if entry is not None:
+                        return entry["seq"]
+        return -1
+
+    def _seek(self, f, field: str, target, inclusive: bool = True) -> int:
+        """
+        Binary search a JSONL file ordered by `field` for the offset of the first entry
+        whose value is >= target (or > target when not inclusive).
+        """
+        def before_target(entry: Dict) -> bool:
+            return entry[field] < target if inclusive else entry[field] <= target
+
+        f.seek(0, os.SEEK_END)
+        low, high = 0, f.tell()
+        while low < high:
+            middle = (low + high) // 2
+            f.seek(middle)
+            if middle:
+                f.readline()
+            position = f.tell()
+            line = f.readline()
+            if not line or position >= high:
+                high = middle
+                continue
+            entry = _parse_line(line)
+            if entry is None or before_target(entry):
+                low = position + len(line)
+            else:
+                high = middle
+
+        # low is a line start with only lines before the target behind it; skip the few that remain
+        f.seek(low)
+        while True:
+            position = f.tell()
+            line = f.readline()
+            if not line:
+                return position
+            entry = _parse_line(line)
+            if entry is not None and not before_target(entry):
+                return position
+
+    def _seq_at(self, path: Path, field: str, target, total: int, inclusive: bool = True) -> int:
+        """Sequence number of the first entry in a file at or past `target`, or `total` if none."""
+        if not path.exists():
+            return total
+        with open(path, 'rb') as f:
+            f.seek(self._seek(f, field, target, inclusive))
+            entry = _parse_line(f.readline())
+        return entry["seq"] if entry is not None else total
+
+    def _snapshot_seq_at(self, snapshot: MappedHistory, target: datetime.datetime, total: int, inclusive: bool = True) -> int:
+        """Sequence number of the first snapshot message at or past `target`, or `total` if none."""
+        search = bisect.bisect_left if inclusive else bisect.bisect_right
+        seq = search(range(len(snapshot)), target, key=snapshot.timestamp)
+        return seq if seq < len(snapshot) else total
+
+    def _read_seq_range(self, path: Path, start: int, end: int) -> Dict[int, Dict]:
+        """Read the entries with start <= seq < end from a JSONL file."""
+        entries: Dict[int, Dict] = {}
+        if start >= end or not path.exists():
+            return entries
+        with open(path, 'rb') as f:
+            f.seek(self._seek(f, "seq", start))
+            for line in f:
+                entry = _parse_line(line)
+                if entry is None:
+                    continue
+                if entry["seq"] >= end:
+                    break
+                entry["timestamp"] = datetime.datetime.fromisoformat(entry["timestamp"])
+                entries[entry["seq"]] = entry
+        return entries
+
+    def update_profile(self, user_id: str, profile: UserProfile) -> None:
+        """
+        Update a user profile with new data.
+
+        Args:
+            user_id: The user ID to update the profile for
+            profile: The new profile data
+        """
+        previous = self.profiles.get(user_id)
+        self.profiles[user_id] = profile
+        if previous is None or previous.conversation_history is not profile.conversation_history:
+            # A different history object may not extend what is on disk, including that of a
+            # user who is stored but not loaded yet
+            self._needs_rewrite.add(user_id)
+            if previous is None:
+                with self._io_lock:
+                    # The new profile replaces any archived copy as well
+                    self.cold.remove([user_id])
+        self.save_profile(user_id)
+
+    def clear_history(self, user_id: str) -> None:
+        """
+        Clear the conversation history for a user.
+
+        Args:
+            user_id: The user ID to clear the history for
+        """
+        profile = self.get_profile(user_id)
+        profile.conversation_history = []
+        profile.onboarding_step = 0
+        profile.onboarding_complete = False
+        self._needs_rewrite.add(user_id)
+        self.save_profile(user_id)
+
+    def close(self) -> None:
+        """Write all pending saves, stop the flusher and wait for pending compactions."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._flusher is not None:
+            self._flush_requested.set()
+            self._flusher.join()
+        if self._syncer is not None:
+            self._syncer.join()
+        if self._flusher is not None or self._syncer is not None:
+            atexit.unregister(self.close)
+        self.flush()
+        self._compactor.shutdown(wait=True)
+        self.sync()
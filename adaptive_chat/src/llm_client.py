@@ -0,0 +1,443 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Dict, Any, Optional, AsyncIterator, Deque
+import json
+import logging
+
+import httpx
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+class LLMError(Exception):
+    """Raised when the completion endpoint returns a non-200 response."""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class CircuitOpenError(LLMError):
+    """Raised without calling the API while the circuit breaker is open."""
+
+    def __init__(self):
+        super().__init__(503, "circuit breaker open, upstream marked unhealthy")
+
+
+class DeadlineExceededError(LLMError):
+    """Raised when a call, including its retries, runs past its deadline."""
+
+    def __init__(self, deadline: float):
+        super().__init__(504, f"no response within the {deadline:.1f}s call deadline")
+
+
+# Status codes worth retrying: rate limiting and upstream failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the upstream is unhealthy.
+
+    After `failure_threshold` consecutive failures the breaker opens and rejects calls
+    for `reset_timeout` seconds. It then lets a single probe through (half-open): success
+    closes it again, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds to stay open before allowing a probe
+        """
+        self.failure_threshold = failure_threshold or int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("LLM_BREAKER_RESET_TIMEOUT", "30"))
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go to the upstream now."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """Record a healthy response."""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a failed attempt, opening the breaker past the threshold."""
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(f"Opening LLM circuit breaker after {self.consecutive_failures} consecutive failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    """
+    Async client for the OpenRouter chat completions endpoint.
+    Keeps one pooled keep-alive connection set open for the lifetime of the agent,
+    so concurrent calls share warm TLS connections instead of opening a new one each time.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        call_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        hedge: Optional[bool] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        """
+        Initialize the client. Unset arguments fall back to environment variables.
+
+        Args:
+            api_key: OpenRouter API key
+            base_url: Base URL of the OpenAI-compatible API
+            max_connections: Maximum open connections to the API host
+            max_keepalive_connections: Maximum idle connections kept alive for reuse
+            connect_timeout: Seconds allowed to establish a connection
+            read_timeout: Seconds allowed between bytes received from the API
+            call_timeout: Deadline in seconds for a whole call, retries included
+            max_retries: Retries after a 429/5xx or connection failure
+            hedge: Send a second request when the first is slower than the recent p95
+            breaker: Circuit breaker shared by all calls
+        """
+        self.api_key = api_key if api_key is not None else os.getenv("OPENROUTER_API_KEY")
+        self.base_url = (base_url or os.getenv("OPENROUTER_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        # Every request goes to the same host, so the pool limits are per-host limits
+        self.max_connections = max_connections or int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+        self.max_keepalive_connections = max_keepalive_connections or int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "50"))
+        self.connect_timeout = connect_timeout or float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = read_timeout or float(os.getenv("LLM_READ_TIMEOUT", "60"))
+        self.call_timeout = call_timeout or float(os.getenv("LLM_CALL_TIMEOUT", "90"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.retry_base_delay = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+        self.retry_max_delay = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+        self.hedge = hedge if hedge is not None else os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self.breaker = breaker or CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Recent successful request latencies, used to derive the hedging delay
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self.retries = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.fast_failures = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.api_key}",
+                    "HTTP-Referer": "https://series.app"  # Identifying the application
+                },
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+                timeout=httpx.Timeout(
+                    connect=self.connect_timeout,
+                    read=self.read_timeout,
+                    write=self.read_timeout,
+                    pool=self.read_timeout,
+                ),
+            )
+        return self._client
+
+    async def chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a chat completion request.
+
+        Retries 429/5xx responses and connection failures with jittered exponential
+        backoff, optionally hedges slow requests, and gives up once the call deadline
+        passes or the circuit breaker is open.
+
+        Args:
+            payload: Request body in the OpenAI chat completions format
+
+        Returns:
+            The decoded JSON response
+
+        Raises:
+            LLMError: If the API responds with a non-200 status
+            CircuitOpenError: If the upstream is currently marked unhealthy
+            DeadlineExceededError: If no response arrived within the call deadline
+            httpx.HTTPError: On connection errors and timeouts
+        """
+        try:
+            return await asyncio.wait_for(self._call_with_retries(payload), self.call_timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(self.call_timeout)
+
+    async def _call_with_retries(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Run attempts until one succeeds, a non-retryable error occurs or retries run out."""
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                self.fast_failures += 1
+                raise CircuitOpenError()
+            probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+
+            try:
+                result = await self._hedged_request(payload)
+            except (LLMError, httpx.TransportError) as e:
+                if not self._is_retryable(e):
+                    # The upstream answered; a bad request says nothing about its health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(self._backoff_delay(attempt, e))
+                continue
+            except BaseException:
+                # Cut off by the call deadline or the caller before an answer arrived. That says
+                # nothing about the upstream, except that a half-open probe must not stay in
+                # flight forever: count it as a failed probe
+                if probe:
+                    self.breaker.record_failure()
+                raise
+
+            self.breaker.record_success()
+            return result
+
+    async def _hedged_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a request and, if it is still pending after the recent p95 latency, a second
+        identical one. Whichever succeeds first wins; the other is cancelled.
+        """
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None:
+            return await self._request(payload)
+
+        primary = asyncio.ensure_future(self._request(payload))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        self.hedges_sent += 1
+        hedge = asyncio.ensure_future(self._request(payload))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+                if not pending:
+                    # Both failed; surface the primary request's error
+                    return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
+
+    async def _request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a single HTTP request and record its latency."""
+        started = time.monotonic()
+        response = await self._get_client().post("/chat/completions", json=payload)
+        if response.status_code != 200:
+            error = LLMError(response.status_code, response.text)
+            error.retry_after = response.headers.get("retry-after")
+            raise error
+        self._latencies.append(time.monotonic() - started)
+        return response.json()
+
+    def _is_retryable(self, error: Exception) -> bool:
+        """Rate limits, upstream errors and connection failures are worth another try."""
+        if isinstance(error, LLMError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return True
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honoring a numeric Retry-After header."""
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            try:
+                return min(float(retry_after), self.retry_max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    def _hedge_delay(self) -> Optional[float]:
+        """The p95 of recent latencies, or None if hedging is off or there is too little data."""
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        recent = sorted(self._latencies)
+        return recent[int(0.95 * (len(recent) - 1))]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return retry, hedging and circuit breaker counters plus recent latency percentiles."""
+        recent = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            return recent[int(p * (len(recent) - 1))] if recent else 0.0
+
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_times_opened": self.breaker.times_opened,
+            "fast_failures": self.fast_failures,
+            "retries": self.retries,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "p50_latency_seconds": percentile(0.50),
+            "p95_latency_seconds": percentile(0.95),
+            "p99_latency_seconds": percentile(0.99),
+        }
+
+    async def stream_chat_completion(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Send a streaming chat completion request and yield content deltas as they arrive.
+
+        Parses the server-sent events format used by OpenRouter with `stream: true`:
+        `data: {json}` lines carrying `choices[0].delta.content`, `: comment` keep-alive
+        lines, and a final `data: [DONE]`.
+
+        The call deadline covers the whole stream, retries included, so it bounds both the
+        wait for the first token and the total time. Only the client's own waits count
+        against it; a slow consumer between chunks does not.
+
+        Args:
+            payload: Request body in the OpenAI chat completions format
+
+        Yields:
+            Non-empty content fragments in order
+
+        Raises:
+            LLMError: If the API responds with a non-200 status or reports an error mid-stream
+            CircuitOpenError: If the upstream is currently marked unhealthy
+            DeadlineExceededError: If the stream did not finish within the call deadline
+            httpx.HTTPError: On connection errors and timeouts
+        """
+        payload = dict(payload, stream=True)
+        attempt = 0
+        started_streaming = False
+        # Time spent waiting on the upstream; the consumer's time between chunks is not counted
+        waited = 0.0
+
+        async def before_deadline(awaitable):
+            nonlocal waited
+            started = time.monotonic()
+            try:
+                return await asyncio.wait_for(awaitable, max(self.call_timeout - waited, 0))
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError(self.call_timeout)
+            finally:
+                waited += time.monotonic() - started
+
+        while True:
+            if not self.breaker.allow_request():
+                self.fast_failures += 1
+                raise CircuitOpenError()
+            probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+
+            responded = False
+            response = None
+            try:
+                client = self._get_client()
+                response = await before_deadline(
+                    client.send(client.build_request("POST", "/chat/completions", json=payload), stream=True)
+                )
+                if response.status_code != 200:
+                    await before_deadline(response.aread())
+                    error = LLMError(response.status_code, response.text)
+                    error.retry_after = response.headers.get("retry-after")
+                    raise error
+                self.breaker.record_success()
+                responded = True
+
+                lines = response.aiter_lines()
+                while True:
+                    try:
+                        line = await before_deadline(lines.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    # Blank lines separate events and ":" lines are comments (OpenRouter keep-alives)
+                    if not line or line.startswith(":") or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+
+                    event = json.loads(data)
+                    if "error" in event:
+                        error = event["error"]
+                        raise LLMError(error.get("code", 500), error.get("message", str(error)))
+
+                    choices = event.get("choices") or [{}]
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        started_streaming = True
+                        yield content
+                return
+            except DeadlineExceededError:
+                # Out of time rather than an upstream error; see the cancellation case below
+                if probe and not responded:
+                    self.breaker.record_failure()
+                raise
+            except (LLMError, httpx.TransportError) as e:
+                # Once text has reached the caller a retry would duplicate it
+                if started_streaming:
+                    raise
+                if not self._is_retryable(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+                await before_deadline(asyncio.sleep(self._backoff_delay(attempt, e)))
+            except BaseException:
+                # Cancelled or closed before the upstream answered; see _call_with_retries
+                if probe and not responded:
+                    self.breaker.record_failure()
+                raise
+            finally:
+                if response is not None:
+                    await response.aclose()
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,417 @@
+import os
+import sys
+import mmap
+import struct
+import datetime
+import weakref
+from collections.abc import MutableSequence
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import logging
+
+from .models import MessageRole
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Index record per message: content offset and length in the data file, role code,
+# padding, and timestamp in microseconds since EPOCH. Fixed width, so message N is
+# at N * RECORD.size and the count is the index size divided by RECORD.size.
+RECORD = struct.Struct("<QIBxxxq")
+
+ROLES = ("user", "assistant", "system")
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+# Timestamps are naive local times, like everywhere else in the history
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+# Before Python 3.13 every mapping keeps a duplicate of its file descriptor open
+_MAP_KEEPS_FD = sys.version_info < (3, 13)
+
+# Histories kept mapped at once; read_history decodes any beyond this into memory,
+# so long-lived profiles cannot exhaust the descriptor limit
+MAX_OPEN_HISTORIES = int(os.getenv("MAPPED_HISTORY_MAX_OPEN", "64" if _MAP_KEEPS_FD else "4096"))
+_open_histories: "weakref.WeakSet[MappedHistory]" = weakref.WeakSet()
+
+# A compacting rewrite writes the new file pair under these names first
+COMPACT_SUFFIX = ".new"
+
+
+def encode_timestamp(timestamp: Union[datetime.datetime, str, None]) -> int:
+    """Convert a history timestamp to microseconds since EPOCH."""
+    if timestamp is None:
+        timestamp = datetime.datetime.now()
+    elif isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def decode_timestamp(value: int) -> datetime.datetime:
+    """Convert microseconds since EPOCH back to a history timestamp."""
+    return EPOCH + datetime.timedelta(microseconds=value)
+
+
+def history_length(index_path: Path) -> int:
+    """Number of messages in a mapped history, read from the index size alone."""
+    try:
+        return os.path.getsize(index_path) // RECORD.size
+    except FileNotFoundError:
+        return 0
+
+
+def _valid_length(data_path: Path, index_path: Path) -> int:
+    """
+    Number of leading index records whose contents are all in the data file.
+    Without fsync a crash can persist index records ahead of the data they point at.
+    """
+    count = history_length(index_path)
+    if not count:
+        return 0
+    data_size = os.path.getsize(data_path) if data_path.exists() else 0
+    valid = count
+    with open(index_path, "rb") as f:
+        while valid:
+            f.seek((valid - 1) * RECORD.size)
+            offset, length, _, _ = RECORD.unpack(f.read(RECORD.size))
+            if offset + length <= data_size:
+                break
+            valid -= 1
+    if valid < count:
+        logger.warning(f"Ignoring {count - valid} index records of {index_path} past the end of {data_path}")
+    return valid
+
+
+def _map(path: Path, length: int) -> Optional[mmap.mmap]:
+    """Map the first `length` bytes of a file read-only, or None if there is nothing to map."""
+    if length <= 0:
+        return None
+    with open(path, "rb") as f:
+        if _MAP_KEEPS_FD:
+            return mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+        # The mapping stays valid once the file is closed
+        return mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, trackfd=False)
+
+
+def open_histories() -> int:
+    """Number of MappedHistory objects currently holding mappings."""
+    return len(_open_histories)
+
+
+def _compaction_paths(data_path: Path, index_path: Path) -> Tuple[Path, Path]:
+    """Where a compacting rewrite stages the new data and index files."""
+    return data_path.with_name(data_path.name + COMPACT_SUFFIX), index_path.with_name(index_path.name + COMPACT_SUFFIX)
+
+
+def _finish_compaction(data_path: Path, index_path: Path) -> None:
+    """
+    Complete or roll back a compaction interrupted by a crash.
+
+    The new pair is written beside the old one, then the data file is renamed into
+    place and the index after it. If the crash came before the data rename the old pair
+    is intact and the staged files are dropped; after it, only the staged index matches
+    the data file, so it is renamed into place too.
+    """
+    new_data_path, new_index_path = _compaction_paths(data_path, index_path)
+    if new_index_path.exists() and not new_data_path.exists():
+        os.replace(new_index_path, index_path)
+        return
+    new_index_path.unlink(missing_ok=True)
+    new_data_path.unlink(missing_ok=True)
+
+
+class MappedHistory(MutableSequence):
+    """
+    Conversation history backed by a memory-mapped history file pair.
+
+    Messages already on disk are read through the mapped index and data file: the
+    count, a message's role and timestamp, and its raw content bytes are available
+    without decoding anything else, and an entry dict is only built (and cached) when
+    that message is accessed. Messages appended afterwards are kept in memory, so the
+    object can stand in for the plain list in `UserProfile.conversation_history`.
+
+    The mapping is a snapshot of the files when the history was opened; writers only
+    ever append to the data file or replace it and the index, so it stays valid.
+    """
+
+    def __init__(self, data_path: Path, index_path: Path):
+        """
+        Map a history file pair.
+
+        Args:
+            data_path: File holding the message contents
+            index_path: File holding one fixed-width RECORD per message
+        """
+        self.data_path = Path(data_path)
+        self.index_path = Path(index_path)
+        _finish_compaction(self.data_path, self.index_path)
+        self._base_length = _valid_length(self.data_path, self.index_path)
+        self._index = _map(self.index_path, self._base_length * RECORD.size)
+        data_length = 0
+        if self._base_length:
+            offset, length, _, _ = self._record(self._base_length - 1)
+            data_length = offset + length
+        self._data = _map(self.data_path, data_length)
+        # Entries decoded so far, by position, so per-entry caches (token counts) survive
+        self._decoded: Dict[int, Dict] = {}
+        self._tail: List[Dict] = []
+        if self._index is not None:
+            _open_histories.add(self)
+
+    @property
+    def mapped_length(self) -> int:
+        """Number of messages read from the files rather than held in memory."""
+        return self._base_length
+
+    def _record(self, position: int) -> Tuple[int, int, int, int]:
+        return RECORD.unpack_from(self._index, position * RECORD.size)
+
+    def _position(self, position: int) -> int:
+        """Normalize a possibly negative position and check it is in range."""
+        length = len(self)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("history index out of range")
+        return position
+
+    def role(self, position: int) -> str:
+        """Role of a message, without decoding its content."""
+        position = self._position(position)
+        if position >= self._base_length:
+            role = self._tail[position - self._base_length]["role"]
+            return role.value if isinstance(role, MessageRole) else role
+        return ROLES[self._record(position)[2]]
+
+    def timestamp(self, position: int) -> datetime.datetime:
+        """Timestamp of a message, without decoding its content."""
+        position = self._position(position)
+        if position >= self._base_length:
+            return self._tail[position - self._base_length]["timestamp"]
+        return decode_timestamp(self._record(position)[3])
+
+    def content_bytes(self, position: int) -> Union[memoryview, bytes]:
+        """UTF-8 content of a message; a zero-copy slice of the mapping for messages on disk."""
+        position = self._position(position)
+        if position >= self._base_length:
+            return (self._tail[position - self._base_length]["content"] or "").encode()
+        offset, length, _, _ = self._record(position)
+        if not length:
+            return b""
+        return memoryview(self._data)[offset:offset + length]
+
+    def __len__(self) -> int:
+        return self._base_length + len(self._tail)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        position = self._position(position)
+        if position >= self._base_length:
+            return self._tail[position - self._base_length]
+        entry = self._decoded.get(position)
+        if entry is None:
+            offset, length, role, timestamp = self._record(position)
+            entry = {
+                "role": ROLES[role],
+                "content": self._data[offset:offset + length].decode() if length else "",
+                "timestamp": decode_timestamp(timestamp),
+            }
+            self._decoded[position] = entry
+        return entry
+
+    def __setitem__(self, position, value) -> None:
+        if isinstance(position, slice):
+            self._materialize()
+            self._tail[position] = value
+            return
+        position = self._position(position)
+        if position >= self._base_length:
+            self._tail[position - self._base_length] = value
+        else:
+            # Only the in-memory copy changes, the same as for a plain list
+            self._decoded[position] = value
+
+    def __delitem__(self, position) -> None:
+        if not isinstance(position, slice):
+            position = self._position(position)
+            if position >= self._base_length:
+                del self._tail[position - self._base_length]
+                return
+        self._materialize()
+        del self._tail[position]
+
+    def insert(self, position: int, value: Dict) -> None:
+        if position < 0:
+            position = max(0, position + len(self))
+        if position >= self._base_length:
+            self._tail.insert(position - self._base_length, value)
+        else:
+            self._materialize()
+            self._tail.insert(position, value)
+
+    def _materialize(self) -> None:
+        """Decode every mapped message into memory, for edits that reorder the history."""
+        if self._base_length:
+            self._tail = [self[i] for i in range(self._base_length)] + self._tail
+            self._base_length = 0
+            self._decoded = {}
+            self.close()
+
+    def resident_entries(self) -> List[Dict]:
+        """Entries currently held in memory (decoded or appended), for size estimates."""
+        return list(self._decoded.values()) + self._tail
+
+    def close(self) -> None:
+        """Release the mappings. Messages on disk can no longer be read afterwards."""
+        for mapping in (self._index, self._data):
+            if mapping is not None:
+                mapping.close()
+        self._index = None
+        self._data = None
+        _open_histories.discard(self)
+
+    def __repr__(self) -> str:
+        return f"MappedHistory({str(self.data_path)!r}, {len(self)} messages)"
+
+
+def read_history(data_path: Path, index_path: Path, mmap_min_messages: int = 0) -> Union[MappedHistory, List[Dict]]:
+    """
+    Open a mapped history.
+
+    Histories shorter than `mmap_min_messages`, or opened while MAX_OPEN_HISTORIES
+    others are mapped, are decoded into a plain list and the mapping is released.
+
+    Args:
+        data_path: File holding the message contents
+        index_path: File holding the index records
+        mmap_min_messages: Shortest history kept mapped
+
+    Returns:
+        A MappedHistory, or a list of entry dicts
+    """
+    _finish_compaction(data_path, index_path)
+    if history_length(index_path) == 0:
+        return []
+    history = MappedHistory(data_path, index_path)
+    if len(history) >= mmap_min_messages and open_histories() <= MAX_OPEN_HISTORIES:
+        return history
+    entries = history[:]
+    history.close()
+    return entries
+
+
+def _encode_entries(entries: Iterable[Dict], offset: int) -> Tuple[bytes, bytes]:
+    """Encode entries as data bytes and index records, with content starting at `offset`."""
+    data = bytearray()
+    index = bytearray()
+    for message in entries:
+        content = (message.get("content") or "").encode()
+        role = message["role"]
+        role = role.value if isinstance(role, MessageRole) else role
+        index += RECORD.pack(offset + len(data), len(content), ROLE_CODES[role], encode_timestamp(message.get("timestamp")))
+        data += content
+    return bytes(data), bytes(index)
+
+
+def _data_end(index_path: Path, count: int) -> int:
+    """Offset just past the content of the last of `count` indexed messages."""
+    if not count:
+        return 0
+    with open(index_path, "rb") as f:
+        f.seek((count - 1) * RECORD.size)
+        offset, length, _, _ = RECORD.unpack(f.read(RECORD.size))
+    return offset + length
+
+
+def _write_at(path: Path, offset: int, payload: bytes, sync: bool) -> None:
+    """Write bytes at an offset, creating the file if needed, and drop anything after them."""
+    with open(path, "r+b" if path.exists() else "w+b") as f:
+        f.seek(offset)
+        f.write(payload)
+        # Leftovers past the new end are a torn tail or records that outlived their data
+        f.truncate()
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+
+
+def append_history(data_path: Path, index_path: Path, entries: Sequence[Dict], sync: bool = True) -> int:
+    """
+    Append messages to a mapped history.
+
+    The contents are written (and synced) before their index records, so the index
+    only ever points at complete data; a crash leaves at most an unindexed data tail
+    or a partial index record, which the next append overwrites. Unsynced records
+    that outlived their data are overwritten too.
+
+    Args:
+        data_path: File holding the message contents
+        index_path: File holding the index records
+        entries: History entries to append
+        sync: Whether to fsync before returning
+
+    Returns:
+        The number of messages in the history afterwards
+    """
+    _finish_compaction(data_path, index_path)
+    count = _valid_length(data_path, index_path)
+    if not entries:
+        return count
+    offset = _data_end(index_path, count)
+    data, index = _encode_entries(entries, offset)
+    _write_at(data_path, offset, data, sync)
+    _write_at(index_path, count * RECORD.size, index, sync)
+    return count + len(entries)
+
+
+def write_history(data_path: Path, index_path: Path, entries: Sequence[Dict], sync: bool = True) -> None:
+    """
+    Replace the contents of a mapped history.
+
+    The new contents are appended after the old ones and the index is swapped in
+    atomically, so existing mappings and a crash at any point both see either the old
+    or the new history. Once the dead bytes would outweigh the new contents, a fresh
+    data file is written instead (see _finish_compaction); mappings of the old one keep
+    its inode. An empty history replaces both files.
+
+    Args:
+        data_path: File holding the message contents
+        index_path: File holding the index records
+        entries: The complete new history
+        sync: Whether to fsync before returning
+    """
+    _finish_compaction(data_path, index_path)
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    if not entries:
+        open(tmp_path, "wb").close()
+        os.replace(tmp_path, index_path)
+        data_tmp_path = data_path.with_name(data_path.name + ".tmp")
+        open(data_tmp_path, "wb").close()
+        os.replace(data_tmp_path, data_path)
+        return
+
+    offset = os.path.getsize(data_path) if data_path.exists() else 0
+    data, index = _encode_entries(entries, offset)
+    if offset > len(data):
+        data, index = _encode_entries(entries, 0)
+        new_data_path, new_index_path = _compaction_paths(data_path, index_path)
+        for path, payload in ((new_data_path, data), (new_index_path, index)):
+            with open(path, "wb") as f:
+                f.write(payload)
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+        os.replace(new_data_path, data_path)
+        os.replace(new_index_path, index_path)
+        return
+
+    _write_at(data_path, offset, data, sync)
+    with open(tmp_path, "wb") as f:
+        f.write(index)
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, index_path)
@@ -0,0 +1,157 @@
+import os
+import re
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import logging
+
+from .models import UserProfile
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Model tiers a turn can be routed to
+FAST_TIER = "fast"
+LARGE_TIER = "large"
+
+# Assistant questions whose answer is a single structured value (name, email, yes/no, a photo)
+STRUCTURED_QUESTION_PATTERN = re.compile(
+    r"\b(full name|ur name|your name|e-?mail|selfie|photo|pic|ready|sound good|confirm)\b", re.IGNORECASE
+)
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+
+
+class _TierStats:
+    """Latency, token and cost counters for one model tier."""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_latency = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.recent_latencies: Deque[float] = deque(maxlen=1000)
+
+
+class ModelRouter:
+    """
+    Routes each turn to a model tier using cheap local heuristics.
+
+    Turns that answer a structured onboarding question (name, email, confirmation, selfie)
+    with a short reply go to the fast tier; open-ended turns (long messages, user questions,
+    bios and who they want to meet, anything after onboarding) go to the large tier.
+    Per-tier latency, token usage and estimated cost are recorded for tuning.
+    """
+
+    def __init__(
+        self,
+        default_model: str,
+        fast_model: Optional[str] = None,
+        large_model: Optional[str] = None,
+        short_message_words: Optional[int] = None,
+    ):
+        """
+        Initialize the router. Unset arguments fall back to environment variables.
+
+        Args:
+            default_model: Model used for a tier that has no model configured
+            fast_model: Model for simple, structured turns
+            large_model: Model for open-ended turns
+            short_message_words: Longest user message, in words, still eligible for the fast tier
+        """
+        self.enabled = os.getenv("ENABLE_MODEL_ROUTING", "true").lower() == "true"
+        self.models = {
+            FAST_TIER: fast_model or os.getenv("FAST_MODEL_NAME") or default_model,
+            LARGE_TIER: large_model or os.getenv("LARGE_MODEL_NAME") or default_model,
+        }
+        # USD per 1,000 tokens, for cost estimates only
+        self.costs_per_1k_tokens = {
+            FAST_TIER: float(os.getenv("FAST_MODEL_COST_PER_1K_TOKENS", "0")),
+            LARGE_TIER: float(os.getenv("LARGE_MODEL_COST_PER_1K_TOKENS", "0")),
+        }
+        self.short_message_words = short_message_words or int(os.getenv("ROUTER_SHORT_MESSAGE_WORDS", "12"))
+        self._stats = {tier: _TierStats() for tier in self.models}
+
+    def model_for(self, tier: str) -> str:
+        """Get the model name configured for a tier."""
+        return self.models[tier]
+
+    def classify(self, user_profile: UserProfile) -> str:
+        """
+        Pick the tier for the user's latest turn.
+
+        Args:
+            user_profile: Profile whose conversation history ends with the new user message
+
+        Returns:
+            FAST_TIER or LARGE_TIER
+        """
+        if not self.enabled or user_profile.onboarding_complete:
+            return LARGE_TIER
+
+        history = user_profile.conversation_history
+        if not history or history[-1]["role"] != "user":
+            return LARGE_TIER
+
+        message = history[-1]["content"] or ""
+        if "?" in message or len(message.split()) > self.short_message_words:
+            return LARGE_TIER
+
+        # An email address is the answer to the most common structured question
+        if EMAIL_PATTERN.search(message):
+            return FAST_TIER
+
+        last_question = self._last_assistant_message(history)
+        if last_question is not None and STRUCTURED_QUESTION_PATTERN.search(self._final_sentence(last_question)):
+            return FAST_TIER
+
+        return LARGE_TIER
+
+    def _last_assistant_message(self, history: List[Dict]) -> Optional[str]:
+        """The assistant message the user is replying to, if any."""
+        for message in reversed(history[:-1]):
+            if message["role"] == "assistant":
+                return message["content"] or ""
+        return None
+
+    def _final_sentence(self, text: str) -> str:
+        """The question at the end of a reply, which is what the user is answering."""
+        sentences = [s for s in re.split(r"(?<=[.!?])\s+|\n+", text.strip()) if s.strip()]
+        return " ".join(sentences[-2:])
+
+    def record(self, tier: str, latency: float, prompt_tokens: int, completion_tokens: int) -> None:
+        """
+        Record one completed call.
+
+        Args:
+            tier: Tier the call was routed to
+            latency: Seconds the call took
+            prompt_tokens: Tokens sent
+            completion_tokens: Tokens generated
+        """
+        stats = self._stats[tier]
+        stats.calls += 1
+        stats.total_latency += latency
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens
+        stats.recent_latencies.append(latency)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return per-tier call counts, latency percentiles, token usage and estimated cost."""
+        result = {}
+        for tier, stats in self._stats.items():
+            recent = sorted(stats.recent_latencies)
+
+            def percentile(p: float) -> float:
+                return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+
+            tokens = stats.prompt_tokens + stats.completion_tokens
+            result[tier] = {
+                "model": self.models[tier],
+                "calls": stats.calls,
+                "mean_latency_seconds": stats.total_latency / stats.calls if stats.calls else 0.0,
+                "p50_latency_seconds": percentile(0.50),
+                "p95_latency_seconds": percentile(0.95),
+                "prompt_tokens": stats.prompt_tokens,
+                "completion_tokens": stats.completion_tokens,
+                "estimated_cost_usd": tokens / 1000 * self.costs_per_1k_tokens[tier],
+            }
+        return result
@@ -11,6 +11,7 @@ class MessageRole(str, Enum):
 
 
 class Message(BaseModel):
+    id: Optional[int] = None  # position in the user's history, used as a pagination cursor
     role: MessageRole
     content: str
     timestamp: datetime.datetime = Field(default_factory=datetime.datetime.now)
@@ -63,6 +64,10 @@ class UserProfile(BaseModel):
     last_message_timestamp: Optional[datetime.datetime] = None
     total_messages: int = 0
     
+    # Rolling summary of turns that fell out of the LLM context window
+    conversation_summary: Optional[str] = None
+    summarized_until: int = 0  # conversation_history index the summary covers up to (exclusive)
+    
     # Communication style preferences
     # communication_style: CommunicationStyle = Field(default_factory=CommunicationStyle)
     
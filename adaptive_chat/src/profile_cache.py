@@ -0,0 +1,251 @@
+import os
+import datetime
+from collections import OrderedDict
+from itertools import islice
+from pathlib import Path
+from typing import Dict, ItemsView, Iterator, Optional, Sequence, Set, Tuple
+from urllib.parse import quote
+import logging
+
+from .models import UserProfile
+from .mapped_history import MappedHistory, append_history, read_history, write_history
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rough fixed cost of a profile object plus the per-message overhead of a history entry
+_PROFILE_BASE_BYTES = 2048
+_MESSAGE_BASE_BYTES = 256
+
+
+class ProfileCache:
+    """
+    Bounded in-memory LRU of user profiles that spills evicted profiles to disk.
+
+    Profiles beyond `max_entries` (or beyond `max_bytes` of estimated memory) are written
+    to `spill_dir` and dropped from memory, least recently used first. `get` rehydrates a
+    spilled profile transparently, so callers only ever see a profile or None; a spilled
+    profile that cannot be read raises instead of looking like a new user.
+
+    A spilled profile is a JSON header plus its history in the memory-mapped format of
+    mapped_history. Histories of at least `mmap_min_messages` messages come back mapped,
+    so building the context window decodes only the messages it selects. Spilling a
+    resident profile again appends the messages added since it was read back or last
+    spilled. A profile stored after its eviction (`cache[user_id] = profile` with an
+    object fetched earlier) has its whole history rewritten instead, and write_history
+    compacts the data file once earlier rewrites would outweigh it.
+
+    A modified profile that cannot be spilled is not evicted: it stays resident and
+    modified, over budget if need be, and the spill is retried on the next eviction or
+    flush.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+        mmap_min_messages: Optional[int] = None,
+    ):
+        """
+        Initialize the cache. Unset arguments fall back to environment variables.
+
+        Args:
+            max_entries: Maximum number of profiles kept in memory
+            max_bytes: Maximum estimated memory used by resident profiles (0 for no limit)
+            spill_dir: Directory where evicted profiles are stored
+            mmap_min_messages: Shortest history kept memory-mapped when a profile is rehydrated
+        """
+        self.max_entries = max_entries or int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("PROFILE_CACHE_MAX_BYTES", "0"))
+        self.spill_dir = Path(spill_dir or os.getenv("PROFILE_SPILL_DIR", "data/profile_spill"))
+        self.mmap_min_messages = (
+            mmap_min_messages if mmap_min_messages is not None else int(os.getenv("PROFILE_CACHE_MMAP_MIN_MESSAGES", "256"))
+        )
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        self._profiles: "OrderedDict[str, UserProfile]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        # History object and message count last written to the spill files, per resident user
+        self._spilled: Dict[str, Tuple[Sequence, int]] = {}
+        self.resident_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.rehydrations = 0
+        self.evictions = 0
+
+    def spill_path(self, user_id: str) -> Path:
+        """Get the file path for a spilled profile."""
+        return self.spill_dir / f"{quote(user_id, safe='')}.json"
+
+    def history_paths(self, user_id: str) -> Tuple[Path, Path]:
+        """Get the data and index file paths for a spilled profile's history."""
+        name = quote(user_id, safe='')
+        return self.spill_dir / f"{name}.history.dat", self.spill_dir / f"{name}.history.idx"
+
+    def get(self, user_id: str) -> Optional[UserProfile]:
+        """
+        Get a profile, rehydrating it from disk if it was evicted.
+
+        Args:
+            user_id: The user ID to look up
+
+        Returns:
+            The profile, or None if the user has never been stored
+
+        Raises:
+            OSError, ValueError: If the user's spilled profile exists but cannot be read
+        """
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            self.hits += 1
+            self._profiles.move_to_end(user_id)
+            return profile
+
+        self.misses += 1
+        profile = self._load_spilled(user_id)
+        if profile is not None:
+            self.rehydrations += 1
+            self._insert(user_id, profile, dirty=False)
+        return profile
+
+    def __getitem__(self, user_id: str) -> UserProfile:
+        profile = self.get(user_id)
+        if profile is None:
+            raise KeyError(user_id)
+        return profile
+
+    def __setitem__(self, user_id: str, profile: UserProfile) -> None:
+        self._insert(user_id, profile, dirty=True)
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._profiles or (isinstance(user_id, str) and self.spill_path(user_id).exists())
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._profiles)
+
+    def items(self) -> ItemsView[str, UserProfile]:
+        """Resident (user_id, profile) pairs."""
+        return self._profiles.items()
+
+    def _insert(self, user_id: str, profile: UserProfile, dirty: bool) -> None:
+        """Add or refresh a resident profile and evict others if over budget."""
+        self.resident_bytes -= self._sizes.get(user_id, 0)
+        size = self._estimate_size(profile)
+        self._sizes[user_id] = size
+        self.resident_bytes += size
+
+        self._profiles[user_id] = profile
+        self._profiles.move_to_end(user_id)
+        if dirty:
+            self._dirty.add(user_id)
+
+        self._evict_over_budget()
+
+    def _evict_over_budget(self) -> None:
+        """Spill least recently used profiles until within the entry and byte budgets."""
+        # Profiles that failed to spill stay at the front; always keep the most recently used one resident
+        failed = 0
+        while len(self._profiles) - failed > 1 and (
+            len(self._profiles) > self.max_entries
+            or (self.max_bytes and self.resident_bytes > self.max_bytes)
+        ):
+            user_id = next(islice(self._profiles, failed, None))
+            if user_id in self._dirty:
+                if not self._spill(user_id, self._profiles[user_id]):
+                    failed += 1
+                    continue
+                self._dirty.discard(user_id)
+            del self._profiles[user_id]
+            self.resident_bytes -= self._sizes.pop(user_id, 0)
+            self._spilled.pop(user_id, None)
+            self.evictions += 1
+
+    def _estimate_size(self, profile: UserProfile) -> int:
+        """Estimate the memory held by a profile, dominated by its conversation history."""
+        history = profile.conversation_history
+        # Mapped messages live in the page cache, not the heap, until they are decoded
+        messages = history.resident_entries() if isinstance(history, MappedHistory) else history
+        return _PROFILE_BASE_BYTES + sum(
+            _MESSAGE_BASE_BYTES + len(message.get("content") or "") for message in messages
+        )
+
+    def _spill(self, user_id: str, profile: UserProfile) -> bool:
+        """Write a profile to the spill directory. Returns False if it could not be written."""
+        try:
+            history = profile.conversation_history
+            spilled = self._spilled.get(user_id)
+            if spilled is not None and spilled[0] is history and spilled[1] <= len(history):
+                append_history(*self.history_paths(user_id), history[spilled[1]:], sync=False)
+            else:
+                write_history(*self.history_paths(user_id), history, sync=False)
+            self._spilled[user_id] = (history, len(history))
+
+            path = self.spill_path(user_id)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                f.write(profile.model_dump_json(exclude={"conversation_history"}))
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            logger.error(f"Error spilling profile {user_id}: {str(e)}")
+            return False
+
+    def _load_spilled(self, user_id: str) -> Optional[UserProfile]:
+        """
+        Read a spilled profile back from disk.
+
+        Returns None only when the user was never spilled. Any other error is raised:
+        treating an unreadable profile as a new user would replace it with an empty one.
+        """
+        path = self.spill_path(user_id)
+        try:
+            with open(path, "r") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            profile = UserProfile.model_validate_json(data)
+            if profile.conversation_history:
+                # Spilled before histories were stored separately: entries are plain dicts, so their timestamps come back as strings
+                for message in profile.conversation_history:
+                    if isinstance(message.get("timestamp"), str):
+                        message["timestamp"] = datetime.datetime.fromisoformat(message["timestamp"])
+                return profile
+            profile.conversation_history = read_history(*self.history_paths(user_id), mmap_min_messages=self.mmap_min_messages)
+            self._spilled[user_id] = (profile.conversation_history, len(profile.conversation_history))
+            return profile
+        except Exception as e:
+            logger.error(f"Error loading spilled profile {user_id}: {str(e)}")
+            raise
+
+    def flush(self) -> None:
+        """Write every modified resident profile to disk, e.g. before shutdown."""
+        for user_id in list(self._dirty):
+            profile = self._profiles.get(user_id)
+            if profile is None or self._spill(user_id, profile):
+                self._dirty.discard(user_id)
+
+    def clear(self) -> None:
+        """Drop all resident profiles without spilling them."""
+        self._profiles.clear()
+        self._sizes.clear()
+        self._dirty.clear()
+        self._spilled.clear()
+        self.resident_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and eviction counters plus current residency."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "rehydrations": self.rehydrations,
+            "evictions": self.evictions,
+            "resident_profiles": len(self._profiles),
+            "resident_bytes": self.resident_bytes,
+        }
@@ -0,0 +1,573 @@
+import os
+import json
+import bisect
+import sqlite3
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, get_args, get_origin
+import datetime
+import logging
+
+from .models import UserProfile, MessageRole
+from .conversation_store import ConversationStore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Supabase tables, as used by db_client.SupabaseClient
+PROFILE_TABLE = "user_profiles"
+MESSAGE_TABLE = "conversations"
+TABLE_KEYS = {PROFILE_TABLE: "user_id", MESSAGE_TABLE: "message_id"}
+
+# PostgREST returns at most this many rows per request by default
+SUPABASE_PAGE_ROWS = 1000
+
+ROLES = {role.value for role in MessageRole}
+
+# One user's `user_profiles` row and `conversations` rows
+UserRows = Tuple[Dict, List[Dict]]
+
+
+def profile_to_rows(profile: UserProfile) -> UserRows:
+    """
+    Validate a profile and convert it to table rows.
+
+    Rows have the shape db_client.SupabaseClient writes: the profile without its history,
+    and one row per message with a message_id of "<user_id>_<timestamp>". Messages that
+    share a timestamp get a "_<n>" suffix, since an upsert would otherwise keep only one.
+
+    Args:
+        profile: Profile with its full conversation history
+
+    Returns:
+        The profile row and the message rows
+
+    Raises:
+        ValueError: If a message has an unknown role, non-text content or an unreadable timestamp
+    """
+    user_id = profile.user_id
+    if not user_id:
+        raise ValueError("missing user_id")
+    profile_row = profile.model_dump(mode="json", exclude={"conversation_history"})
+
+    message_rows = []
+    repeats: Dict[str, int] = {}
+    for position, message in enumerate(profile.conversation_history):
+        role = message.get("role")
+        role = role.value if isinstance(role, MessageRole) else role
+        if role not in ROLES:
+            raise ValueError(f"message {position} has unknown role {role!r}")
+        content = message.get("content")
+        if not isinstance(content, str):
+            raise ValueError(f"message {position} has no text content")
+        timestamp = message.get("timestamp")
+        if isinstance(timestamp, str):
+            timestamp = datetime.datetime.fromisoformat(timestamp)
+        if not isinstance(timestamp, datetime.datetime):
+            raise ValueError(f"message {position} has no timestamp")
+        timestamp = timestamp.isoformat()
+
+        message_id = f"{user_id}_{timestamp}"
+        seen = repeats.get(message_id, 0)
+        repeats[message_id] = seen + 1
+        if seen:
+            message_id = f"{message_id}_{seen}"
+        message_rows.append({
+            "message_id": message_id, "user_id": user_id, "role": role, "content": content, "timestamp": timestamp,
+        })
+    return profile_row, message_rows
+
+
+def rows_to_profile(profile_row: Dict, message_rows: List[Dict]) -> UserProfile:
+    """
+    Build a profile from its table rows.
+
+    Args:
+        profile_row: The `user_profiles` row
+        message_rows: The user's `conversations` rows, in history order
+
+    Returns:
+        The profile with its full conversation history
+
+    Raises:
+        ValueError: If the profile row does not validate or a timestamp is unreadable
+    """
+    # NULL columns, as in the minimal rows db_client creates for unknown users, take the defaults
+    profile = UserProfile.model_validate({name: value for name, value in profile_row.items() if value is not None})
+    profile.conversation_history = [
+        {"role": row["role"], "content": row["content"], "timestamp": datetime.datetime.fromisoformat(row["timestamp"])}
+        for row in message_rows
+    ]
+    return profile
+
+
+def _is_json_field(annotation) -> bool:
+    """Whether a profile field holds a list or dict (possibly Optional)."""
+    return any(get_origin(arg) in (list, dict) for arg in (annotation, *get_args(annotation)))
+
+
+PROFILE_COLUMNS = [name for name in UserProfile.model_fields if name != "conversation_history"]
+JSON_COLUMNS = {name for name in PROFILE_COLUMNS if _is_json_field(UserProfile.model_fields[name].annotation)}
+
+
+class SQLiteTables:
+    """
+    Local stand-in for the Supabase tables, for testing and benchmarking migrations.
+
+    `user_profiles` has a column per profile field (lists and dicts stored as JSON text)
+    and `conversations` has the message columns, keyed like their Supabase counterparts.
+    `latency_ms` delays every upsert, to model the round trip to a remote database.
+    """
+
+    def __init__(self, db_path: str, latency_ms: Optional[float] = None):
+        """
+        Open the database and create the tables if needed.
+
+        Args:
+            db_path: SQLite database file
+            latency_ms: Delay added to every upsert
+        """
+        self.latency = (latency_ms if latency_ms is not None else float(os.getenv("MIGRATION_STANDIN_LATENCY_MS", "0"))) / 1000
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{name} TEXT PRIMARY KEY" if name == "user_id" else name for name in PROFILE_COLUMNS)
+        self._db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {PROFILE_TABLE} ({columns});
+            CREATE TABLE IF NOT EXISTS {MESSAGE_TABLE} (
+                message_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS {MESSAGE_TABLE}_user_timestamp ON {MESSAGE_TABLE} (user_id, timestamp);
+        """)
+
+    def user_ids(self) -> List[str]:
+        """Every user with a profile row."""
+        return [row[0] for row in self._db.execute(f"SELECT user_id FROM {PROFILE_TABLE}")]
+
+    def select(self, table: str, user_ids: List[str]) -> List[Dict]:
+        """Rows of some users; messages are ordered by timestamp, as db_client reads them."""
+        placeholders = ", ".join("?" * len(user_ids))
+        order = "user_id, timestamp, message_id" if table == MESSAGE_TABLE else "user_id"
+        rows = [dict(row) for row in self._db.execute(
+            f"SELECT * FROM {table} WHERE user_id IN ({placeholders}) ORDER BY {order}", user_ids
+        )]
+        if table == PROFILE_TABLE:
+            for row in rows:
+                for name in JSON_COLUMNS:
+                    if row.get(name) is not None:
+                        row[name] = json.loads(row[name])
+        return rows
+
+    def upsert(self, table: str, rows: List[Dict]) -> None:
+        """Insert rows, replacing those with the same key, in the current transaction."""
+        if not rows:
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        columns = list(rows[0])
+        key = TABLE_KEYS[table]
+        updates = ", ".join(f"{name} = excluded.{name}" for name in columns if name != key)
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({key}) DO UPDATE SET {updates}"
+        )
+        encoded = JSON_COLUMNS if table == PROFILE_TABLE else set()
+        self._db.executemany(sql, [
+            tuple(json.dumps(row[name]) if name in encoded and row[name] is not None else row[name] for name in columns)
+            for row in rows
+        ])
+
+    def commit(self) -> None:
+        """Commit the rows written so far."""
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+
+class SupabaseTables:
+    """The Supabase tables, with the same interface as SQLiteTables."""
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None):
+        """
+        Connect to Supabase.
+
+        Args:
+            url: Project URL (defaults to SUPABASE_URL)
+            key: API key (defaults to SUPABASE_KEY)
+        """
+        try:
+            from supabase import create_client
+        except ImportError as e:
+            raise RuntimeError("The supabase package is required to migrate to or from Supabase") from e
+        url = url or os.getenv("SUPABASE_URL")
+        key = key or os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set to migrate to or from Supabase")
+        self.client = create_client(url, key)
+
+    def _pages(self, query) -> List[Dict]:
+        """Run a query page by page and return all of its rows."""
+        rows: List[Dict] = []
+        while True:
+            page = query.range(len(rows), len(rows) + SUPABASE_PAGE_ROWS - 1).execute().data
+            rows += page
+            if len(page) < SUPABASE_PAGE_ROWS:
+                return rows
+
+    def user_ids(self) -> List[str]:
+        """Every user with a profile row."""
+        return [row["user_id"] for row in self._pages(self.client.table(PROFILE_TABLE).select("user_id").order("user_id"))]
+
+    def select(self, table: str, user_ids: List[str]) -> List[Dict]:
+        """Rows of some users; messages are ordered by timestamp, as db_client reads them."""
+        query = self.client.table(table).select("*").in_("user_id", user_ids).order("user_id")
+        if table == MESSAGE_TABLE:
+            query = query.order("timestamp").order("message_id")
+        return self._pages(query)
+
+    def upsert(self, table: str, rows: List[Dict]) -> None:
+        """Insert rows, replacing those with the same key."""
+        if rows:
+            self.client.table(table).upsert(rows, on_conflict=TABLE_KEYS[table]).execute()
+
+    def commit(self) -> None:
+        """Nothing to do: every upsert request is its own transaction."""
+
+    def close(self) -> None:
+        pass
+
+
+class JsonBackend:
+    """A ConversationStore directory as a migration source or target."""
+
+    def __init__(self, data_dir: str, fsync_policy: str = "batched"):
+        """
+        Open the store.
+
+        Args:
+            data_dir: Store directory
+            fsync_policy: The store's fsync policy; commit() syncs in any case
+        """
+        self.store = ConversationStore(
+            data_dir=data_dir, warm_profiles=0, write_behind=False, archive_after_days=0, fsync_policy=fsync_policy
+        )
+
+    def user_ids(self) -> List[str]:
+        return self.store.user_ids()
+
+    def read(self, user_ids: List[str]) -> List[Tuple[str, Optional[UserProfile], Optional[str]]]:
+        """Read profiles, returning (user_id, profile, None) or (user_id, None, error) for each."""
+        results = []
+        for user_id in user_ids:
+            try:
+                profile = self.store.export_profile(user_id)
+                if profile is None:
+                    raise ValueError("no stored profile")
+                results.append((user_id, profile, None))
+            except Exception as e:
+                results.append((user_id, None, str(e)))
+        return results
+
+    def write(self, users: List[UserRows], batch_rows: int) -> None:
+        """Store users, replacing any stored copies. Each user is written on its own."""
+        for profile_row, message_rows in users:
+            self.store.import_profile(rows_to_profile(profile_row, message_rows))
+
+    def commit(self) -> None:
+        """Sync everything written so far."""
+        self.store.sync()
+
+    def close(self) -> None:
+        self.store.close()
+
+
+class TablesBackend:
+    """The `user_profiles` and `conversations` tables as a migration source or target."""
+
+    def __init__(self, tables):
+        """
+        Args:
+            tables: SQLiteTables or SupabaseTables
+        """
+        self.tables = tables
+
+    def user_ids(self) -> List[str]:
+        return self.tables.user_ids()
+
+    def read(self, user_ids: List[str]) -> List[Tuple[str, Optional[UserProfile], Optional[str]]]:
+        """Read profiles, returning (user_id, profile, None) or (user_id, None, error) for each."""
+        profile_rows = {row["user_id"]: row for row in self.tables.select(PROFILE_TABLE, user_ids)}
+        message_rows: Dict[str, List[Dict]] = {}
+        for row in self.tables.select(MESSAGE_TABLE, user_ids):
+            message_rows.setdefault(row["user_id"], []).append(row)
+
+        results = []
+        for user_id in user_ids:
+            try:
+                if user_id not in profile_rows:
+                    raise ValueError("no profile row")
+                results.append((user_id, rows_to_profile(profile_rows[user_id], message_rows.get(user_id, [])), None))
+            except ValueError as e:
+                results.append((user_id, None, str(e)))
+        return results
+
+    def write(self, users: List[UserRows], batch_rows: int) -> None:
+        """
+        Upsert users' rows, at most `batch_rows` per statement or request. Profiles go
+        first so messages never reference a missing user. Stored messages that are no
+        longer in the source are left in place, as with db_client's upserts.
+        """
+        profile_rows = [profile_row for profile_row, _ in users]
+        message_rows = [row for _, rows in users for row in rows]
+        for table, rows in ((PROFILE_TABLE, profile_rows), (MESSAGE_TABLE, message_rows)):
+            for start in range(0, len(rows), batch_rows):
+                self.tables.upsert(table, rows[start:start + batch_rows])
+
+    def commit(self) -> None:
+        self.tables.commit()
+
+    def close(self) -> None:
+        self.tables.close()
+
+
+def open_backend(spec: str, source: bool = False):
+    """
+    Open a migration backend.
+
+    Args:
+        spec: "json:<data dir>", "sqlite:<database>" (the local stand-in) or "supabase"
+        source: Whether the backend is only read from
+
+    Returns:
+        A JsonBackend or TablesBackend
+    """
+    kind, _, location = spec.partition(":")
+    if kind == "json" and location:
+        # A source only writes when loading repairs a file, so sync those right away
+        return JsonBackend(location, fsync_policy="always" if source else "batched")
+    if kind == "sqlite" and location:
+        return TablesBackend(SQLiteTables(location))
+    if kind == "supabase":
+        return TablesBackend(SupabaseTables())
+    raise ValueError(f"Unknown backend {spec!r}, expected json:<dir>, sqlite:<path> or supabase")
+
+
+def _is_inside(path: Path, directory: Path) -> bool:
+    """Whether a path is in a directory or one of its subdirectories."""
+    try:
+        path.resolve().relative_to(directory.resolve())
+    except ValueError:
+        return False
+    return True
+
+
+# The source opened in each worker process
+_worker_source = None
+
+
+def _open_worker_source(spec: str) -> None:
+    """Worker initializer: open the source once per process."""
+    global _worker_source
+    _worker_source = open_backend(spec, source=True)
+
+
+def _extract(user_ids: List[str]) -> Tuple[List[UserRows], List[Tuple[str, str]]]:
+    """Worker: read and validate some users, returning their rows and the rejected users with reasons."""
+    users = []
+    rejected = []
+    for user_id, profile, error in _worker_source.read(user_ids):
+        try:
+            if profile is None:
+                raise ValueError(error)
+            users.append(profile_to_rows(profile))
+        except ValueError as e:
+            rejected.append((user_id, str(e)))
+    return users, rejected
+
+
+class ProfileMigrator:
+    """
+    Streams every profile from one backend to another.
+
+    Users are taken in user_id order in tasks of `users_per_task`. A process pool reads,
+    parses and validates them into table rows, with at most two tasks per worker in
+    flight so memory stays bounded. The main process writes the rows in order, in
+    batches of about `batch_rows` rows (no statement or request larger than that), and
+    after each committed batch records the last user written in the checkpoint file. A
+    rerun with the same checkpoint continues after that user; the writes are upserts,
+    so a batch cut off by a crash is simply written again. Users that fail validation
+    are logged and skipped.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        target: str,
+        checkpoint_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        batch_rows: Optional[int] = None,
+        users_per_task: Optional[int] = None,
+    ):
+        """
+        Set up a migration.
+
+        Args:
+            source: Backend to read from (see open_backend)
+            target: Backend to write to
+            checkpoint_path: File recording progress, or None to always start from the beginning
+            workers: Parsing and validation processes
+            batch_rows: Rows written per batch
+            users_per_task: Users handed to a worker at a time
+        """
+        self.source = source
+        self.target = target
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        for spec in (source, target):
+            kind, _, location = spec.partition(":")
+            if self.checkpoint_path is not None and kind == "json" and _is_inside(self.checkpoint_path, Path(location)):
+                # The store would index the checkpoint as a user
+                raise ValueError(f"Checkpoint {self.checkpoint_path} must not be inside the {spec} store directory")
+        self.workers = workers or int(os.getenv("MIGRATION_WORKERS", str(os.cpu_count() or 1)))
+        self.batch_rows = batch_rows or int(os.getenv("MIGRATION_BATCH_ROWS", "5000"))
+        self.users_per_task = users_per_task or int(os.getenv("MIGRATION_USERS_PER_TASK", "50"))
+        self.last_user_id: Optional[str] = None
+        self.users = 0
+        self.messages = 0
+        self.rows = 0
+        self.rejected: List[str] = []
+        self._started = 0.0
+        self._rows_at_start = 0
+
+    def _load_checkpoint(self) -> None:
+        """Resume the counters and position of an earlier run."""
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return
+        with open(self.checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+        if (checkpoint["source"], checkpoint["target"]) != (self.source, self.target):
+            raise ValueError(
+                f"{self.checkpoint_path} belongs to a migration from {checkpoint['source']} to {checkpoint['target']}"
+            )
+        self.last_user_id = checkpoint["last_user_id"]
+        self.users = checkpoint["users"]
+        self.messages = checkpoint["messages"]
+        self.rows = checkpoint["rows"]
+        self.rejected = checkpoint["rejected"]
+        logger.info(f"Resuming migration after user {self.last_user_id} ({self.users} users already copied)")
+
+    def _save_checkpoint(self) -> None:
+        """Atomically record the progress made so far."""
+        if self.checkpoint_path is None:
+            return
+        os.makedirs(self.checkpoint_path.parent, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "source": self.source, "target": self.target, "last_user_id": self.last_user_id,
+                "users": self.users, "messages": self.messages, "rows": self.rows, "rejected": self.rejected,
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def stats(self) -> Dict[str, float]:
+        """Users, messages and rows copied (including earlier runs), rejected users, and this run's rate."""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "users": self.users,
+            "messages": self.messages,
+            "rows": self.rows,
+            "rejected": len(self.rejected),
+            "seconds": elapsed,
+            "rows_per_second": (self.rows - self._rows_at_start) / elapsed if elapsed else 0.0,
+        }
+
+    def run(self, restart: bool = False, progress: Optional[Callable[[Dict[str, float]], None]] = None) -> Dict[str, float]:
+        """
+        Copy every user not yet copied.
+
+        Args:
+            restart: Ignore the checkpoint and copy everything again
+            progress: Called with stats() after every committed batch
+
+        Returns:
+            The final stats()
+        """
+        if not restart:
+            self._load_checkpoint()
+
+        source = open_backend(self.source, source=True)
+        try:
+            user_ids = sorted(source.user_ids())
+        finally:
+            source.close()
+        if self.last_user_id is not None:
+            user_ids = user_ids[bisect.bisect_right(user_ids, self.last_user_id):]
+        tasks = (user_ids[start:start + self.users_per_task] for start in range(0, len(user_ids), self.users_per_task))
+
+        self._started = time.perf_counter()
+        self._rows_at_start = self.rows
+        target = open_backend(self.target)
+        # Spawned rather than forked, so workers never inherit the target's threads and locks
+        context = multiprocessing.get_context("spawn")
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context,
+                initializer=_open_worker_source, initargs=(self.source,),
+            ) as pool:
+                pending = deque()
+
+                def submit() -> None:
+                    while len(pending) < 2 * self.workers:
+                        task = next(tasks, None)
+                        if task is None:
+                            return
+                        pending.append((pool.submit(_extract, task), task[-1]))
+
+                submit()
+                batch: List[UserRows] = []
+                batch_size = 0
+                last_user_id = None
+                while pending:
+                    future, last_user_id = pending.popleft()
+                    users, rejected = future.result()
+                    submit()
+                    for user_id, reason in rejected:
+                        logger.warning(f"Skipping user {user_id}: {reason}")
+                        self.rejected.append(user_id)
+                    batch += users
+                    batch_size += sum(1 + len(message_rows) for _, message_rows in users)
+                    if batch_size >= self.batch_rows:
+                        self._write_batch(target, batch, last_user_id, progress)
+                        batch = []
+                        batch_size = 0
+                if last_user_id is not None and last_user_id != self.last_user_id:
+                    self._write_batch(target, batch, last_user_id, progress)
+        finally:
+            target.close()
+        return self.stats()
+
+    def _write_batch(self, target, batch: List[UserRows], last_user_id: str, progress: Optional[Callable]) -> None:
+        """Write and commit a batch, then move the checkpoint past it."""
+        if batch:
+            target.write(batch, self.batch_rows)
+            target.commit()
+        messages = sum(len(message_rows) for _, message_rows in batch)
+        self.users += len(batch)
+        self.messages += messages
+        self.rows += len(batch) + messages
+        self.last_user_id = last_user_id
+        self._save_checkpoint()
+        if progress is not None:
+            progress(self.stats())
@@ -0,0 +1,285 @@
+import os
+import re
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of LLM responses keyed by a normalized hash of the prompt.
+
+    The key covers the model, the sampling parameters and every message, with content
+    case-folded and whitespace collapsed, so replayed or trivially different prompts map
+    to the same entry. Only calls at or below `max_temperature` are cached, by default
+    0.7, which covers both the agent's replies and its summaries.
+
+    Entries are also written to a SQLite file so a restarted process does not start
+    cold. A writer thread with its own connection stores them `commit_batch` at a time,
+    or every `commit_interval` seconds, so set() never waits on a commit; the file is in
+    WAL mode so lookups don't wait on the writer either. Async callers use get_async,
+    which reads the file in a worker thread instead of blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        max_temperature: Optional[float] = None,
+        path: Optional[str] = None,
+        max_disk_entries: Optional[int] = None,
+        commit_batch: Optional[int] = None,
+        commit_interval: Optional[float] = None,
+    ):
+        """
+        Initialize the cache. Unset arguments fall back to environment variables.
+
+        Args:
+            max_entries: Maximum number of responses kept in memory
+            ttl: Seconds a response stays valid
+            max_temperature: Highest sampling temperature whose responses are cached (negative disables caching)
+            path: SQLite file for the persistent tier (empty string for memory only)
+            max_disk_entries: Maximum number of responses kept on disk
+            commit_batch: Responses that trigger an early commit to disk
+            commit_interval: Seconds between commits of pending responses
+        """
+        self.max_entries = max_entries or int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+        self.ttl = ttl or float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+        self.max_temperature = (
+            max_temperature if max_temperature is not None else float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.7"))
+        )
+        self.max_disk_entries = max_disk_entries or int(os.getenv("RESPONSE_CACHE_MAX_DISK_ENTRIES", "100000"))
+        self.commit_batch = commit_batch or int(os.getenv("RESPONSE_CACHE_COMMIT_BATCH", "100"))
+        self.commit_interval = commit_interval or float(os.getenv("RESPONSE_CACHE_COMMIT_INTERVAL", "1.0"))
+        if path is None:
+            path = os.getenv("RESPONSE_CACHE_PATH", "data/response_cache.sqlite3")
+
+        # key -> (response, stored_at)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        # Lookups run in worker threads; one at a time on the reader connection
+        self._db_lock = threading.Lock()
+        # Responses stored but not yet committed; the writer thread takes them in batches
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._commit_requested = threading.Event()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.commits = 0
+        self.persisted = 0
+
+        if path:
+            self._open_db(Path(path))
+
+    def _open_db(self, path: Path) -> None:
+        """Open the persistent tier, drop expired rows and start the writer thread."""
+        try:
+            os.makedirs(path.parent, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_stored_at ON responses (stored_at)")
+            self._db.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+            writer_db = sqlite3.connect(str(path), check_same_thread=False)
+        except sqlite3.Error as e:
+            logger.error(f"Error opening response cache at {path}, caching in memory only: {str(e)}")
+            self._db = None
+            return
+        self._writer = threading.Thread(
+            target=self._write_periodically, args=(writer_db,), name="response-cache-writer", daemon=True
+        )
+        self._writer.start()
+
+    def accepts(self, temperature: float) -> bool:
+        """Whether calls at this temperature are cached."""
+        return temperature <= self.max_temperature
+
+    def make_key(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        """Hash the model parameters and normalized messages into a cache key."""
+        normalized = {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": [
+                [message["role"], _WHITESPACE.sub(" ", message["content"] or "").strip().casefold()]
+                for message in messages
+            ],
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response, checking memory first and then disk.
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            The response, or None on a miss or if the entry expired
+        """
+        response = self._get_resident(key)
+        if response is not None:
+            return response
+        return self._found_on_disk(key, self._load(key))
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """Like get, but reads the persistent tier in a worker thread so the event loop is not blocked."""
+        response = self._get_resident(key)
+        if response is not None:
+            return response
+        entry = await asyncio.to_thread(self._load, key) if self._db is not None else None
+        return self._found_on_disk(key, entry)
+
+    def _get_resident(self, key: str) -> Optional[str]:
+        """Look up a response in memory, dropping it if it expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, stored_at = entry
+        if time.time() - stored_at < self.ttl:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return response
+        del self._entries[key]
+        self.expirations += 1
+        return None
+
+    def _found_on_disk(self, key: str, entry: Optional[Tuple[str, float]]) -> Optional[str]:
+        """Count the outcome of a disk lookup and keep a hit in memory."""
+        if entry is not None:
+            response, stored_at = entry
+            if time.time() - stored_at < self.ttl:
+                self._insert(key, response, stored_at)
+                self.disk_hits += 1
+                return response
+            self.expirations += 1
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response in memory and queue it for the writer thread."""
+        stored_at = time.time()
+        self._insert(key, response, stored_at)
+        self.stores += 1
+
+        if self._writer is None:
+            return
+        with self._pending_lock:
+            self._pending[key] = (response, stored_at)
+            full = len(self._pending) >= self.commit_batch
+        if full:
+            self._commit_requested.set()
+
+    def _write_periodically(self, db: sqlite3.Connection) -> None:
+        """Writer thread: commit pending responses every commit interval, or early when a batch is full."""
+        while not self._closed:
+            self._commit_requested.wait(self.commit_interval)
+            self._commit_requested.clear()
+            self._commit(db)
+        self._commit(db)
+        db.close()
+
+    def _commit(self, db: sqlite3.Connection) -> None:
+        """Write the pending responses in one transaction."""
+        with self._pending_lock:
+            if not self._pending:
+                return
+            pending = self._pending.copy()
+        try:
+            db.executemany(
+                "INSERT OR REPLACE INTO responses (key, response, stored_at) VALUES (?, ?, ?)",
+                [(key, response, stored_at) for key, (response, stored_at) in pending.items()],
+            )
+            # Trim the oldest rows now and then rather than on every write
+            if self.persisted // 1000 != (self.persisted + len(pending)) // 1000:
+                db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+            db.commit()
+        except sqlite3.Error as e:
+            # The responses stay pending and are retried with the next batch
+            logger.error(f"Error persisting cached responses: {str(e)}")
+            db.rollback()
+            return
+        with self._pending_lock:
+            for key, entry in pending.items():
+                if self._pending.get(key) == entry:
+                    del self._pending[key]
+        self.persisted += len(pending)
+        self.commits += 1
+
+    def _insert(self, key: str, response: str, stored_at: float) -> None:
+        """Add an entry to the in-memory LRU, evicting the least recently used if full."""
+        self._entries[key] = (response, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load(self, key: str) -> Optional[Tuple[str, float]]:
+        """Read an entry from the persistent tier, including ones not committed yet."""
+        with self._pending_lock:
+            entry = self._pending.get(key)
+        if entry is not None:
+            return entry
+        with self._db_lock:
+            if self._db is None:
+                return None
+            try:
+                return self._db.execute("SELECT response, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Error reading cached response: {str(e)}")
+                return None
+
+    def close(self) -> None:
+        """Commit pending responses, stop the writer thread and close the persistent tier."""
+        self._closed = True
+        if self._writer is not None:
+            self._commit_requested.set()
+            self._writer.join()
+            self._writer = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit, miss and eviction counters plus the hit rate."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "commits": self.commits,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "resident_entries": len(self._entries),
+        }
@@ -0,0 +1,328 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+import datetime
+import logging
+
+from .models import UserProfile, Message, MessageRole
+from .conversation_store import Cursor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (user_id, seq)
+);
+CREATE INDEX IF NOT EXISTS messages_user_timestamp ON messages (user_id, timestamp);
+"""
+
+UPSERT_PROFILE = "INSERT OR REPLACE INTO profiles (user_id, data, updated_at) VALUES (?, ?, ?)"
+INSERT_MESSAGE = "INSERT OR REPLACE INTO messages (user_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)"
+
+
+class SQLiteConversationStore:
+    """
+    Drop-in SQLite replacement for ConversationStore.
+
+    Profiles are stored as a JSON header row and messages as one row each, keyed by
+    (user_id, seq) with an index on (user_id, timestamp), so recent history can be read
+    without loading the whole conversation. The database runs in WAL mode so readers
+    never block the writer. Writes are group-committed: they share one open transaction
+    that is committed every `commit_batch` writes or `commit_interval` seconds.
+    """
+
+    def __init__(self, db_path: str = "data/conversations.sqlite3", commit_batch: Optional[int] = None, commit_interval: Optional[float] = None):
+        """
+        Initialize the store and create the schema if needed.
+
+        Args:
+            db_path: Path of the SQLite database file
+            commit_batch: Pending writes that force a commit
+            commit_interval: Maximum seconds a write stays uncommitted
+        """
+        self.db_path = db_path
+        self.commit_batch = commit_batch or int(os.getenv("SQLITE_COMMIT_BATCH", "100"))
+        self.commit_interval = commit_interval or float(os.getenv("SQLITE_COMMIT_INTERVAL", "0.05"))
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        # isolation_level=None: transactions are opened and committed explicitly for group commit
+        self._db = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last commits on power loss, never corruption
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+        self._lock = threading.RLock()
+        self._pending_writes = 0
+        self._first_pending_at = 0.0
+        self.commits = 0
+
+        self.profiles: Dict[str, UserProfile] = {}
+        self._persisted_counts: Dict[str, int] = {}
+
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="sqlite-group-commit", daemon=True)
+        self._flusher.start()
+
+    def _write(self, sql: str, rows: List[tuple]) -> None:
+        """Run a write inside the shared transaction and commit once the batch is full."""
+        with self._lock:
+            if not self._db.in_transaction:
+                self._db.execute("BEGIN")
+                self._first_pending_at = time.monotonic()
+            self._db.executemany(sql, rows)
+            self._pending_writes += 1
+            if self._pending_writes >= self.commit_batch:
+                self._commit()
+
+    def _commit(self) -> None:
+        """Commit the shared transaction. Must hold the lock."""
+        if self._db.in_transaction:
+            self._db.execute("COMMIT")
+            self.commits += 1
+        self._pending_writes = 0
+
+    def _flush_periodically(self) -> None:
+        """Commit pending writes that have waited longer than the commit interval."""
+        while not self._closed.wait(self.commit_interval):
+            with self._lock:
+                if self._pending_writes and time.monotonic() - self._first_pending_at >= self.commit_interval:
+                    self._commit()
+
+    def flush(self) -> None:
+        """Commit all pending writes now."""
+        with self._lock:
+            self._commit()
+
+    def get_profile(self, user_id: str) -> UserProfile:
+        """
+        Get a user profile by ID, creating it if it doesn't exist.
+
+        Args:
+            user_id: The user ID to get the profile for
+
+        Returns:
+            The user profile
+        """
+        profile = self.profiles.get(user_id)
+        if profile is not None:
+            return profile
+
+        with self._lock:
+            row = self._db.execute("SELECT data FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+            if row is not None:
+                profile = UserProfile.model_validate_json(row[0])
+                profile.conversation_history = [
+                    self._row_to_entry(message)
+                    for message in self._db.execute(
+                        "SELECT role, content, timestamp FROM messages WHERE user_id = ? ORDER BY seq", (user_id,)
+                    )
+                ]
+
+        if profile is None:
+            profile = UserProfile(user_id=user_id)
+            self.profiles[user_id] = profile
+            self._persisted_counts[user_id] = 0
+            self.save_profile(user_id)
+            return profile
+
+        self.profiles[user_id] = profile
+        self._persisted_counts[user_id] = len(profile.conversation_history)
+        return profile
+
+    def _row_to_entry(self, row: tuple) -> Dict:
+        """Turn a message row into a history entry."""
+        role, content, timestamp = row
+        return {"role": role, "content": content, "timestamp": datetime.datetime.fromisoformat(timestamp)}
+
+    def save_profile(self, user_id: str, touch: bool = True) -> None:
+        """
+        Save a user profile, writing the header and any messages not yet stored.
+
+        Args:
+            user_id: The user ID to save the profile for
+            touch: Whether to update the last updated timestamp
+        """
+        profile = self.profiles.get(user_id)
+        if profile is None:
+            return
+        if touch:
+            profile.last_updated = datetime.datetime.now()
+
+        with self._lock:
+            history = profile.conversation_history
+            persisted = self._persisted_counts.get(user_id, 0)
+            if persisted > len(history):
+                # The history was replaced by a shorter one
+                self._write("DELETE FROM messages WHERE user_id = ?", [(user_id,)])
+                persisted = 0
+            if persisted < len(history):
+                self._write(INSERT_MESSAGE, [self._entry_to_row(user_id, seq, history[seq]) for seq in range(persisted, len(history))])
+            self._persisted_counts[user_id] = len(history)
+
+            self._write(UPSERT_PROFILE, [(user_id, profile.model_dump_json(exclude={"conversation_history"}), time.time())])
+
+    def _entry_to_row(self, user_id: str, seq: int, message: Dict) -> tuple:
+        """Turn a history entry into a message row."""
+        timestamp = message.get("timestamp") or datetime.datetime.now()
+        role = message["role"]
+        return (
+            user_id,
+            seq,
+            role.value if isinstance(role, MessageRole) else role,
+            message["content"],
+            timestamp.isoformat() if isinstance(timestamp, datetime.datetime) else timestamp,
+        )
+
+    def add_message(self, user_id: str, role: MessageRole, content: str) -> None:
+        """
+        Add a message to a user's conversation history.
+
+        Args:
+            user_id: The user ID to add the message for
+            role: The role of the message sender (user or assistant)
+            content: The message content
+        """
+        profile = self.get_profile(user_id)
+
+        message = {
+            "role": role,
+            "content": content,
+            "timestamp": datetime.datetime.now()
+        }
+
+        profile.conversation_history.append(message)
+
+        # Update onboarding step if it's a user message
+        if role == MessageRole.USER and not profile.onboarding_complete:
+            profile.onboarding_step += 1
+
+            # Mark onboarding as complete after all steps plus interest questions
+            if profile.onboarding_step >= 11:  # 8 onboarding steps + 3 interest questions
+                profile.onboarding_complete = True
+
+        self.save_profile(user_id)
+
+    def get_conversation_history(
+        self,
+        user_id: str,
+        limit: Optional[int] = None,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+    ) -> List[Message]:
+        """
+        Get the conversation history for a user, or one page of it.
+
+        Pages are read with a keyset query on (user_id, seq) or the (user_id, timestamp)
+        index, so only the rows of the page are touched.
+
+        Args:
+            user_id: The user ID to get the history for
+            limit: Optional limit on the number of messages to return
+            before: Return the newest messages older than this message id or timestamp
+            after: Return the oldest messages newer than this message id or timestamp
+
+        Returns:
+            The conversation history as a list of messages, oldest first
+        """
+        if not limit and before is None and after is None:
+            history = self.get_profile(user_id).conversation_history
+            return [
+                Message(id=seq, role=msg["role"], content=msg["content"], timestamp=msg["timestamp"])
+                for seq, msg in enumerate(history)
+            ]
+
+        conditions = ["user_id = ?"]
+        params: List = [user_id]
+        for cursor, operator in ((before, "<"), (after, ">")):
+            if isinstance(cursor, datetime.datetime):
+                conditions.append(f"timestamp {operator} ?")
+                params.append(cursor.isoformat())
+            elif cursor is not None:
+                conditions.append(f"seq {operator} ?")
+                params.append(cursor)
+
+        # Without `after` the page is the newest rows before the cursor, so read backwards
+        order = "ASC" if after is not None else "DESC"
+        params.append(limit if limit and limit > 0 else -1)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT seq, role, content, timestamp FROM messages WHERE {' AND '.join(conditions)} "
+                f"ORDER BY seq {order} LIMIT ?",
+                params,
+            ).fetchall()
+        if order == "DESC":
+            rows.reverse()
+        return [Message(id=row[0], **self._row_to_entry(row[1:])) for row in rows]
+
+    def update_profile(self, user_id: str, profile: UserProfile) -> None:
+        """
+        Update a user profile with new data.
+
+        Args:
+            user_id: The user ID to update the profile for
+            profile: The new profile data
+        """
+        previous = self.profiles.get(user_id)
+        self.profiles[user_id] = profile
+        if previous is None or previous.conversation_history is not profile.conversation_history:
+            # A different history object may not extend what is stored
+            with self._lock:
+                self._write("DELETE FROM messages WHERE user_id = ?", [(user_id,)])
+                self._persisted_counts[user_id] = 0
+        self.save_profile(user_id)
+
+    def clear_history(self, user_id: str) -> None:
+        """
+        Clear the conversation history for a user.
+
+        Args:
+            user_id: The user ID to clear the history for
+        """
+        profile = self.get_profile(user_id)
+        profile.conversation_history = []
+        profile.onboarding_step = 0
+        profile.onboarding_complete = False
+        self.save_profile(user_id)
+
+    def import_profile(self, profile: UserProfile) -> None:
+        """
+        Store a complete profile loaded from elsewhere, replacing any stored copy.
+        Used by the JSON migration tool; the profile is not kept in memory.
+
+        Args:
+            profile: Profile with its full conversation history
+        """
+        user_id = profile.user_id
+        with self._lock:
+            self._write("DELETE FROM messages WHERE user_id = ?", [(user_id,)])
+            self._write(INSERT_MESSAGE, [self._entry_to_row(user_id, seq, m) for seq, m in enumerate(profile.conversation_history)])
+            self._write(UPSERT_PROFILE, [(user_id, profile.model_dump_json(exclude={"conversation_history"}), time.time())])
+            self.profiles.pop(user_id, None)
+            self._persisted_counts.pop(user_id, None)
+
+    def has_profile(self, user_id: str) -> bool:
+        """Whether a profile is stored for this user."""
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM profiles WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def close(self) -> None:
+        """Commit pending writes, stop the flusher and close the database."""
+        self._closed.set()
+        self._flusher.join()
+        with self._lock:
+            self._commit()
+            self._db.close()
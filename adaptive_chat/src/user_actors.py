@@ -0,0 +1,121 @@
+import os
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+class _UserActor:
+    """Mailbox and worker task for a single user."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.mailbox: Deque[Tuple[Job, asyncio.Future]] = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class UserActorScheduler:
+    """
+    Per-user actor scheduler.
+
+    Every user gets a mailbox drained by its own worker task, so jobs for one user
+    run strictly in the order they were submitted. Workers for different users run
+    concurrently, but only `max_concurrency` jobs execute at any moment. A worker
+    exits once its mailbox has been empty for `idle_timeout` seconds.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, idle_timeout: Optional[float] = None):
+        """
+        Initialize the scheduler. Unset arguments fall back to environment variables.
+
+        Args:
+            max_concurrency: Maximum number of jobs running at once across all users
+            idle_timeout: Seconds an actor may sit with an empty mailbox before it is reclaimed
+        """
+        self.max_concurrency = max_concurrency or int(os.getenv("MAX_CONCURRENT_USERS", "32"))
+        self.idle_timeout = idle_timeout or float(os.getenv("USER_ACTOR_IDLE_TIMEOUT", "60"))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._actors: Dict[str, _UserActor] = {}
+
+    @property
+    def active_actors(self) -> int:
+        """Number of users that currently have a live actor."""
+        return len(self._actors)
+
+    async def run(self, user_id: str, job: Job) -> Any:
+        """
+        Queue a job on the user's actor and wait for its result.
+
+        Args:
+            user_id: The user the job belongs to
+            job: Zero-argument coroutine function to run
+
+        Returns:
+            Whatever the job returns; exceptions raised by the job are re-raised here
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        actor = self._actors.get(user_id)
+        if actor is None:
+            actor = _UserActor(user_id)
+            self._actors[user_id] = actor
+            actor.task = asyncio.create_task(self._run_actor(actor))
+
+        actor.mailbox.append((job, future))
+        actor.wakeup.set()
+
+        # If the caller gives up, the job still runs to completion so the user's state stays consistent
+        return await asyncio.shield(future)
+
+    async def _run_actor(self, actor: _UserActor) -> None:
+        """Drain one user's mailbox in order, exiting after the idle timeout."""
+        while True:
+            if not actor.mailbox:
+                actor.wakeup.clear()
+                try:
+                    await asyncio.wait_for(actor.wakeup.wait(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+                # Nothing can be queued between this check and removal: both happen without awaiting
+                if not actor.mailbox:
+                    if self._actors.get(actor.user_id) is actor:
+                        del self._actors[actor.user_id]
+                    return
+                continue
+
+            job, future = actor.mailbox.popleft()
+            if future.done():
+                continue
+
+            async with self._slots:
+                try:
+                    result = await job()
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """Stop all actors and cancel jobs that have not started yet."""
+        actors = list(self._actors.values())
+        self._actors.clear()
+        for actor in actors:
+            for _, future in actor.mailbox:
+                future.cancel()
+            actor.mailbox.clear()
+            if actor.task is not None:
+                actor.task.cancel()
+        await asyncio.gather(*(actor.task for actor in actors if actor.task is not None), return_exceptions=True)
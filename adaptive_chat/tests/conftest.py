@@ -0,0 +1,27 @@
+"""
+Shared setup for the adaptive_chat tests.
+
+Puts adaptive_chat/ and benchmarks/ on the path the way the benchmarks do, so tests import
+`src.*` and the benchmark stubs. Run from the repository root or adaptive_chat/:
+    python -m pytest adaptive_chat/tests
+"""
+
+import os
+import sys
+
+import pytest
+
+ADAPTIVE_CHAT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ADAPTIVE_CHAT_DIR)
+sys.path.append(os.path.join(ADAPTIVE_CHAT_DIR, "benchmarks"))
+
+from stub_completion_server import StubCompletionServer
+
+
+@pytest.fixture
+def stub_server():
+    """A local completion server with fault injection, stopped after the test."""
+    server = StubCompletionServer(latency=0.01, seed=1)
+    server.start()
+    yield server
+    server.stop()
@@ -0,0 +1,76 @@
+"""AdmissionScheduler ordering, queue limits and wait timeouts."""
+
+import asyncio
+
+import pytest
+
+from src.admission import AdmissionRejected, AdmissionScheduler
+
+
+def test_queued_calls_are_admitted_by_priority_then_arrival():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_in_flight=1, max_queue=10, max_wait=5)
+        admitted = []
+        release = asyncio.Event()
+
+        async def call(name: str, priority: int) -> None:
+            async with scheduler.admit(priority):
+                admitted.append(name)
+                if name == "running":
+                    await release.wait()
+
+        running = asyncio.create_task(call("running", 0))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(call(name, priority))
+            for name, priority in [("low", 0), ("high", 2), ("mid", 1), ("high again", 2)]
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 4
+        release.set()
+        await asyncio.gather(running, *waiters)
+        assert admitted == ["running", "high", "high again", "mid", "low"]
+        assert scheduler.in_flight == 0 and scheduler.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_and_long_waits_are_rejected():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_in_flight=1, max_queue=1, max_wait=0.05)
+        async with scheduler.admit():
+            waiting = asyncio.create_task(scheduler.admit().__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with scheduler.admit():
+                    pass
+            assert rejected.value.reason == "queue full"
+            with pytest.raises(AdmissionRejected) as timed_out:
+                await waiting
+            assert timed_out.value.reason == "wait timed out"
+        assert (scheduler.rejected, scheduler.timed_out) == (2, 1)
+        assert scheduler.in_flight == 0 and scheduler.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_in_flight=1, max_queue=10, max_wait=5)
+        admitted = []
+
+        async def call(name: str) -> None:
+            async with scheduler.admit():
+                admitted.append(name)
+
+        async with scheduler.admit():
+            cancelled = asyncio.create_task(call("cancelled"))
+            after = asyncio.create_task(call("after"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+        await after
+        assert admitted == ["after"]
+        assert scheduler.in_flight == 0 and scheduler.queue_depth == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,57 @@
+"""ColdStorage segments and compaction."""
+
+import json
+
+from src.cold_storage import ColdStorage
+
+
+def payloads(users, start: int = 0) -> dict:
+    return {
+        f"user_{i}": (json.dumps({"name": f"user {i}", "bio": "founder " * 20}).encode(), ["founder"], 1.0)
+        for i in range(start, start + users)
+    }
+
+
+def segment_bytes(cold: ColdStorage) -> int:
+    return sum(path.stat().st_size for path in cold.directory.glob("segment-*.zseg"))
+
+
+def test_compaction_reclaims_restored_users(tmp_path):
+    cold = ColdStorage(tmp_path)
+    archived = payloads(40)
+    cold.write_segment(archived)
+    cold.write_segment(payloads(10, start=40))
+    before = segment_bytes(cold)
+
+    cold.remove([f"user_{i}" for i in range(30)])
+    sparse = cold.sparse_segments()
+    assert sparse == ["segment-000001.zseg"]
+    reclaimed = sum(cold.compact_segment(name) for name in sparse)
+    assert reclaimed > 0 and segment_bytes(cold) == before - reclaimed
+    assert cold.dead_bytes == 0
+    assert cold.compact_index()
+
+    reopened = ColdStorage(tmp_path)
+    assert sorted(reopened, key=lambda user_id: int(user_id.split("_")[1])) == [f"user_{i}" for i in range(30, 50)]
+    for user_id in reopened:
+        assert reopened.read(user_id) == (archived.get(user_id) or payloads(10, start=40)[user_id])[0]
+    with open(reopened.index_path) as f:
+        assert len(f.readlines()) == 20
+
+
+def test_fully_dead_and_unindexed_segments(tmp_path):
+    cold = ColdStorage(tmp_path)
+    cold.write_segment(payloads(5))
+    cold.remove([f"user_{i}" for i in range(5)])
+    # A segment that a crash left before its index lines were written
+    name, _ = cold.build_segment(payloads(5, start=5))
+
+    # Until it is indexed, a segment being written is left alone
+    assert cold.sparse_segments() == ["segment-000001.zseg"]
+    reopened = ColdStorage(tmp_path)
+    assert reopened.sparse_segments() == ["segment-000001.zseg", name]
+    for segment in reopened.sparse_segments():
+        reopened.compact_segment(segment)
+    assert segment_bytes(reopened) == 0
+    assert reopened.compact_index()
+    assert reopened.index_path.read_text() == ""
@@ -0,0 +1,282 @@
+"""ConversationStore write-behind flushing, crash recovery and archiving."""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from src.conversation_store import ConversationStore
+from src.models import MessageRole, UserProfile
+
+
+def make_store(data_dir, **kwargs) -> ConversationStore:
+    """A store whose flusher never runs on its own during a test."""
+    kwargs.setdefault("write_behind", True)
+    kwargs.setdefault("flush_interval", 3600)
+    kwargs.setdefault("flush_batch", 10_000)
+    return ConversationStore(data_dir=str(data_dir), archive_after_days=0, fsync_policy="never", **kwargs)
+
+
+def test_flush_does_not_hold_up_loading_other_users(tmp_path):
+    store = make_store(tmp_path)
+    store.add_message("idle", MessageRole.USER, "hello")
+    store.close()
+
+    store = make_store(tmp_path)
+    for i in range(20):
+        store.add_message(f"user_{i}", MessageRole.USER, "hi")
+    writing = threading.Event()
+    write_profile = store._write_profile
+
+    def slow_write(user_id):
+        writing.set()
+        time.sleep(0.05)
+        write_profile(user_id)
+
+    store._write_profile = slow_write
+    flusher = threading.Thread(target=store.flush)
+    flusher.start()
+    assert writing.wait(5)
+    start = time.perf_counter()
+    profile = store.get_profile("idle")
+    waited = time.perf_counter() - start
+    flusher.join()
+    # The flush takes about a second; loading waits for at most a user or two of it
+    assert waited < 0.5
+    assert profile.conversation_history[0]["content"] == "hello"
+    store._write_profile = write_profile
+    store.close()
+
+    reopened = make_store(tmp_path)
+    assert [m["content"] for m in reopened.get_profile("user_19").conversation_history] == ["hi"]
+    reopened.close()
+
+
+def stored_user(data_dir, messages: int) -> None:
+    store = make_store(data_dir, write_behind=False)
+    for i in range(messages):
+        store.add_message("alice", MessageRole.USER, f"old {i}")
+    store.close()
+
+
+def test_update_profile_replaces_the_history_of_a_user_not_loaded_yet(tmp_path):
+    stored_user(tmp_path, 4)
+    store = make_store(tmp_path)
+    profile = UserProfile(user_id="alice")
+    profile.conversation_history = [{"role": "user", "content": f"new {i}", "timestamp": None} for i in range(6)]
+    store.update_profile("alice", profile)
+    store.update_profile("bob", UserProfile(user_id="bob"))
+    store.close()
+
+    reopened = make_store(tmp_path)
+    assert [m["content"] for m in reopened.get_profile("alice").conversation_history] == [f"new {i}" for i in range(6)]
+    reopened.update_profile("alice", UserProfile(user_id="alice"))
+    reopened.close()
+    assert make_store(tmp_path).get_profile("alice").conversation_history == []
+
+
+def test_paged_read_of_a_legacy_header_with_inline_history(tmp_path):
+    history = [
+        {"role": "user", "content": f"message {i}", "timestamp": f"2025-01-01T00:00:0{i}"} for i in range(5)
+    ]
+    (tmp_path / "alice.json").write_text(json.dumps({"user_id": "alice", "conversation_history": history}))
+
+    store = make_store(tmp_path)
+    page = store.get_conversation_history("alice", limit=3)
+    assert [(m.id, m.content) for m in page] == [(2, "message 2"), (3, "message 3"), (4, "message 4")]
+    assert len(store.get_conversation_history("alice")) == 5
+    store.close()
+
+
+def crashed_store(data_dir) -> ConversationStore:
+    """A write-behind store that flushed some saves, then died mid-append without closing."""
+    store = make_store(data_dir)
+    for i in range(3):
+        store.add_message("alice", MessageRole.USER, f"message {i}")
+    store.flush()
+    store.add_message("alice", MessageRole.USER, "never flushed")
+    with open(store.log_path("alice"), "a") as f:
+        f.write('{"seq": 3, "role": "user", "con')
+    return store
+
+
+def test_write_behind_recovers_flushed_messages_after_a_crash(tmp_path):
+    crashed_store(tmp_path)
+
+    recovered = make_store(tmp_path)
+    history = recovered.get_profile("alice").conversation_history
+    assert [m["content"] for m in history] == ["message 0", "message 1", "message 2"]
+    # The torn line is rewritten away, so later messages keep their sequence numbers
+    recovered.add_message("alice", MessageRole.USER, "after the crash")
+    recovered.close()
+
+    reopened = make_store(tmp_path)
+    assert [m["content"] for m in reopened.get_profile("alice").conversation_history][-2:] == ["message 2", "after the crash"]
+    reopened.close()
+
+
+def test_torn_header_is_rebuilt_around_the_history(tmp_path):
+    crashed_store(tmp_path)
+    path = make_store(tmp_path).profile_path("alice")
+    path.write_text('{"user_id": "alice", "na')
+
+    recovered = make_store(tmp_path)
+    profile = recovered.get_profile("alice")
+    assert len(profile.conversation_history) == 3 and recovered.recovered_profiles == 1
+    assert path.with_suffix(".json.corrupt").exists()
+    recovered.close()
+
+
+def test_schema_mismatch_is_not_treated_as_corruption(tmp_path):
+    crashed_store(tmp_path)
+    path = make_store(tmp_path).profile_path("alice")
+    header = path.read_text().replace('"onboarding_step":3', '"onboarding_step":"three"')
+    assert header != path.read_text()
+    path.write_text(header)
+
+    store = make_store(tmp_path)
+    with pytest.raises(ValidationError):
+        store.get_profile("alice")
+    store.close()
+    assert path.read_text() == header
+    assert not path.with_suffix(".json.corrupt").exists()
+    assert store.recovered_profiles == 0
+
+
+def test_only_stale_temporary_files_are_swept(tmp_path):
+    store = make_store(tmp_path, write_behind=False)
+    store.add_message("alice", MessageRole.USER, "hello")
+    store.close()
+    directory = store.profile_path("alice").parent
+    stale, in_flight = directory / "alice.json.tmp", directory / "bob.json.tmp"
+    stale.write_text("{}")
+    in_flight.write_text("{}")
+    old = time.time() - 2 * store.stale_tmp_seconds
+    os.utime(stale, (old, old))
+
+    make_store(tmp_path).close()
+    assert not stale.exists()
+    assert in_flight.exists()
+
+
+def idle_users(data_dir, count: int, days: int = 60) -> None:
+    """Store users and backdate their headers so they count as idle."""
+    store = make_store(data_dir, write_behind=False)
+    for i in range(count):
+        store.add_message(f"idle_{i}", MessageRole.USER, f"message {i}")
+    store.close()
+    old = time.time() - days * 86400
+    for root, _, files in os.walk(data_dir):
+        for name in files:
+            if name.endswith(".json"):
+                os.utime(os.path.join(root, name), (old, old))
+
+
+def test_archiving_is_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("CONVERSATION_ARCHIVE_AFTER_DAYS", raising=False)
+    idle_users(tmp_path, 3)
+    store = ConversationStore(data_dir=str(tmp_path), write_behind=False, fsync_policy="never")
+    store.close()
+    assert store.archive_after_days == 0
+    assert not list(store.cold)
+
+
+def test_archive_keeps_users_written_while_it_compresses(tmp_path):
+    idle_users(tmp_path, 10)
+    store = make_store(tmp_path)
+    build_segment = store.cold.build_segment
+
+    def build_while_users_return(payloads):
+        # Runs without the I/O lock: one user comes back, another is replaced by a migration
+        store.add_message("idle_1", MessageRole.ASSISTANT, "welcome back")
+        imported = UserProfile(user_id="idle_2", name="Imported")
+        imported.conversation_history = [{"role": "user", "content": "imported", "timestamp": None}]
+        store.import_profile(imported)
+        return build_segment(payloads)
+
+    store.cold.build_segment = build_while_users_return
+    assert store.archive_idle(max_age_days=30) == 8
+    assert "idle_1" not in store.cold and "idle_2" not in store.cold
+    store.close()
+
+    reopened = make_store(tmp_path)
+    assert [m["content"] for m in reopened.get_profile("idle_1").conversation_history] == ["message 1", "welcome back"]
+    assert reopened.get_profile("idle_2").name == "Imported"
+    assert reopened.restores == 0
+    assert [m["content"] for m in reopened.get_profile("idle_3").conversation_history] == ["message 3"]
+    assert reopened.restores == 1
+    reopened.close()
+
+
+def test_archive_compacts_what_restores_left_behind(tmp_path):
+    idle_users(tmp_path, 10)
+    store = make_store(tmp_path, write_behind=False)
+    assert store.archive_idle(max_age_days=30) == 10
+    for i in range(6):
+        store.get_profile(f"idle_{i}")
+    assert store.cold.dead_bytes > 0
+
+    store.archive_idle(max_age_days=30)
+    stats = store.storage_stats()
+    assert stats["cold_dead_bytes"] == 0 and stats["cold_compactions"] == 1
+    # The four users still archived were moved into a segment of their own
+    assert [path.name for path in store.cold.directory.glob("segment-*.zseg")] == ["segment-000002.zseg"]
+    assert stats["cold_users"] == 4
+    store.close()
+
+    reopened = make_store(tmp_path)
+    for i in range(10):
+        assert [m["content"] for m in reopened.get_profile(f"idle_{i}").conversation_history] == [f"message {i}"]
+    reopened.close()
+
+
+def test_startup_indexes_users_without_loading_them(tmp_path):
+    store = make_store(tmp_path, write_behind=False)
+    for i in range(5):
+        store.add_message(f"user_{i}", MessageRole.USER, f"message {i}")
+    store.close()
+    # user_3 and user_1 were active most recently
+    for i, days in enumerate([5, 1, 4, 0, 3]):
+        moment = time.time() - days * 86400
+        os.utime(store.profile_path(f"user_{i}"), (moment, moment))
+
+    lazy = make_store(tmp_path)
+    assert sorted(lazy.user_ids()) == [f"user_{i}" for i in range(5)]
+    assert lazy.profiles == {}
+    assert [m["content"] for m in lazy.get_profile("user_4").conversation_history] == ["message 4"]
+    assert list(lazy.profiles) == ["user_4"]
+    lazy.close()
+
+    warm = make_store(tmp_path, warm_profiles=2)
+    assert sorted(warm.profiles) == ["user_1", "user_3"]
+    warm.close()
+
+
+def test_users_outside_their_shard_are_found_until_moved(tmp_path):
+    flat = make_store(tmp_path, write_behind=False, shard_depth=0)
+    for user_id in ("alice", "bob"):
+        flat.add_message(user_id, MessageRole.USER, f"hi from {user_id}")
+    flat.close()
+    assert (tmp_path / "alice.json").exists()
+
+    store = make_store(tmp_path, write_behind=False, shard_depth=2)
+    assert sorted(store.misplaced_users()) == ["alice", "bob"]
+    # Read and written in place until resharded
+    store.add_message("alice", MessageRole.ASSISTANT, "welcome back")
+    assert store.profile_path("alice") == tmp_path / "alice.json"
+    assert store.reshard(limit=1) == 1
+    assert store.reshard() == 1
+    assert store.misplaced_users() == []
+    shard = store.shard_dir("alice")
+    assert shard.parent.parent == tmp_path and store.profile_path("alice") == shard / "alice.json"
+    store.close()
+    assert not list(tmp_path.glob("*.json"))
+
+    reopened = make_store(tmp_path, shard_depth=2)
+    assert reopened.misplaced_users() == []
+    assert [m["content"] for m in reopened.get_profile("alice").conversation_history] == ["hi from alice", "welcome back"]
+    assert [m["content"] for m in reopened.get_profile("bob").conversation_history] == ["hi from bob"]
+    reopened.close()
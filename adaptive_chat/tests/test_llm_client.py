@@ -0,0 +1,152 @@
+"""Circuit breaker behaviour of LLMClient against the fault-injecting stub server."""
+
+import asyncio
+import time
+
+import pytest
+
+from src.llm_client import LLMClient, CircuitBreaker, CircuitOpenError, DeadlineExceededError, LLMError
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 50}
+
+
+def make_client(base_url: str, **options) -> LLMClient:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    return LLMClient(api_key="test", base_url=base_url, max_retries=0, breaker=breaker, **options)
+
+
+async def open_breaker(client: LLMClient, stub_server) -> None:
+    """Fail one call so the breaker opens, then wait until it lets a probe through."""
+    stub_server.error_rate = 1.0
+    with pytest.raises(LLMError):
+        await client.chat_completion(PAYLOAD)
+    assert client.breaker.state == CircuitBreaker.OPEN
+    stub_server.error_rate = 0.0
+    await asyncio.sleep(client.breaker.reset_timeout)
+
+
+def test_probe_cut_off_by_deadline_does_not_wedge_breaker(stub_server):
+    async def scenario():
+        client = make_client(stub_server.base_url, call_timeout=0.2)
+        await open_breaker(client, stub_server)
+
+        # The half-open probe outlives the call deadline
+        stub_server.latency = 1.0
+        with pytest.raises(DeadlineExceededError):
+            await client.chat_completion(PAYLOAD)
+        assert client.breaker.state == CircuitBreaker.OPEN
+
+        # Once the upstream recovers the next probe closes the breaker again
+        stub_server.latency = 0.01
+        await asyncio.sleep(client.breaker.reset_timeout)
+        for _ in range(3):
+            response = await client.chat_completion(PAYLOAD)
+            assert response["choices"][0]["message"]["content"]
+        assert client.breaker.state == CircuitBreaker.CLOSED
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_streaming_probe_does_not_wedge_breaker(stub_server):
+    async def scenario():
+        client = make_client(stub_server.base_url)
+        await open_breaker(client, stub_server)
+
+        async def consume():
+            return [chunk async for chunk in client.stream_chat_completion(PAYLOAD)]
+
+        # The caller gives up on the probe before the upstream answers
+        stub_server.latency = 1.0
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        stub_server.latency = 0.01
+        await asyncio.sleep(client.breaker.reset_timeout)
+        for _ in range(3):
+            assert "".join(await consume())
+        assert client.breaker.state == CircuitBreaker.CLOSED
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_stream_closed_early_keeps_breaker_closed(stub_server):
+    async def scenario():
+        client = make_client(stub_server.base_url)
+        stream = client.stream_chat_completion(PAYLOAD)
+        assert await stream.__anext__()
+        await stream.aclose()
+        assert client.breaker.state == CircuitBreaker.CLOSED
+        assert client.breaker.consecutive_failures == 0
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_open_breaker_fails_fast(stub_server):
+    async def scenario():
+        client = make_client(stub_server.base_url)
+        client.breaker.reset_timeout = 60
+        stub_server.error_rate = 1.0
+        with pytest.raises(LLMError):
+            await client.chat_completion(PAYLOAD)
+        served = stub_server.requests_served
+        start = time.perf_counter()
+        with pytest.raises(CircuitOpenError):
+            await client.chat_completion(PAYLOAD)
+        assert time.perf_counter() - start < 0.05
+        assert stub_server.requests_served == served
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_stream_waits_at_most_the_call_deadline(stub_server):
+    async def scenario():
+        client = make_client(stub_server.base_url, call_timeout=0.2)
+
+        async def consume():
+            return [chunk async for chunk in client.stream_chat_completion(PAYLOAD)]
+
+        # No first token in time
+        stub_server.latency = 1.0
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceededError):
+            await consume()
+        assert time.perf_counter() - start < 0.5
+
+        # The first token is quick but the whole reply takes too long
+        stub_server.latency = 0.01
+        stub_server.token_interval = 0.1
+        received = []
+        with pytest.raises(DeadlineExceededError):
+            async for chunk in client.stream_chat_completion(PAYLOAD):
+                received.append(chunk)
+        assert received
+        # Running out of time says nothing about the upstream's health
+        assert client.breaker.state == CircuitBreaker.CLOSED
+        assert client.breaker.consecutive_failures == 0
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_caller_cancelling_a_normal_call_is_not_an_upstream_failure(stub_server):
+    async def scenario():
+        client = make_client(stub_server.base_url)
+        stub_server.latency = 1.0
+        for call in (client.chat_completion(PAYLOAD), client.stream_chat_completion(PAYLOAD).__anext__()):
+            task = asyncio.ensure_future(call)
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        assert client.breaker.state == CircuitBreaker.CLOSED
+        assert client.breaker.consecutive_failures == 0
+        await client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,98 @@
+"""Mapped history files: rewrites, compaction, crash recovery and descriptor use."""
+
+import datetime
+import os
+
+import pytest
+
+from src import mapped_history
+from src.mapped_history import MappedHistory, append_history, read_history, write_history
+
+
+def entries(count: int, start: int = 0) -> list:
+    base = datetime.datetime(2025, 1, 1)
+    return [
+        {"role": "user" if i % 2 else "assistant", "content": f"message {i} " * 10, "timestamp": base + datetime.timedelta(seconds=i)}
+        for i in range(start, start + count)
+    ]
+
+
+def contents(history) -> list:
+    return [message["content"] for message in history]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / "u.history.dat", tmp_path / "u.history.idx"
+
+
+def test_repeated_rewrites_keep_data_file_bounded(paths):
+    data_path, index_path = paths
+    history = entries(200)
+    live = sum(len(message["content"].encode()) for message in history)
+    for _ in range(50):
+        write_history(data_path, index_path, history, sync=False)
+        assert os.path.getsize(data_path) <= 2 * live
+        assert contents(read_history(data_path, index_path)) == contents(history)
+
+
+def test_existing_mapping_survives_compaction(paths):
+    data_path, index_path = paths
+    write_history(data_path, index_path, entries(100), sync=False)
+    write_history(data_path, index_path, entries(100), sync=False)
+    mapped = MappedHistory(data_path, index_path)
+    # Smaller than the dead bytes, so this rewrite compacts into a new data file
+    write_history(data_path, index_path, entries(10, start=500), sync=False)
+    assert contents(mapped) == contents(entries(100))
+    assert contents(read_history(data_path, index_path)) == contents(entries(10, start=500))
+    mapped.close()
+
+
+def test_append_after_compaction(paths):
+    data_path, index_path = paths
+    for _ in range(3):
+        write_history(data_path, index_path, entries(20), sync=False)
+    assert append_history(data_path, index_path, entries(5, start=20), sync=False) == 25
+    assert contents(read_history(data_path, index_path)) == contents(entries(25))
+
+
+def staged(paths):
+    data_path, index_path = paths
+    return mapped_history._compaction_paths(data_path, index_path)
+
+
+def test_crash_before_data_rename_keeps_old_history(paths):
+    data_path, index_path = paths
+    write_history(data_path, index_path, entries(30), sync=False)
+    new_data_path, new_index_path = staged(paths)
+    new_data_path.write_bytes(b"partial")
+    new_index_path.write_bytes(b"partial")
+    assert contents(read_history(data_path, index_path)) == contents(entries(30))
+    assert not new_data_path.exists() and not new_index_path.exists()
+
+
+def test_crash_between_renames_rolls_forward(paths):
+    data_path, index_path = paths
+    write_history(data_path, index_path, entries(30), sync=False)
+    new_data_path, new_index_path = staged(paths)
+    # A compaction that stopped after renaming the data file
+    write_history(new_data_path, new_index_path, entries(5, start=100), sync=False)
+    os.replace(new_data_path, data_path)
+    assert contents(read_history(data_path, index_path)) == contents(entries(5, start=100))
+    assert not new_index_path.exists()
+
+
+def test_mapped_histories_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(mapped_history, "MAX_OPEN_HISTORIES", 5)
+    histories = []
+    for i in range(20):
+        data_path, index_path = tmp_path / f"{i}.history.dat", tmp_path / f"{i}.history.idx"
+        write_history(data_path, index_path, entries(10), sync=False)
+        histories.append(read_history(data_path, index_path))
+    assert sum(isinstance(history, MappedHistory) for history in histories) == 5
+    assert mapped_history.open_histories() == 5
+    assert all(contents(history) == contents(entries(10)) for history in histories)
+    for history in histories:
+        if isinstance(history, MappedHistory):
+            history.close()
+    assert mapped_history.open_histories() == 0
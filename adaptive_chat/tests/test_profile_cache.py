@@ -0,0 +1,77 @@
+"""ProfileCache spilling and rehydration."""
+
+import errno
+
+import pytest
+
+from src.models import UserProfile
+from src.profile_cache import ProfileCache
+
+
+def make_profile(user_id: str, messages: int) -> UserProfile:
+    profile = UserProfile(user_id=user_id, name="Jordan")
+    profile.conversation_history = [{"role": "user", "content": f"message {i}"} for i in range(messages)]
+    return profile
+
+
+def spill(cache: ProfileCache, profile: UserProfile) -> None:
+    """Store a profile and evict it to disk."""
+    cache[profile.user_id] = profile
+    cache["other"] = make_profile("other", 1)
+    assert profile.user_id not in cache._profiles
+
+
+def test_evicted_profile_rehydrates(tmp_path):
+    cache = ProfileCache(max_entries=1, spill_dir=str(tmp_path), mmap_min_messages=4)
+    spill(cache, make_profile("alice", 10))
+    profile = cache.get("alice")
+    assert profile.name == "Jordan"
+    assert [message["content"] for message in profile.conversation_history] == [f"message {i}" for i in range(10)]
+    assert cache.get("nobody") is None
+
+
+def test_transient_read_error_is_not_a_new_user(tmp_path, monkeypatch):
+    cache = ProfileCache(max_entries=1, spill_dir=str(tmp_path))
+    spill(cache, make_profile("alice", 5))
+
+    def out_of_descriptors(*args, **kwargs):
+        raise OSError(errno.EMFILE, "Too many open files")
+
+    monkeypatch.setattr("src.profile_cache.open", out_of_descriptors, raising=False)
+    with pytest.raises(OSError):
+        cache.get("alice")
+    monkeypatch.undo()
+
+    assert len(cache.get("alice").conversation_history) == 5
+
+
+def test_torn_spill_file_raises(tmp_path):
+    cache = ProfileCache(max_entries=1, spill_dir=str(tmp_path))
+    spill(cache, make_profile("alice", 5))
+    header = cache.spill_path("alice").read_text()
+    cache.spill_path("alice").write_text(header[:len(header) // 2])
+    with pytest.raises(ValueError):
+        cache.get("alice")
+    # Nothing replaced the stored profile
+    assert "alice" not in cache._profiles
+    assert cache.spill_path("alice").read_text() == header[:len(header) // 2]
+
+
+def test_profile_that_fails_to_spill_stays_resident(tmp_path, monkeypatch):
+    cache = ProfileCache(max_entries=1, spill_dir=str(tmp_path))
+    cache["alice"] = make_profile("alice", 5)
+
+    def disk_full(*args, **kwargs):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr("src.profile_cache.write_history", disk_full)
+    cache["bob"] = make_profile("bob", 1)
+    assert "alice" in cache._profiles and "alice" in cache._dirty
+    assert cache.evictions == 0
+    monkeypatch.undo()
+
+    # The next eviction retries the spill, so nothing was lost
+    cache["carol"] = make_profile("carol", 1)
+    assert list(cache._profiles) == ["carol"]
+    assert len(cache.get("alice").conversation_history) == 5
+    assert cache.get("bob").name == "Jordan"
@@ -0,0 +1,86 @@
+"""ResponseCache defaults and the batched persistent tier."""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+from src.response_cache import ResponseCache
+
+
+def disk_rows(path) -> int:
+    with sqlite3.connect(str(path)) as db:
+        return db.execute("SELECT count(*) FROM responses").fetchone()[0]
+
+
+def test_default_covers_replies_and_summaries(monkeypatch):
+    monkeypatch.delenv("RESPONSE_CACHE_MAX_TEMPERATURE", raising=False)
+    cache = ResponseCache(path="")
+    assert cache.accepts(0.2) and cache.accepts(0.7)
+    assert not cache.accepts(1.0)
+
+
+def test_memory_only_cache_starts_no_writer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = ResponseCache(path="")
+    cache.set("key", "response")
+    assert asyncio.run(cache.get_async("key")) == "response"
+    assert asyncio.run(cache.get_async("other")) is None
+    cache.close()
+    assert cache._writer is None and not list(tmp_path.iterdir())
+
+
+def test_async_lookup_reads_disk_off_the_event_loop(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    cache = ResponseCache(path=str(path))
+    cache.set("key", "response")
+    cache.close()
+
+    reopened = ResponseCache(path=str(path))
+    load = reopened._load
+    threads = []
+
+    def recording_load(key):
+        threads.append(threading.current_thread())
+        return load(key)
+
+    reopened._load = recording_load
+    assert asyncio.run(reopened.get_async("key")) == "response"
+    assert threads and threads[0] is not threading.main_thread()
+    # Now resident, so the second lookup never touches the disk
+    assert asyncio.run(reopened.get_async("key")) == "response"
+    assert len(threads) == 1
+    assert reopened.stats()["disk_hits"] == 1 and reopened.stats()["memory_hits"] == 1
+    reopened.close()
+
+
+def test_set_queues_responses_for_the_writer(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    cache = ResponseCache(max_entries=1, path=str(path), commit_batch=1000, commit_interval=60)
+    for i in range(10):
+        cache.set(f"key {i}", f"response {i}")
+    # Nothing committed yet, but entries evicted from memory are still found
+    assert disk_rows(path) == 0
+    assert cache.get("key 0") == "response 0"
+    assert cache.stats()["disk_hits"] == 1
+
+    cache.close()
+    assert disk_rows(path) == 10
+    assert cache.commits == 1
+
+    reopened = ResponseCache(path=str(path))
+    assert reopened.get("key 9") == "response 9"
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+
+def test_full_batch_commits_early(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    cache = ResponseCache(path=str(path), commit_batch=5, commit_interval=60)
+    for i in range(5):
+        cache.set(f"key {i}", f"response {i}")
+    deadline = time.monotonic() + 5
+    while cache.commits == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert disk_rows(path) == 5
+    cache.close()
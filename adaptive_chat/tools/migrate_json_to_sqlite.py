@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Copy a JSON ConversationStore directory into a SQLite store.
+
+Reads every profile in the data directory (legacy single-file profiles as well as the
+header + message log layout) and writes it to the SQLite database. Users already in the
+database are skipped unless --overwrite is given, so an interrupted run can simply be
+started again.
+
+Usage (from adaptive_chat/):
+    python tools/migrate_json_to_sqlite.py [--data-dir data] [--db data/conversations.sqlite3] [--overwrite]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.conversation_store import ConversationStore
+from src.sqlite_store import SQLiteConversationStore
+
+
+def migrate(data_dir: str, db_path: str, overwrite: bool = False) -> int:
+    """
+    Migrate all profiles and return the number copied.
+
+    Args:
+        data_dir: JSON store directory
+        db_path: SQLite database to write to
+        overwrite: Replace users that were already migrated
+    """
+    source = ConversationStore(data_dir=data_dir, warm_profiles=0, archive_after_days=0)
+    target = SQLiteConversationStore(db_path=db_path, commit_batch=500)
+    migrated = skipped = ignored = 0
+    start = time.perf_counter()
+
+    try:
+        for user_id in source.user_ids():
+            if not overwrite and target.has_profile(user_id):
+                skipped += 1
+                continue
+            # Read without loading, restoring or upgrading anything in the source directory
+            profile = source.export_profile(user_id)
+            if profile is None:
+                # Not a profile after all, e.g. another tool's JSON file
+                ignored += 1
+                continue
+            target.import_profile(profile)
+            migrated += 1
+            if migrated % 10000 == 0:
+                print(f"  {migrated} profiles migrated...")
+    finally:
+        target.close()
+        source.close()
+
+    print(f"Migrated {migrated} profiles ({skipped} already present, {ignored} not profiles) in {time.perf_counter() - start:.1f}s")
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data", help="JSON store directory")
+    parser.add_argument("--db", default="data/conversations.sqlite3", help="SQLite database path")
+    parser.add_argument("--overwrite", action="store_true", help="Replace users already in the database")
+    args = parser.parse_args()
+    migrate(args.data_dir, args.db, args.overwrite)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Bulk-copy every profile and conversation between storage backends.
+
+Backends:
+    json:<dir>       a ConversationStore data directory
+    sqlite:<path>    a local SQLite stand-in for the Supabase tables
+    supabase         the user_profiles and conversations tables (SUPABASE_URL, SUPABASE_KEY)
+
+Profiles are read, parsed and validated in a pool of worker processes and written in
+bounded batches of upserts. Progress is checkpointed after every batch, so an
+interrupted run continues where it stopped when started again with the same
+arguments; pass --restart to copy everything again. Users that fail validation are
+logged, listed in the checkpoint and skipped. The checkpoint must be outside any json:
+store directory, which would otherwise take it for a profile.
+
+Usage (from adaptive_chat/):
+    python tools/migrate_profiles.py --source json:data --target supabase
+    python tools/migrate_profiles.py --source supabase --target json:data [--workers 8] [--batch-rows 5000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.profile_migration import ProfileMigrator
+
+
+def migrate(source: str, target: str, checkpoint: str, workers: int = None, batch_rows: int = None,
+            users_per_task: int = None, restart: bool = False) -> dict:
+    """
+    Run a migration, printing progress at most once a second.
+
+    Args:
+        source: Backend to read from
+        target: Backend to write to
+        checkpoint: Checkpoint file
+        workers: Parsing and validation processes (defaults to the CPU count)
+        batch_rows: Rows per write batch
+        users_per_task: Users handed to a worker at a time
+        restart: Ignore the checkpoint
+    """
+    migrator = ProfileMigrator(source, target, checkpoint, workers, batch_rows, users_per_task)
+    last_report = 0.0
+
+    def report(stats: dict) -> None:
+        nonlocal last_report
+        if time.perf_counter() - last_report >= 1.0:
+            last_report = time.perf_counter()
+            print(f"  {stats['users']} users, {stats['messages']} messages, {stats['rows_per_second']:,.0f} rows/s")
+
+    stats = migrator.run(restart=restart, progress=report)
+    print(
+        f"Copied {stats['users']} users and {stats['messages']} messages ({stats['rejected']} rejected) "
+        f"in {stats['seconds']:.1f}s, {stats['rows_per_second']:,.0f} rows/s"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", required=True, help="Backend to read from")
+    parser.add_argument("--target", required=True, help="Backend to write to")
+    parser.add_argument("--checkpoint", default="migration_checkpoint.json", help="Progress file, outside the store directories")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-rows", type=int, default=None, help="Rows per write batch (default 5000)")
+    parser.add_argument("--users-per-task", type=int, default=None, help="Users per worker task (default 50)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and copy everything again")
+    args = parser.parse_args()
+    migrate(args.source, args.target, args.checkpoint, args.workers, args.batch_rows, args.users_per_task, args.restart)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Move a ConversationStore data directory to the hash-sharded layout.
+
+Moves every user whose files are not in their shard directory (the legacy flat layout,
+or a different shard depth) in batches, reporting progress. The move of each user is
+atomic per file and reads fall back to the old location, so the tool can be stopped at
+any point and simply run again to resume. Running services pick up moved files on their
+next access to them.
+
+Usage (from adaptive_chat/):
+    python tools/reshard_conversation_store.py [--data-dir data] [--depth 2] [--batch 10000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.conversation_store import ConversationStore
+
+
+def reshard(data_dir: str, depth: int, batch: int) -> int:
+    """
+    Move all misplaced users and return how many were moved.
+
+    Args:
+        data_dir: Store directory
+        depth: Target shard depth
+        batch: Users moved between progress reports
+    """
+    start = time.perf_counter()
+    store = ConversationStore(data_dir=data_dir, shard_depth=depth, warm_profiles=0, write_behind=False, archive_after_days=0)
+    remaining = len(store.misplaced_users())
+    print(f"Indexed {len(store.user_ids())} users in {time.perf_counter() - start:.1f}s, {remaining} to move")
+
+    moved = 0
+    try:
+        while True:
+            count = store.reshard(limit=batch)
+            if not count:
+                break
+            moved += count
+            elapsed = time.perf_counter() - start
+            print(f"  {moved}/{remaining} users moved ({moved / elapsed:.0f} users/s)")
+    finally:
+        store.close()
+
+    print(f"Moved {moved} users in {time.perf_counter() - start:.1f}s")
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data", help="Store directory")
+    parser.add_argument("--depth", type=int, default=int(os.getenv("CONVERSATION_SHARD_DEPTH", "2")), help="Target shard depth")
+    parser.add_argument("--batch", type=int, default=10000, help="Users per progress report")
+    args = parser.parse_args()
+    reshard(args.data_dir, args.depth, args.batch)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Polling chat.db on a fresh connection per query versus the persistent read-only connection.
+
+Generates a synthetic chat.db (WAL, like Messages) and times the queries the agent
+makes: one handle's new messages, and a poll tick (the greetings query plus the
+single query for all active handles). The "fresh" rows open, query and close a
+connection per call as the agent used to; "persistent" rows go through ChatDatabase.
+Also checks that the persistent connection sees rows committed after it opened.
+
+Then, on a rollback-journal copy where a writer's lock blocks readers, a writer holds
+an exclusive lock while the agent polls, with and without retries, reporting the
+longest the event loop went without running other tasks meanwhile.
+
+Usage (from imessage_agent/):
+    python benchmarks/bench_chat_db_connection.py [--handles 10000] [--messages 20] [--repeats 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import imessage_agent
+from benchmarks.chat_db_fixture import add_incoming, create_chat_db, hold_write_lock
+
+
+def fresh_query(sql: str, params: tuple) -> list:
+    """The previous access pattern: a new connection for every query."""
+    conn = sqlite3.connect(imessage_agent.DB_PATH)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+
+async def timed(function, repeats: int) -> float:
+    """Mean time of a call in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await function()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+async def compare(label: str, persistent, sql_calls, repeats: int) -> tuple:
+    """Time a read through ChatDatabase and the same queries on fresh connections."""
+    async def fresh():
+        return [fresh_query(sql, params) for sql, params in sql_calls]
+    return label, await timed(fresh, repeats), await timed(persistent, repeats)
+
+
+async def heartbeat(stalls: list) -> None:
+    """Record the longest gap between 10 ms ticks beyond the tick itself."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        stalls[0] = max(stalls[0], time.perf_counter() - start - 0.01)
+
+
+async def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "chat.db")
+        create_chat_db(path, args.handles, args.messages)
+        imessage_agent.DB_PATH = path
+        chat_db = imessage_agent.get_chat_db()
+
+        with sqlite3.connect(path) as db:
+            watermarks = dict(db.execute(
+                "SELECT h.id, max(m.ROWID) FROM message AS m JOIN handle AS h ON m.handle_id = h.ROWID GROUP BY h.id"
+            ).fetchall())
+            last_rowid = db.execute("SELECT max(ROWID) FROM message").fetchone()[0]
+        handle_id = next(iter(watermarks))
+        low = min(watermarks.values())
+
+        async def poll_tick():
+            return await imessage_agent.query_new_greetings(last_rowid), await imessage_agent.query_new_messages_by_handle(watermarks)
+
+        rows = [
+            await compare(
+                "one handle's messages", lambda: imessage_agent.query_new_messages(watermarks[handle_id], handle_id),
+                [(imessage_agent.HANDLE_MESSAGES_QUERY, (watermarks[handle_id], handle_id))], args.repeats,
+            ),
+            await compare(
+                "poll tick (2 queries)", poll_tick,
+                [(imessage_agent.GREETINGS_QUERY, (last_rowid,)), (imessage_agent.NEW_MESSAGES_QUERY, (low,))], args.repeats,
+            ),
+        ]
+
+        # Rows committed after the connection opened are visible to its next query
+        new_rowids = add_incoming(path, [1, 2, 3])
+        seen = [row[0] for row in await imessage_agent.query_new_messages(last_rowid)]
+        assert seen == new_rowids, f"persistent connection missed new rows: {seen} != {new_rowids}"
+        connects = chat_db.connects
+        chat_db.close()
+
+        locked_path = os.path.join(directory, "chat-delete.db")
+        create_chat_db(locked_path, 100, 5, journal_mode="delete")
+        imessage_agent.DB_PATH = locked_path
+        locked = []
+        for retries in (0, 5):
+            chat_db = imessage_agent.get_chat_db()
+            chat_db.retries = retries
+            await chat_db.query("SELECT 1")
+            writer = threading.Thread(target=hold_write_lock, args=(locked_path, args.lock_ms / 1000))
+            writer.start()
+            await asyncio.sleep(0.02)
+            stalls = [0.0]
+            ticker = asyncio.create_task(heartbeat(stalls))
+            await asyncio.sleep(0.02)
+            start = time.perf_counter()
+            try:
+                outcome = f"{len(await imessage_agent.query_new_greetings(0))} rows"
+            except sqlite3.OperationalError as e:
+                outcome = f"error: {e}"
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            ticker.cancel()
+            locked.append((retries, outcome, elapsed_ms, chat_db.retried, stalls[0] * 1000))
+            await asyncio.to_thread(writer.join)
+            chat_db.close()
+
+    print(f"{args.handles} handles, {args.handles * args.messages} messages, times in µs per call")
+    print(f"{'':<26}{'fresh':>10}{'persistent':>12}")
+    for label, fresh_us, persistent_us in rows:
+        print(f"{label:<26}{fresh_us:>10.1f}{persistent_us:>12.1f}")
+    print(f"persistent connection opened {connects} time(s), saw rows committed after opening")
+    print(f"\nwriter holding an exclusive lock for {args.lock_ms:g} ms while polling (rollback journal):")
+    for retries, outcome, elapsed_ms, retried, stall_ms in locked:
+        print(f"  retries={retries}: {outcome} after {elapsed_ms:.0f} ms ({retried} retried), "
+              f"event loop stalled at most {stall_ms:.1f} ms")
+
+
+def main(args: argparse.Namespace) -> None:
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handles", type=int, default=10000, help="Contacts in the database")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per conversation")
+    parser.add_argument("--repeats", type=int, default=2000, help="Calls timed per row")
+    parser.add_argument("--lock-ms", type=float, default=300, help="How long the writer holds its lock")
+    main(parser.parse_args())
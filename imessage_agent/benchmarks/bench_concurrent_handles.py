@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Reply throughput of the iMessage agent as the number of active conversations grows.
+
+Each active handle in a synthetic chat.db gets a few new messages, then one poll tick
+dispatches them and the run ends when every reply is sent. The agent is replaced by a
+stand-in whose replies take --latency seconds (an LLM call) and sending only records
+the reply. A concurrency cap of 1 is the previous behaviour, one message at a time.
+Checks that each handle's replies went out in message order and that every watermark
+ended on the handle's last message.
+
+Usage (from imessage_agent/):
+    python benchmarks/bench_concurrent_handles.py [--latency 0.1] [--messages 2] [--caps 1,16,64]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import imessage_agent
+from benchmarks.chat_db_fixture import add_incoming, create_chat_db, handle_ids
+
+ACTIVE_HANDLES = [1, 4, 16, 64]
+
+
+class SlowAgent:
+    """Stand-in for SeriesAIAgent whose replies take `latency` seconds, +/-20%."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.rng = random.Random(5)
+
+    async def process_message(self, text: str, handle_id: str) -> str:
+        await asyncio.sleep(self.latency * self.rng.uniform(0.8, 1.2))
+        return f"reply to {text}"
+
+
+async def run(agent: SlowAgent, watermarks: dict, handles: int, cap: int, sent: list) -> float:
+    """Dispatch one tick for the first `handles` handles and return the time until all replies are sent."""
+    imessage_agent.conversations.clear()
+    for handle_id in list(watermarks)[:handles]:
+        imessage_agent.conversations[handle_id] = {"last_rowid": watermarks[handle_id], "last_message_time": None}
+    sent.clear()
+    dispatcher = imessage_agent.ConversationDispatcher(agent, max_concurrent=cap)
+    start = time.perf_counter()
+    await imessage_agent.handle_ongoing_conversations(dispatcher)
+    await dispatcher.join()
+    return time.perf_counter() - start
+
+
+def check(sent: list, handles: int, messages: int, last_rowids: dict) -> None:
+    """Replies per handle in message order, and watermarks on each handle's last message."""
+    replies: dict = {}
+    for handle_id, text in sent:
+        replies.setdefault(handle_id, []).append(text)
+    assert len(replies) == handles
+    for handle_id, texts in replies.items():
+        assert texts == [f"reply to message {seq}" for seq in range(messages)], f"{handle_id} out of order: {texts}"
+        assert imessage_agent.conversations[handle_id]["last_rowid"] == last_rowids[handle_id]
+
+
+def main(args: argparse.Namespace) -> None:
+    caps = [int(cap) for cap in args.caps.split(",")]
+    sent: list = []
+    imessage_agent.STREAM_REPLIES = False
+
+    async def record(handle_id: str, text: str) -> bool:
+        sent.append((handle_id, text))
+        return True
+
+    imessage_agent.iMessageClient.send_message = staticmethod(record)
+    agent = SlowAgent(args.latency)
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "chat.db")
+        total = max(ACTIVE_HANDLES)
+        create_chat_db(path, total, 4)
+        imessage_agent.DB_PATH = path
+        ids = handle_ids(total)
+        with sqlite3.connect(path) as db:
+            watermarks = dict(db.execute(
+                "SELECT h.id, max(m.ROWID) FROM message AS m JOIN handle AS h ON m.handle_id = h.ROWID GROUP BY h.id"
+            ).fetchall())
+        watermarks = {handle_id: watermarks[handle_id] for handle_id in ids}
+        last_rowids = {}
+        for seq in range(args.messages):
+            for handle_id, rowid in zip(ids, add_incoming(path, list(range(1, total + 1)), f"message {seq}")):
+                last_rowids[handle_id] = rowid
+
+        for handles in ACTIVE_HANDLES:
+            row = []
+            for cap in caps:
+                elapsed = asyncio.run(run(agent, watermarks, handles, cap, sent))
+                check(sent, handles, args.messages, last_rowids)
+                row.append(handles * args.messages / elapsed)
+            results.append((handles, row))
+        imessage_agent.get_chat_db().close()
+
+    print(f"{args.messages} messages per handle, {args.latency * 1000:.0f} ms per reply; replies/s by concurrency cap")
+    print(f"{'handles':<10}" + "".join(f"{'cap ' + str(cap):>10}" for cap in caps))
+    for handles, row in results:
+        print(f"{handles:<10}" + "".join(f"{rate:>10.1f}" for rate in row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per reply")
+    parser.add_argument("--messages", type=int, default=2, help="New messages per handle")
+    parser.add_argument("--caps", default="1,16,64", help="Concurrency caps to compare")
+    main(parser.parse_args())
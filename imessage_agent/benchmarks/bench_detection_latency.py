@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Time from a message being committed to chat.db until the agent's poll loop sees it.
+
+A writer thread commits incoming messages to a synthetic chat.db (WAL, like Messages)
+at random moments while a poll loop queries for new messages. The loop either sleeps
+a fixed interval between polls, as the agent used to, or waits on ChatDBWatcher with
+each available change detection mode. Reports median and p90 detection latency and
+the number of polls that found nothing.
+
+Usage (from imessage_agent/):
+    python benchmarks/bench_detection_latency.py [--samples 30] [--fixed-interval 5] [--fixed-samples 8]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import imessage_agent
+from benchmarks.chat_db_fixture import add_incoming, create_chat_db
+
+
+def write_messages(path: str, samples: int, max_gap: float, committed: dict) -> None:
+    """Writer thread: commit one incoming message after each random gap, recording commit times."""
+    rng = random.Random(3)
+    for _ in range(samples):
+        time.sleep(rng.uniform(0.1, max_gap))
+        rowid = add_incoming(path, [rng.randint(1, 100)])[0]
+        committed[rowid] = time.perf_counter()
+
+
+async def detect(path: str, mode: str, samples: int, max_gap: float) -> tuple:
+    """Run the poll loop in one mode until every message is seen; return latencies and empty polls."""
+    chat_db = imessage_agent.get_chat_db()
+    last_rowid = (await chat_db.query("SELECT max(ROWID) FROM message"))[0][0]
+    committed: dict = {}
+    detected: dict = {}
+    empty_polls = 0
+
+    watcher = None
+    if mode.startswith("fixed"):
+        interval = float(mode.split()[1].rstrip("s"))
+    else:
+        os.environ["IMESSAGE_WATCH"] = mode
+        watcher = imessage_agent.ChatDBWatcher(path)
+        await watcher.start()
+
+    writer = threading.Thread(target=write_messages, args=(path, samples, max_gap, committed))
+    writer.start()
+    while len(detected) < samples:
+        rows = await imessage_agent.query_new_messages(last_rowid)
+        now = time.perf_counter()
+        for rowid, _, _ in rows:
+            detected[rowid] = now
+            last_rowid = max(last_rowid, rowid)
+        empty_polls += not rows
+        if watcher is None:
+            await asyncio.sleep(interval)
+        else:
+            await watcher.wait(watcher.next_interval(active=bool(rows)))
+    writer.join()
+    if watcher is not None:
+        await watcher.close()
+    return [(detected[rowid] - committed[rowid]) * 1000 for rowid in committed], empty_polls
+
+
+def main(args: argparse.Namespace) -> None:
+    modes = [(f"fixed {args.fixed_interval:g}s", args.fixed_samples, args.fixed_interval)]
+    modes += [(mode, args.samples, args.max_gap) for mode in ("stat", "inotify", "kqueue")]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "chat.db")
+        create_chat_db(path, 100, 10)
+        imessage_agent.DB_PATH = path
+        for mode, samples, max_gap in modes:
+            if mode == "inotify" and not sys.platform.startswith("linux"):
+                continue
+            if mode == "kqueue" and not hasattr(imessage_agent.select, "kqueue"):
+                continue
+            latencies, empty_polls = asyncio.run(detect(path, mode, samples, max_gap))
+            latencies.sort()
+            results.append((mode, samples, statistics.median(latencies), latencies[int(len(latencies) * 0.9)], empty_polls))
+        imessage_agent.get_chat_db().close()
+
+    print(f"{'mode':<12}{'messages':>10}{'p50 ms':>10}{'p90 ms':>10}{'empty polls':>13}")
+    for mode, samples, p50, p90, empty_polls in results:
+        print(f"{mode:<12}{samples:>10}{p50:>10.1f}{p90:>10.1f}{empty_polls:>13}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=30, help="Messages per watcher mode")
+    parser.add_argument("--max-gap", type=float, default=1.0, help="Longest pause between messages (s)")
+    parser.add_argument("--fixed-interval", type=float, default=5.0, help="Sleep of the fixed-interval loop (s)")
+    parser.add_argument("--fixed-samples", type=int, default=8, help="Messages for the fixed-interval loop")
+    main(parser.parse_args())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Outbound iMessage throughput: a blocking osascript call per message versus MessageSender.
+
+Replies to many conversations are sent concurrently, each conversation's in order,
+through an `osascript` stand-in (benchmarks/osascript_stub.py) put first on PATH. Every
+invocation waits --startup-ms before it starts and every message takes --send-ms. The
+"blocking" row is the previous client: subprocess.run once per message inside the event
+loop. The other rows use MessageSender in its "script" mode (one osascript per batch)
+and its "worker" mode (one long-lived osascript).
+
+Reports sends per second, osascript invocations, and the longest the event loop went
+without running other tasks. One conversation includes messages the stub rejects, and
+the run checks that exactly those sends report failure and that each conversation's
+messages arrived in order.
+
+Usage (from imessage_agent/):
+    python benchmarks/bench_message_sender.py [--handles 20] [--messages 10] [--startup-ms 50] [--send-ms 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import imessage_agent
+from benchmarks.chat_db_fixture import handle_ids
+from benchmarks.osascript_stub import install
+
+UNDELIVERABLE = "undeliverable"
+
+
+def blocking_send(handle_id: str, text: str) -> bool:
+    """The previous client: a synchronous osascript call with the text inside the script."""
+    escaped_text = text.replace('"', '\\"')
+    applescript = f'''
+    tell application "Messages"
+      set targetService to 1st service whose service type = iMessage
+      set theBuddy to buddy "{handle_id}" of targetService
+      send "{escaped_text}" to theBuddy
+    end tell
+    '''
+    try:
+        subprocess.run(["osascript", "-e", applescript], check=True)
+        return True
+    except subprocess.CalledProcessError:
+        return False
+
+
+def conversation(handle_index: int, messages: int) -> list:
+    """Texts one conversation sends; the first conversation has some the stub rejects."""
+    return [
+        f"{UNDELIVERABLE} {seq}" if handle_index == 0 and seq % 3 == 1 else f"message {seq}"
+        for seq in range(messages)
+    ]
+
+
+async def heartbeat(stalls: list) -> None:
+    """Record the longest gap between 10 ms ticks beyond the tick itself."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        stalls[0] = max(stalls[0], time.perf_counter() - start - 0.01)
+
+
+async def run(mode: str, handles: list, messages: int) -> tuple:
+    """Send every conversation's messages; return elapsed seconds, results, invocations and stall."""
+    sender = None if mode == "blocking" else imessage_agent.MessageSender(mode=mode)
+    results: dict = {}
+
+    async def reply(handle_index: int, handle_id: str) -> None:
+        for text in conversation(handle_index, messages):
+            if sender is None:
+                ok = blocking_send(handle_id, text)
+            else:
+                ok = await sender.send(handle_id, text)
+            results[(handle_id, text)] = ok
+            await asyncio.sleep(0)
+
+    stalls = [0.0]
+    ticker = asyncio.create_task(heartbeat(stalls))
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    await asyncio.gather(*(reply(i, handle_id) for i, handle_id in enumerate(handles)))
+    elapsed = time.perf_counter() - start
+    ticker.cancel()
+    spawns = len(results) if sender is None else sender.spawns
+    if sender is not None:
+        await sender.close()
+    return elapsed, results, spawns, stalls[0]
+
+
+def check(results: dict, log_path: str, handles: list, messages: int, logged: bool) -> None:
+    """Failures reported for exactly the rejected messages; delivered ones in order per handle."""
+    for (handle_id, text), ok in results.items():
+        assert ok == (UNDELIVERABLE not in text), f"{handle_id} {text!r} reported {ok}"
+    if not logged:
+        return
+    delivered: dict = {}
+    with open(log_path) as f:
+        for line in f:
+            message = json.loads(line)
+            delivered.setdefault(message["handle"], []).append(message["text"])
+    for i, handle_id in enumerate(handles):
+        expected = [text for text in conversation(i, messages) if UNDELIVERABLE not in text]
+        assert delivered[handle_id] == expected, f"{handle_id} delivered out of order: {delivered[handle_id]}"
+
+
+def main(args: argparse.Namespace) -> None:
+    handles = handle_ids(args.handles)
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        install(directory)
+        os.environ["PATH"] = directory + os.pathsep + os.environ["PATH"]
+        os.environ["OSASCRIPT_STUB_STARTUP"] = str(args.startup_ms / 1000)
+        os.environ["OSASCRIPT_STUB_LATENCY"] = str(args.send_ms / 1000)
+        os.environ["OSASCRIPT_STUB_FAIL"] = UNDELIVERABLE
+        os.environ["IMESSAGE_SEND_BATCH"] = str(args.batch)
+
+        for mode in ("blocking", "script", "worker"):
+            log_path = os.path.join(directory, f"{mode}.log")
+            os.environ["OSASCRIPT_STUB_LOG"] = log_path
+            elapsed, results, spawns, stall = asyncio.run(run(mode, handles, args.messages))
+            check(results, log_path, handles, args.messages, logged=mode != "blocking")
+            rows.append((mode, len(results) / elapsed, spawns, stall * 1000))
+
+    print(f"{args.handles} conversations x {args.messages} messages, "
+          f"osascript startup {args.startup_ms:g} ms, {args.send_ms:g} ms per send, batches of {args.batch}")
+    print(f"{'':<12}{'sends/s':>10}{'osascript runs':>16}{'max stall ms':>14}")
+    for mode, rate, spawns, stall_ms in rows:
+        print(f"{mode:<12}{rate:>10.1f}{spawns:>16}{stall_ms:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handles", type=int, default=20, help="Conversations replying at once")
+    parser.add_argument("--messages", type=int, default=10, help="Messages per conversation")
+    parser.add_argument("--startup-ms", type=float, default=50, help="osascript startup time")
+    parser.add_argument("--send-ms", type=float, default=5, help="Time Messages takes per send")
+    parser.add_argument("--batch", type=int, default=16, help="IMESSAGE_SEND_BATCH")
+    main(parser.parse_args())
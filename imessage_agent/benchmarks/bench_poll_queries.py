@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+One poll tick of the iMessage agent: a query per active handle versus a single query.
+
+Generates a synthetic chat.db with many active conversations, caught up except for
+new incoming messages from some of the handles, then times fetching each handle's
+new messages the old way (query_new_messages once per handle, each on a fresh
+connection) and with query_new_messages_by_handle (one query above the lowest
+watermark, grouped in memory). Also times the single query when one conversation
+lags far behind, since its watermark sets where the scan starts.
+
+Usage (from imessage_agent/):
+    python benchmarks/bench_poll_queries.py [--handles 10000] [--messages 20] [--new 200]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import imessage_agent
+from benchmarks.chat_db_fixture import add_incoming, create_chat_db
+
+
+async def timed(function, repeats: int) -> float:
+    """Mean time of a call in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+async def run(args: argparse.Namespace) -> tuple:
+    """Build the database and time each way of polling; return the ms per tick of each."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "chat.db")
+        create_chat_db(path, args.handles, args.messages)
+        imessage_agent.DB_PATH = path
+
+        # Every conversation has handled everything so far
+        with sqlite3.connect(path) as db:
+            watermarks = dict(db.execute(
+                "SELECT h.id, max(m.ROWID) FROM message AS m JOIN handle AS h ON m.handle_id = h.ROWID GROUP BY h.id"
+            ).fetchall())
+        add_incoming(path, random.Random(1).sample(range(1, args.handles + 1), args.new))
+
+        async def per_handle():
+            results = {}
+            for handle_id, last_rowid in watermarks.items():
+                rows = await imessage_agent.query_new_messages(last_rowid, handle_id)
+                if rows:
+                    results[handle_id] = rows
+            return results
+
+        async def single():
+            return await imessage_agent.query_new_messages_by_handle(watermarks)
+
+        expected = await per_handle()
+        assert await single() == expected and len(expected) == args.new
+        per_handle_ms = await timed(per_handle, args.ticks)
+        single_ms = await timed(single, args.ticks * 10)
+
+        lagging = dict(watermarks)
+        lagging[next(iter(lagging))] = 0
+        lagging_ms = await timed(lambda: imessage_agent.query_new_messages_by_handle(lagging), args.ticks * 10)
+    return per_handle_ms, single_ms, lagging_ms
+
+
+def main(args: argparse.Namespace) -> None:
+    per_handle_ms, single_ms, lagging_ms = asyncio.run(run(args))
+    print(f"{args.handles} active handles, {args.handles * args.messages} messages, {args.new} new")
+    print(f"{'':<30}{'queries':>10}{'ms/tick':>12}")
+    print(f"{'query per handle':<30}{args.handles:>10}{per_handle_ms:>12.1f}")
+    print(f"{'single query':<30}{1:>10}{single_ms:>12.2f}")
+    print(f"{'single query, one handle at 0':<30}{1:>10}{lagging_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handles", type=int, default=10000, help="Active conversations")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per conversation so far")
+    parser.add_argument("--new", type=int, default=200, help="Handles with a new incoming message")
+    parser.add_argument("--ticks", type=int, default=3, help="Ticks timed with a query per handle")
+    main(parser.parse_args())
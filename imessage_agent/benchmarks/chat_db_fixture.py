@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Synthetic Messages database for benchmarking the iMessage poller off macOS.
+
+Creates the parts of ~/Library/Messages/chat.db the agent queries: the `handle` and
+`message` tables with their columns and indexes as macOS lays them out, filled with
+conversations between the agent and many handles.
+
+Usage (from imessage_agent/):
+    python benchmarks/chat_db_fixture.py chat.db [--handles 10000] [--messages 20]
+"""
+
+import argparse
+import datetime
+import random
+import sqlite3
+import time
+import uuid
+from typing import List
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS handle (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE,
+    id TEXT NOT NULL,
+    country TEXT,
+    service TEXT NOT NULL,
+    uncanonicalized_id TEXT,
+    person_centric_id TEXT,
+    UNIQUE (id, service)
+);
+CREATE TABLE IF NOT EXISTS message (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    text TEXT,
+    handle_id INTEGER DEFAULT 0,
+    service TEXT,
+    date INTEGER,
+    date_read INTEGER,
+    date_delivered INTEGER,
+    is_from_me INTEGER DEFAULT 0,
+    is_read INTEGER DEFAULT 0,
+    is_delivered INTEGER DEFAULT 0,
+    cache_roomnames TEXT
+);
+CREATE INDEX IF NOT EXISTS message_idx_handle ON message (handle_id, date);
+CREATE INDEX IF NOT EXISTS message_idx_date ON message (date);
+CREATE INDEX IF NOT EXISTS message_idx_is_read ON message (is_read, is_from_me, is_delivered);
+"""
+
+GREETING = "Welcome to Series! Text your color to get started: 🟣"
+REPLIES = [
+    "blue!", "my name is Jordan Lee", "jordan@berkeley.edu", "junior @Berkeley building a climate startup",
+    "founders in SF, ML researchers, and designers", "someone who has raised a seed round in climate tech",
+]
+AGENT_LINES = [
+    "hey! 👋 I'm Olivia from Series. what's ur full name?", "nice! what's ur email?",
+    "got it. tell me a bit about urself", "who do u want to meet?",
+]
+
+# Message dates are nanoseconds since 2001-01-01
+APPLE_EPOCH = datetime.datetime(2001, 1, 1)
+
+
+def apple_time(moment: datetime.datetime) -> int:
+    """Convert a time to a Messages `date` value."""
+    return int((moment - APPLE_EPOCH).total_seconds() * 1e9)
+
+
+def handle_ids(handles: int) -> List[str]:
+    """The handle ids (phone numbers) used for `handles` synthetic contacts."""
+    return [f"+1555{i:07d}" for i in range(handles)]
+
+
+def create_chat_db(path: str, handles: int = 10000, messages: int = 20, seed: int = 7, journal_mode: str = "wal") -> None:
+    """
+    Create a Messages database with `handles` conversations of `messages` messages each.
+
+    Each conversation opens with the welcome greeting from the contact, then alternates
+    agent and contact messages. Conversations are interleaved in time, as they are
+    when many people talk to the agent at once.
+
+    Args:
+        path: Database file to create
+        handles: Number of contacts
+        messages: Messages per conversation
+        seed: Random seed
+        journal_mode: "wal" like Messages, or "delete", where a writer's lock blocks readers
+    """
+    rng = random.Random(seed)
+    db = sqlite3.connect(path)
+    db.execute(f"PRAGMA journal_mode = {journal_mode}")
+    db.executescript(SCHEMA)
+    db.executemany(
+        "INSERT INTO handle (id, country, service, uncanonicalized_id) VALUES (?, 'us', 'iMessage', ?)",
+        [(handle_id, handle_id) for handle_id in handle_ids(handles)],
+    )
+    moment = datetime.datetime(2025, 1, 1)
+    rows = []
+    for seq in range(messages):
+        for handle_rowid in rng.sample(range(1, handles + 1), handles):
+            moment += datetime.timedelta(milliseconds=50)
+            from_me = seq % 2
+            if seq == 0:
+                text = GREETING
+            else:
+                text = rng.choice(AGENT_LINES if from_me else REPLIES)
+            rows.append((str(uuid.UUID(int=rng.getrandbits(128))), text, handle_rowid, apple_time(moment), from_me))
+    db.executemany(
+        "INSERT INTO message (guid, text, handle_id, service, date, is_from_me, is_read, is_delivered) "
+        "VALUES (?, ?, ?, 'iMessage', ?, ?, 1, 1)",
+        rows,
+    )
+    db.commit()
+    db.close()
+
+
+def add_incoming(path: str, handle_rowids: List[int], text: str = "sounds good!") -> List[int]:
+    """
+    Append one incoming message from each of the given handles.
+
+    Args:
+        path: Database file
+        handle_rowids: ROWIDs in the handle table of the senders
+        text: Message text
+
+    Returns:
+        The ROWIDs of the new messages
+    """
+    db = sqlite3.connect(path)
+    now = apple_time(datetime.datetime.now())
+    rowids = []
+    for handle_rowid in handle_rowids:
+        cursor = db.execute(
+            "INSERT INTO message (guid, text, handle_id, service, date, is_from_me) VALUES (?, ?, ?, 'iMessage', ?, 0)",
+            (str(uuid.uuid4()), text, handle_rowid, now),
+        )
+        rowids.append(cursor.lastrowid)
+    db.commit()
+    db.close()
+    return rowids
+
+
+def hold_write_lock(path: str, seconds: float) -> None:
+    """
+    Keep an exclusive write transaction open on the database, as Messages does while
+    it stores incoming messages. In "delete" journal mode readers get `database is
+    locked` meanwhile.
+
+    Args:
+        path: Database file
+        seconds: How long to hold the lock
+    """
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute("BEGIN EXCLUSIVE")
+    time.sleep(seconds)
+    db.execute("COMMIT")
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Database file to create")
+    parser.add_argument("--handles", type=int, default=10000, help="Number of contacts")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per conversation")
+    parser.add_argument("--journal-mode", default="wal", help="wal (as on macOS) or delete")
+    args = parser.parse_args()
+    create_chat_db(args.path, args.handles, args.messages, journal_mode=args.journal_mode)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Stand-in for macOS `osascript`, for running the iMessage sender off macOS.
+
+install() writes an `osascript` executable that runs this file into a directory to put
+first on PATH. It answers the ways the agent invokes osascript:
+
+- `osascript -l JavaScript -e <worker>`: the MessageSender worker. Reads JSON requests
+  from stdin and writes a JSON result line for each.
+- `osascript -e <script> handle text [handle text ...]`: one MessageSender batch. Prints
+  one line per message, "ok" or the error.
+- `osascript -e <script>`: one message with its text inside the script, as the agent
+  used to send. A rejected message exits with status 1, as osascript does. Nothing is logged.
+
+Settings come from the environment:
+
+- OSASCRIPT_STUB_STARTUP: seconds each invocation waits before it starts, for the
+  interpreter and Apple Events setup.
+- OSASCRIPT_STUB_LATENCY: seconds per message sent.
+- OSASCRIPT_STUB_FAIL: messages containing this text fail.
+- OSASCRIPT_STUB_LOG: each sent message is appended to this file as a JSON line.
+"""
+
+import json
+import os
+import stat
+import sys
+import time
+from typing import Optional
+
+STARTUP = float(os.getenv("OSASCRIPT_STUB_STARTUP", "0"))
+LATENCY = float(os.getenv("OSASCRIPT_STUB_LATENCY", "0"))
+FAIL = os.getenv("OSASCRIPT_STUB_FAIL", "")
+LOG = os.getenv("OSASCRIPT_STUB_LOG", "")
+
+
+def install(directory: str) -> str:
+    """
+    Write an `osascript` executable that runs this stub into a directory.
+
+    Args:
+        directory: Directory to put first on PATH
+
+    Returns:
+        Path of the executable
+    """
+    path = os.path.join(directory, "osascript")
+    with open(path, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.abspath(__file__)}" "$@"\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def send(handle_id: Optional[str], text: Optional[str]) -> str:
+    """Deliver one message; return "ok" or the error."""
+    time.sleep(LATENCY)
+    if FAIL and text is not None and FAIL in text:
+        return f"Can't send to {handle_id}"
+    if LOG and handle_id is not None:
+        with open(LOG, "a") as f:
+            f.write(json.dumps({"handle": handle_id, "text": text}) + "\n")
+    return "ok"
+
+
+def main(argv: list) -> None:
+    time.sleep(STARTUP)
+    if argv[:2] == ["-l", "JavaScript"]:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            outcome = send(request["handle"], request["text"])
+            result = {"id": request["id"], "ok": outcome == "ok"}
+            if outcome != "ok":
+                result["error"] = outcome
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+        return
+
+    pairs = argv[2:]
+    if not pairs:
+        outcome = send(None, argv[1])
+        if outcome != "ok":
+            sys.exit(f"execution error: {outcome}")
+        return
+    print("\n".join(send(handle_id, text) for handle_id, text in zip(pairs[::2], pairs[1::2])))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
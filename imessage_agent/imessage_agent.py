@@ -14,9 +14,12 @@ Requirements:
 
 import sqlite3
 import os
-import time
-import subprocess
+import ctypes
+import ctypes.util
+import select
+import struct
 import asyncio
+import json
 import logging
 import sys
 from typing import Dict, List, Optional, Tuple
@@ -37,21 +40,262 @@ logger = logging.getLogger("imessage_agent")
 # Path to the Messages database
 DB_PATH = os.path.expanduser("~/Library/Messages/chat.db")
 
+# Send replies paragraph by paragraph while the LLM is still generating
+STREAM_REPLIES = os.getenv("IMESSAGE_STREAM_REPLIES", "true").lower() == "true"
+
 # Import adaptive_chat components
 # Add parent directory to Python path to import from adaptive_chat
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from adaptive_chat.src.agent import SeriesAIAgent
+from adaptive_chat.src.admission import AdmissionRejected
 
 # Dictionary to store conversations by handle_id
 conversations: Dict[str, Dict] = {}
 
+# Greetings whose welcome reply failed, retried on the next poll: handle_id -> greeting rowid
+deferred_greetings: Dict[str, int] = {}
+
+# Long-lived JXA worker for MessageSender: reads one JSON request per line from stdin,
+# sends it with Messages and writes one JSON result line to stdout. Requests are
+# ASCII-only JSON, so a read never ends inside a character.
+SEND_WORKER_SCRIPT = r"""
+ObjC.import('Foundation');
+function run() {
+    const Messages = Application('Messages');
+    const service = Messages.services.whose({serviceType: 'iMessage'})[0];
+    const input = $.NSFileHandle.fileHandleWithStandardInput;
+    const output = $.NSFileHandle.fileHandleWithStandardOutput;
+    let pending = '';
+    for (;;) {
+        const data = input.availableData;
+        if (data.length === 0) {
+            return;
+        }
+        pending += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+        const lines = pending.split('\n');
+        pending = lines.pop();
+        for (const line of lines) {
+            if (!line) {
+                continue;
+            }
+            const request = JSON.parse(line);
+            const result = {id: request.id, ok: true};
+            try {
+                Messages.send(request.text, {to: service.buddies.byName(request.handle)});
+            } catch (e) {
+                result.ok = false;
+                result.error = String(e);
+            }
+            output.writeData($(JSON.stringify(result) + '\n').dataUsingEncoding($.NSUTF8StringEncoding));
+        }
+    }
+}
+"""
+
+# One-shot AppleScript for MessageSender's "script" mode: sends each (handle, text) pair
+# in argv and prints one line per message, "ok" or the error
+SEND_BATCH_SCRIPT = """
+on run argv
+    set results to {}
+    tell application "Messages"
+        set targetService to 1st service whose service type = iMessage
+        repeat with i from 1 to (count argv) by 2
+            try
+                send (item (i + 1) of argv) to buddy (item i of argv) of targetService
+                set end of results to "ok"
+            on error errorMessage
+                set end of results to errorMessage
+            end try
+        end repeat
+    end tell
+    set AppleScript's text item delimiters to linefeed
+    return results as text
+end run
+"""
+
+class MessageSender:
+    """
+    Sends iMessages through osascript without blocking the event loop.
+    
+    Sends wait in a bounded queue (IMESSAGE_SEND_QUEUE) and a single task writes them
+    out in batches of up to IMESSAGE_SEND_BATCH messages, in the order they were
+    queued. In "worker" mode (the default) every batch goes to one long-lived
+    `osascript` JXA process over stdin, so the interpreter and the Apple Events
+    connection to Messages are set up once rather than per message; the worker is
+    restarted on the next batch if it exits or stops answering. In "script" mode
+    (IMESSAGE_SEND_MODE=script) each batch is one osascript invocation.
+    
+    Text and handles are passed as data (JSON or argv), never spliced into the script,
+    and every send reports its own result. IMESSAGE_OSASCRIPT names the executable,
+    so a stand-in on PATH can replace osascript off macOS.
+    """
+    
+    def __init__(self, executable: Optional[str] = None, mode: Optional[str] = None):
+        """
+        Initialize the sender settings. The queue and worker start on the first send.
+        
+        Args:
+            executable: osascript executable, looked up on PATH
+            mode: "worker" or "script"
+        """
+        self.executable = executable or os.getenv("IMESSAGE_OSASCRIPT", "osascript")
+        self.mode = (mode or os.getenv("IMESSAGE_SEND_MODE", "worker")).lower()
+        self.queue_size = int(os.getenv("IMESSAGE_SEND_QUEUE", "256"))
+        self.batch_size = int(os.getenv("IMESSAGE_SEND_BATCH", "16"))
+        # Seconds per message before a send counts as failed and the worker is restarted
+        self.timeout = float(os.getenv("IMESSAGE_SEND_TIMEOUT", "30"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._next_id = 0
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.spawns = 0
+    
+    async def send(self, handle_id: str, text: str) -> bool:
+        """
+        Send an iMessage to the specified handle_id, waiting for its turn in the queue.
+        
+        Args:
+            handle_id: Phone number or email
+            text: Message to send
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(self.queue_size)
+            self._task = asyncio.create_task(self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((handle_id, text, future))
+        ok, error = await future
+        if ok:
+            self.sent += 1
+            logger.info(f"Message sent to {handle_id}")
+        else:
+            self.failed += 1
+            logger.error(f"Failed to send message to {handle_id}: {error}")
+        return ok
+    
+    async def _run(self) -> None:
+        """Take queued messages in batches and report each message's result."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            results: List[Tuple[bool, str]] = []
+            try:
+                if self.mode == "script":
+                    await self._send_script(batch, results)
+                else:
+                    await self._send_worker(batch, results)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                logger.error(f"Error sending messages with osascript: {error}")
+                results += [(False, error)] * (len(batch) - len(results))
+                await self._stop_worker()
+            finally:
+                self.batches += 1
+                for i, (_, _, future) in enumerate(batch):
+                    if not future.done():
+                        future.set_result(results[i] if i < len(results) else (False, "sender closed"))
+    
+    async def _send_worker(self, batch: List[Tuple], results: List[Tuple[bool, str]]) -> None:
+        """Write a batch to the worker and read its results, starting the worker if needed."""
+        if self._process is None or self._process.returncode is not None:
+            self._process = await asyncio.create_subprocess_exec(
+                self.executable, "-l", "JavaScript", "-e", SEND_WORKER_SCRIPT,
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            )
+            self.spawns += 1
+        
+        first_id = self._next_id
+        self._next_id += len(batch)
+        self._process.stdin.write("".join(
+            json.dumps({"id": first_id + i, "handle": handle_id, "text": text}) + "\n"
+            for i, (handle_id, text, _) in enumerate(batch)
+        ).encode())
+        await self._process.stdin.drain()
+        
+        for i in range(len(batch)):
+            try:
+                line = await asyncio.wait_for(self._process.stdout.readline(), self.timeout)
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"osascript worker did not answer within {self.timeout:g}s")
+            if not line:
+                raise RuntimeError(f"osascript worker exited with {await self._process.wait()}")
+            result = json.loads(line)
+            if result.get("id") != first_id + i:
+                raise RuntimeError(f"osascript worker answered {result.get('id')} instead of {first_id + i}")
+            results.append((bool(result.get("ok")), result.get("error", "")))
+    
+    async def _send_script(self, batch: List[Tuple], results: List[Tuple[bool, str]]) -> None:
+        """Send a batch with one osascript invocation."""
+        argv = [item for handle_id, text, _ in batch for item in (handle_id, text)]
+        process = await asyncio.create_subprocess_exec(
+            self.executable, "-e", SEND_BATCH_SCRIPT, *argv,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        self.spawns += 1
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), self.timeout * len(batch))
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(stderr.decode().strip() or f"osascript exited with {process.returncode}")
+        for line in stdout.decode().splitlines()[:len(batch)]:
+            results.append((line == "ok", "" if line == "ok" else line))
+    
+    async def _stop_worker(self) -> None:
+        """Stop the worker process; the next batch starts a new one."""
+        process, self._process = self._process, None
+        if process is None or process.returncode is not None:
+            return
+        process.stdin.close()
+        try:
+            await asyncio.wait_for(process.wait(), 1)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+    
+    async def close(self) -> None:
+        """Stop sending; messages still queued are reported as failed."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_result((False, "sender closed"))
+        await self._stop_worker()
+
+# Shared sender, started on the first send
+_message_sender: Optional[MessageSender] = None
+
+def get_message_sender() -> MessageSender:
+    """Return the shared MessageSender."""
+    global _message_sender
+    if _message_sender is None:
+        _message_sender = MessageSender()
+    return _message_sender
+
 class iMessageClient:
     """Client for sending iMessages via AppleScript."""
     
     @staticmethod
-    def send_message(handle_id: str, text: str) -> bool:
+    async def send_message(handle_id: str, text: str) -> bool:
         """
-        Send an iMessage to the specified handle_id.
+        Send an iMessage to the specified handle_id through the shared MessageSender.
         
         Args:
             handle_id: Phone number or email
@@ -60,83 +304,405 @@ class iMessageClient:
         Returns:
             True if successful, False otherwise
         """
-        # Escape double quotes in the message to prevent AppleScript injection
-        escaped_text = text.replace('"', '\\"')
+        return await get_message_sender().send(handle_id, text)
+
+async def send_streamed_response(agent: SeriesAIAgent, handle_id: str, text: str) -> List[str]:
+    """
+    Stream the agent's reply to a message and send it one paragraph at a time,
+    so the first text bubble goes out as soon as its paragraph is complete.
+    Once a paragraph fails to send, the rest are not sent either, so they never
+    arrive out of order; the stream is still read to the end to finish the turn.
+    Returns the paragraphs that were not sent, in order.
+    """
+    buffer = ""
+    undelivered: List[str] = []
+    
+    async def send(paragraph: str) -> None:
+        if not undelivered and await iMessageClient.send_message(handle_id, paragraph):
+            return
+        undelivered.append(paragraph)
+    
+    async for chunk in agent.process_message_stream(text, handle_id):
+        buffer += chunk
+        # Flush every completed paragraph
+        while "\n\n" in buffer:
+            paragraph, buffer = buffer.split("\n\n", 1)
+            if paragraph.strip():
+                await send(paragraph.strip())
+    
+    # Flush whatever is left once the stream ends
+    if buffer.strip():
+        await send(buffer.strip())
+    
+    return undelivered
+
+GREETINGS_QUERY = """
+    SELECT m.ROWID, h.id, m.text
+      FROM message AS m
+      JOIN handle  AS h ON m.handle_id = h.ROWID
+     WHERE m.is_from_me = 0
+       AND m.ROWID > ?
+       AND m.text LIKE 'Welcome to Series! Text your color to get started:%'
+     ORDER BY m.ROWID ASC
+"""
+
+HANDLE_MESSAGES_QUERY = """
+    SELECT m.ROWID, h.id, m.text
+      FROM message AS m
+      JOIN handle  AS h ON m.handle_id = h.ROWID
+     WHERE m.is_from_me = 0
+       AND m.ROWID > ?
+       AND h.id = ?
+     ORDER BY m.ROWID ASC
+"""
+
+NEW_MESSAGES_QUERY = """
+    SELECT m.ROWID, h.id, m.text
+      FROM message AS m
+      JOIN handle  AS h ON m.handle_id = h.ROWID
+     WHERE m.is_from_me = 0
+       AND m.ROWID > ?
+     ORDER BY m.ROWID ASC
+"""
+
+class ChatDatabase:
+    """
+    Long-lived read-only connection to the Messages database.
+    
+    The database is opened once with a `mode=ro` URI, so the agent can never write to
+    it, and tuned for repeated polling: a memory-mapped file and a large page cache keep
+    the hot pages resident between ticks, and the connection's statement cache keeps
+    each query prepared after its first use. Every query still sees the latest commits,
+    since reads run outside any long-lived transaction.
+    
+    Messages writes to the database constantly; queries that hit `database is locked`
+    are retried with an asyncio backoff, so a locked database never stalls the event
+    loop. Any other database error closes the connection so the
+    next query reopens it (for example after the file was replaced).
+    """
+    
+    def __init__(self, path: str):
+        """
+        Initialize the connection settings. The database is opened on first use.
         
-        applescript = f'''
-        tell application "Messages"
-          set targetService to 1st service whose service type = iMessage
-          set theBuddy to buddy "{handle_id}" of targetService
-          send "{escaped_text}" to theBuddy
-        end tell
-        '''
+        Args:
+            path: Path to chat.db
+        """
+        self.path = path
+        self.mmap_size = int(os.getenv("IMESSAGE_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+        self.cache_size_kb = int(os.getenv("IMESSAGE_DB_CACHE_KB", str(64 * 1024)))
+        self.retries = int(os.getenv("IMESSAGE_DB_RETRIES", "5"))
+        self.retry_delay = float(os.getenv("IMESSAGE_DB_RETRY_DELAY", "0.05"))
+        self._conn: Optional[sqlite3.Connection] = None
+        self.queries = 0
+        self.retried = 0
+        self.connects = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database read-only and apply the PRAGMAs."""
+        uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+        # No busy timeout: SQLite's busy handler sleeps in place, so lock waits are retried in query() instead
+        conn = sqlite3.connect(uri, uri=True, timeout=0, cached_statements=64)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA cache_size = -{self.cache_size_kb}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        self.connects += 1
+        return conn
+    
+    async def query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        """
+        Run a read query and return all of its rows.
         
-        try:
-            subprocess.run(["osascript", "-e", applescript], check=True)
-            logger.info(f"Message sent to {handle_id}")
-            return True
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to send message: {str(e)}")
-            return False
-        except Exception as e:
-            logger.error(f"Error sending message: {str(e)}")
-            return False
+        Args:
+            sql: One of the query constants, so its prepared statement is reused
+            params: Query parameters
+            
+        Returns:
+            The result rows
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                self.queries += 1
+                return self._conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                message = str(e)
+                if ("locked" in message or "busy" in message) and attempt < self.retries:
+                    self.retried += 1
+                    logger.debug(f"Messages database busy, retrying: {message}")
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+                    continue
+                logger.error(f"Error querying the Messages database: {message}")
+                self.close()
+                raise
+    
+    def close(self) -> None:
+        """Close the connection; the next query reopens it."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+# Shared connection to DB_PATH, opened on first use
+_chat_db: Optional[ChatDatabase] = None
+
+def get_chat_db() -> ChatDatabase:
+    """Return the shared read-only connection to the Messages database at DB_PATH."""
+    global _chat_db
+    if _chat_db is None or _chat_db.path != DB_PATH:
+        if _chat_db is not None:
+            _chat_db.close()
+        _chat_db = ChatDatabase(DB_PATH)
+    return _chat_db
 
-def query_new_greetings(last_rowid: int) -> List[Tuple[int, str, str]]:
+async def query_new_greetings(last_rowid: int) -> List[Tuple[int, str, str]]:
     """
     Returns a list of tuples (msg_rowid, handle_id, full_text)
     for any new incoming iMessage whose text starts with our welcome prompt.
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
     # look for any incoming (is_from_me=0) message matching our exact-prefix
-    c.execute("""
-        SELECT m.ROWID, h.id, m.text
-          FROM message AS m
-          JOIN handle  AS h ON m.handle_id = h.ROWID
-         WHERE m.is_from_me = 0
-           AND m.ROWID > ?
-           AND m.text LIKE 'Welcome to Series! Text your color to get started:%'
-         ORDER BY m.ROWID ASC
-    """, (last_rowid,))
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def query_new_messages(last_rowid: int, handle_id: Optional[str] = None) -> List[Tuple[int, str, str]]:
+    return await get_chat_db().query(GREETINGS_QUERY, (last_rowid,))
+
+async def query_new_messages(last_rowid: int, handle_id: Optional[str] = None) -> List[Tuple[int, str, str]]:
     """
     Returns a list of tuples (msg_rowid, handle_id, full_text)
     for any new incoming iMessage from the specified handle_id.
     If handle_id is None, returns messages from all handles.
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
     if handle_id:
         # Get messages from a specific handle_id
-        c.execute("""
-            SELECT m.ROWID, h.id, m.text
-              FROM message AS m
-              JOIN handle  AS h ON m.handle_id = h.ROWID
-             WHERE m.is_from_me = 0
-               AND m.ROWID > ?
-               AND h.id = ?
-             ORDER BY m.ROWID ASC
-        """, (last_rowid, handle_id))
-    else:
-        # Get messages from any handle
-        c.execute("""
-            SELECT m.ROWID, h.id, m.text
-              FROM message AS m
-              JOIN handle  AS h ON m.handle_id = h.ROWID
-             WHERE m.is_from_me = 0
-               AND m.ROWID > ?
-             ORDER BY m.ROWID ASC
-        """, (last_rowid,))
+        return await get_chat_db().query(HANDLE_MESSAGES_QUERY, (last_rowid, handle_id))
+    # Get messages from any handle
+    return await get_chat_db().query(NEW_MESSAGES_QUERY, (last_rowid,))
+
+async def query_new_messages_by_handle(last_rowids: Dict[str, int]) -> Dict[str, List[Tuple[int, str, str]]]:
+    """
+    Fetch the new incoming messages of many conversations with a single query.
+
+    Reads every incoming message above the lowest watermark once, then groups the rows
+    by handle and keeps those above each handle's own watermark, instead of running
+    one query (and opening one connection) per handle.
+
+    Args:
+        last_rowids: Last processed message rowid for each handle_id
+
+    Returns:
+        Dict mapping each handle_id with new messages to its (msg_rowid, handle_id, full_text)
+        tuples, in rowid order
+    """
+    if not last_rowids:
+        return {}
+
+    new_messages: Dict[str, List[Tuple[int, str, str]]] = {}
+    for row in await query_new_messages(min(last_rowids.values())):
+        rowid, handle_id, _ = row
+        last_rowid = last_rowids.get(handle_id)
+        if last_rowid is not None and rowid > last_rowid:
+            new_messages.setdefault(handle_id, []).append(row)
+    return new_messages
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+INOTIFY_EVENT = struct.Struct("iIII")
+
+class ChatDBWatcher:
+    """
+    Wakes the main loop when Messages writes to chat.db, instead of sleeping a fixed interval.
+    
+    Writes to `chat.db` and `chat.db-wal` are detected with inotify on Linux, kqueue on
+    macOS, or by comparing their stat results every `stat_interval` seconds where
+    neither is available (IMESSAGE_WATCH selects one explicitly, or "none" to rely on
+    the interval alone). `chat.db-shm` is not watched, since readers write to it too.
+    
+    The wait between polls also has a timeout, as a safety net for changes that are not
+    reported: `next_interval()` keeps it at `min_interval` while polls find messages and
+    doubles it up to `max_interval` while they do not.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Initialize the watcher settings. Watching starts with start().
         
-    rows = c.fetchall()
-    conn.close()
-    return rows
+        Args:
+            path: Path to chat.db
+        """
+        self.path = Path(path)
+        self.names = {self.path.name, self.path.name + "-wal"}
+        self.mode = os.getenv("IMESSAGE_WATCH", "auto").lower()
+        self.min_interval = float(os.getenv("IMESSAGE_POLL_MIN_INTERVAL", "1"))
+        self.max_interval = float(os.getenv("IMESSAGE_POLL_MAX_INTERVAL", "30"))
+        self.stat_interval = float(os.getenv("IMESSAGE_STAT_INTERVAL", "0.05"))
+        # Messages writes a message in several steps; give them time to finish before querying
+        self.debounce = float(os.getenv("IMESSAGE_WAKE_DEBOUNCE", "0.01"))
+        self.interval = self.min_interval
+        self._changed = asyncio.Event()
+        self._fd: Optional[int] = None
+        self._kqueue = None
+        self._kqueue_fds: List[int] = []
+        self._stat_task: Optional[asyncio.Task] = None
+        self.wakeups = 0
+        self.timeouts = 0
+    
+    async def start(self) -> None:
+        """Start watching, falling back to stat polling if the native mechanism is unavailable."""
+        mode = self.mode
+        if mode == "auto":
+            mode = "inotify" if sys.platform.startswith("linux") else "kqueue" if hasattr(select, "kqueue") else "stat"
+        try:
+            if mode == "inotify":
+                self._start_inotify()
+            elif mode == "kqueue":
+                self._start_kqueue()
+        except Exception as e:
+            logger.warning(f"Cannot watch {self.path} with {mode}, polling its stat instead: {str(e)}")
+            self._close_native()
+            mode = "stat"
+        if mode == "stat":
+            self._stat_task = asyncio.create_task(self._poll_stat())
+        self.mode = mode
+        logger.info(f"Watching {self.path} for changes ({mode})")
+    
+    def _start_inotify(self) -> None:
+        """Watch the database directory with inotify, so a recreated WAL file is seen too."""
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._fd = fd
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, str(self.path.parent).encode(), mask) < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+        asyncio.get_running_loop().add_reader(fd, self._read_inotify)
+    
+    def _read_inotify(self) -> None:
+        """Drain pending inotify events and signal a change if one names a watched file."""
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                if name in self.names:
+                    self._changed.set()
+    
+    def _start_kqueue(self) -> None:
+        """Watch the database files and their directory with kqueue."""
+        self._kqueue = select.kqueue()
+        self._watch_kqueue_files()
+        asyncio.get_running_loop().add_reader(self._kqueue.fileno(), self._read_kqueue)
+    
+    def _watch_kqueue_files(self) -> None:
+        """(Re)register the directory and whichever watched files exist."""
+        for fd in self._kqueue_fds:
+            os.close(fd)
+        self._kqueue_fds = []
+        # O_EVTONLY: watch without keeping the volume busy (macOS only)
+        flags = getattr(os, "O_EVTONLY", os.O_RDONLY)
+        events = []
+        for path in [self.path.parent] + [self.path.parent / name for name in sorted(self.names)]:
+            try:
+                fd = os.open(path, flags)
+            except FileNotFoundError:
+                continue
+            self._kqueue_fds.append(fd)
+            events.append(select.kevent(
+                fd, filter=select.KQ_FILTER_VNODE, flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+                fflags=select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND | select.KQ_NOTE_DELETE | select.KQ_NOTE_RENAME,
+            ))
+        self._kqueue.control(events, 0, 0)
+    
+    def _read_kqueue(self) -> None:
+        """Drain pending kqueue events and signal a change."""
+        events = self._kqueue.control(None, 64, 0)
+        if not events:
+            return
+        directory_fd = self._kqueue_fds[0] if self._kqueue_fds else None
+        if any(event.ident == directory_fd or event.fflags & (select.KQ_NOTE_DELETE | select.KQ_NOTE_RENAME) for event in events):
+            # A file was created, deleted or replaced (the WAL comes and goes); watch the current ones
+            self._watch_kqueue_files()
+        self._changed.set()
+    
+    def _stat_signature(self) -> Tuple:
+        """Inode, size and modification time of each watched file."""
+        signature = []
+        for name in sorted(self.names):
+            try:
+                stat = os.stat(self.path.parent / name)
+                signature.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+    
+    async def _poll_stat(self) -> None:
+        """Fallback: signal a change whenever the watched files' stat results change."""
+        signature = self._stat_signature()
+        while True:
+            await asyncio.sleep(self.stat_interval)
+            current = self._stat_signature()
+            if current != signature:
+                signature = current
+                self._changed.set()
+    
+    def next_interval(self, active: bool) -> float:
+        """
+        Timeout for the next wait: `min_interval` after a poll that found messages,
+        otherwise double the previous one, up to `max_interval`.
+        """
+        self.interval = self.min_interval if active else min(self.interval * 2, self.max_interval)
+        return self.interval
+    
+    async def wait(self, timeout: float) -> bool:
+        """
+        Wait until chat.db changes or `timeout` seconds pass.
+        
+        Returns:
+            True if woken by a change, False on timeout
+        """
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return False
+        await asyncio.sleep(self.debounce)
+        # Changes from here on wake the next wait, so none are lost while the caller polls
+        self._changed.clear()
+        self.wakeups += 1
+        return True
+    
+    def _close_native(self) -> None:
+        """Stop inotify or kqueue watching."""
+        loop = asyncio.get_running_loop()
+        if self._fd is not None:
+            loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        if self._kqueue is not None:
+            loop.remove_reader(self._kqueue.fileno())
+            for fd in self._kqueue_fds:
+                os.close(fd)
+            self._kqueue_fds = []
+            self._kqueue.close()
+            self._kqueue = None
+    
+    async def close(self) -> None:
+        """Stop watching."""
+        self._close_native()
+        if self._stat_task is not None:
+            self._stat_task.cancel()
+            try:
+                await self._stat_task
+            except asyncio.CancelledError:
+                pass
+            self._stat_task = None
 
 async def handle_new_conversations(agent: SeriesAIAgent) -> int:
     """
@@ -146,63 +712,204 @@ async def handle_new_conversations(agent: SeriesAIAgent) -> int:
     global conversations
     last_rowid = max(conversation.get("last_rowid", 0) for conversation in conversations.values()) if conversations else 0
     
-    # Look for new greeting messages
-    new_greetings = query_new_greetings(last_rowid)
+    # Look for new greeting messages, after the ones whose welcome failed
+    greetings = [(rowid, handle_id, None) for handle_id, rowid in deferred_greetings.items()]
+    greetings += [greeting for greeting in await query_new_greetings(last_rowid) if greeting[1] not in deferred_greetings]
+    deferred_greetings.clear()
     
-    for rowid, handle_id, text in new_greetings:
+    for rowid, handle_id, text in greetings:
         last_rowid = max(last_rowid, rowid)
-        logger.info(f"New conversation from {handle_id}: {text}")
+        if text is not None:
+            logger.info(f"New conversation from {handle_id}: {text}")
         
         # Start a new conversation for this handle_id
         if handle_id not in conversations:
+            # Generate welcome response using the agent; the first turn is the fixed
+            # welcome message, so it never waits for LLM admission
+            try:
+                welcome_response = await agent.process_message("START_ONBOARDING", handle_id)
+            except Exception as e:
+                logger.error(f"Error welcoming {handle_id}, will retry on the next poll: {str(e)}", exc_info=True)
+                deferred_greetings[handle_id] = rowid
+                continue
+            
             conversations[handle_id] = {
                 "started_at": datetime.datetime.now(),
                 "last_rowid": rowid,
                 "last_message_time": datetime.datetime.now()
             }
             
-            # Generate welcome response using the agent
-            welcome_response = await agent.process_message("START_ONBOARDING", handle_id)
-            
             # Send the welcome response
-            if iMessageClient.send_message(handle_id, welcome_response):
+            if await iMessageClient.send_message(handle_id, welcome_response):
                 logger.info(f"Sent welcome response to {handle_id}")
             else:
                 logger.error(f"Failed to send welcome response to {handle_id}")
                 
     return last_rowid
 
-async def handle_ongoing_conversations(agent: SeriesAIAgent) -> int:
+class ConversationDispatcher:
     """
-    Process messages from ongoing conversations.
-    Returns the highest message rowid processed.
+    Replies to each conversation in its own asyncio task, so one slow reply no longer
+    holds up every other user.
+    
+    A handle's task handles its messages strictly in rowid order and, once they are
+    done, checks for messages that arrived meanwhile before it exits, so a handle never
+    has two tasks. At most `max_concurrent` replies are in progress across handles. A
+    conversation's watermark only advances once the agent has processed a message, so
+    the conversations file never skips a message that is still in flight; messages
+    that were deferred or failed are picked up again on the next poll.
+    
+    A reply that could not be sent is not regenerated: its unsent text is kept and
+    resent, up to `send_attempts` times, before the handle's next message is handled,
+    on the next poll.
     """
-    global conversations
-    last_rowid = max(conversation.get("last_rowid", 0) for conversation in conversations.values()) if conversations else 0
     
-    # For each active conversation
-    for handle_id, conversation in list(conversations.items()):
-        # Check for new messages in this conversation
-        conversation_last_rowid = conversation.get("last_rowid", 0)
-        new_messages = query_new_messages(conversation_last_rowid, handle_id)
+    def __init__(self, agent: SeriesAIAgent, max_concurrent: Optional[int] = None):
+        """
+        Initialize the dispatcher.
         
-        for rowid, handle_id, text in new_messages:
+        Args:
+            agent: The agent generating replies
+            max_concurrent: Maximum replies in progress at once
+        """
+        self.agent = agent
+        self.max_concurrent = max_concurrent or int(os.getenv("IMESSAGE_MAX_CONCURRENT_HANDLES", "16"))
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self.send_attempts = int(os.getenv("IMESSAGE_SEND_ATTEMPTS", "5"))
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # handle_id -> reply text not sent yet, in order, and the failed attempts so far
+        self._undelivered: Dict[str, Tuple[List[str], int]] = {}
+        self.handled = 0
+    
+    def busy(self, handle_id: str) -> bool:
+        """Whether a task is already replying to this handle."""
+        return handle_id in self._tasks
+    
+    def undelivered_handles(self) -> List[str]:
+        """Handles with reply text still waiting to be resent."""
+        return list(self._undelivered)
+    
+    def dispatch(self, handle_id: str, messages: List[Tuple[int, str, str]]) -> None:
+        """
+        Start replying to a handle's new messages in the background.
+        
+        Args:
+            handle_id: The conversation's handle
+            messages: Its new (msg_rowid, handle_id, full_text) tuples, in rowid order
+        """
+        if self.busy(handle_id):
+            # The running task picks up new messages itself before it exits
+            return
+        self._tasks[handle_id] = asyncio.create_task(self._run(handle_id, messages))
+    
+    async def _run(self, handle_id: str, messages: List[Tuple[int, str, str]]) -> None:
+        """Resend any unsent reply, then handle a conversation's messages in order until none are left."""
+        try:
+            async with self._slots:
+                if not await self._resend(handle_id):
+                    return
+            while messages:
+                for rowid, _, text in messages:
+                    async with self._slots:
+                        if not await self._handle_message(handle_id, rowid, text):
+                            return
+                conversation = conversations.get(handle_id)
+                if conversation is None:
+                    return
+                messages = await query_new_messages(conversation.get("last_rowid", 0), handle_id)
+        except Exception as e:
+            logger.error(f"Error replying to {handle_id}, will retry on the next poll: {str(e)}", exc_info=True)
+        finally:
+            self._tasks.pop(handle_id, None)
+    
+    async def _handle_message(self, handle_id: str, rowid: int, text: str) -> bool:
+        """
+        Process one message with the agent, send the reply and advance the watermark.
+        Returns False if the message was deferred, leaving the watermark so it is retried
+        on the next poll, or if its reply could not be sent, keeping the unsent text to
+        resend before the handle's next message.
+        """
+        logger.info(f"Message from {handle_id}: {text}")
+        
+        # Process the message with the agent and send the response
+        try:
+            if STREAM_REPLIES:
+                undelivered = await send_streamed_response(self.agent, handle_id, text)
+            else:
+                response = await self.agent.process_message(text, handle_id)
+                undelivered = [] if await iMessageClient.send_message(handle_id, response) else [response]
+        except AdmissionRejected as e:
+            # The LLM is saturated; leave the watermark so this message is retried on the next poll
+            logger.warning(f"Deferring reply to {handle_id}: {str(e)}")
+            return False
+        
+        # The agent has recorded the turn, so the message is never processed again
+        conversation = conversations.get(handle_id)
+        if conversation is not None:
             conversation["last_rowid"] = max(conversation.get("last_rowid", 0), rowid)
-            last_rowid = max(last_rowid, rowid)
             conversation["last_message_time"] = datetime.datetime.now()
-            
-            logger.info(f"Message from {handle_id}: {text}")
-            
-            # Process the message with the agent
-            response = await agent.process_message(text, handle_id)
-            
-            # Send the response
-            if iMessageClient.send_message(handle_id, response):
-                logger.info(f"Sent response to {handle_id}")
-            else:
-                logger.error(f"Failed to send response to {handle_id}")
-                
-    return last_rowid
+        self.handled += 1
+        
+        if undelivered:
+            logger.error(f"Failed to send response to {handle_id}, will resend it on the next poll")
+            self._undelivered[handle_id] = (undelivered, 1)
+            return False
+        logger.info(f"Sent response to {handle_id}")
+        return True
+    
+    async def _resend(self, handle_id: str) -> bool:
+        """
+        Send a handle's unsent reply text, in order.
+        Returns False if some of it still could not be sent.
+        """
+        pending = self._undelivered.pop(handle_id, None)
+        if pending is None:
+            return True
+        texts, attempts = pending
+        for i, text in enumerate(texts):
+            if await iMessageClient.send_message(handle_id, text):
+                continue
+            if attempts + 1 >= self.send_attempts:
+                logger.error(f"Giving up on a reply to {handle_id} after {attempts + 1} attempts")
+                return True
+            self._undelivered[handle_id] = (texts[i:], attempts + 1)
+            return False
+        logger.info(f"Sent response to {handle_id}")
+        return True
+    
+    async def join(self) -> None:
+        """Wait until every running task has finished."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+    
+    async def close(self) -> None:
+        """Cancel running tasks; their unfinished messages keep their watermarks and are handled after a restart."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+async def handle_ongoing_conversations(dispatcher: ConversationDispatcher) -> int:
+    """
+    Dispatch new messages from ongoing conversations to their reply tasks.
+    Returns the highest message rowid processed so far.
+    """
+    global conversations
+    
+    # Fetch new messages for every idle conversation at once; busy ones fetch their own
+    new_messages_by_handle = await query_new_messages_by_handle({
+        handle_id: conversation.get("last_rowid", 0)
+        for handle_id, conversation in conversations.items()
+        if not dispatcher.busy(handle_id)
+    })
+    
+    for handle_id, new_messages in new_messages_by_handle.items():
+        dispatcher.dispatch(handle_id, new_messages)
+    # Conversations whose last reply failed to send resend it even without new messages
+    for handle_id in dispatcher.undelivered_handles():
+        if handle_id not in new_messages_by_handle:
+            dispatcher.dispatch(handle_id, [])
+    
+    return max(conversation.get("last_rowid", 0) for conversation in conversations.values()) if conversations else 0
 
 async def cleanup_stale_conversations(max_age_hours: int = 24) -> None:
     """Remove conversations that have been inactive for more than max_age_hours."""
@@ -248,16 +955,24 @@ async def main():
                     }
     
     last_rowid = 0
-    poll_interval = 5  # seconds
+    
+    # Wake up when Messages writes to chat.db, with an adaptive timeout as a fallback
+    watcher = ChatDBWatcher(DB_PATH)
+    await watcher.start()
+    
+    # Replies to different users run concurrently
+    dispatcher = ConversationDispatcher(agent)
     
     try:
         while True:
+            previous_rowid = last_rowid
+            
             # Handle new conversations
             new_conv_max_rowid = await handle_new_conversations(agent)
             last_rowid = max(last_rowid, new_conv_max_rowid)
             
             # Handle ongoing conversations
-            ongoing_max_rowid = await handle_ongoing_conversations(agent)
+            ongoing_max_rowid = await handle_ongoing_conversations(dispatcher)
             last_rowid = max(last_rowid, ongoing_max_rowid)
             
             # Cleanup stale conversations
@@ -268,17 +983,24 @@ async def main():
                 for handle_id, conversation in conversations.items():
                     f.write(f"{handle_id}:{conversation['last_rowid']}\n")
             
-            # Wait before polling again
-            await asyncio.sleep(poll_interval)
+            # Wait for the next change to chat.db; poll sooner while messages are arriving
+            await watcher.wait(watcher.next_interval(active=last_rowid > previous_rowid))
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received, shutting down")
     except Exception as e:
         logger.error(f"Error in main loop: {str(e)}", exc_info=True)
     finally:
+        # Stop replying; messages still in flight keep their watermarks
+        await dispatcher.close()
+        await get_message_sender().close()
+        
         # Save conversations state before exiting
         with open(conversations_file, "w") as f:
             for handle_id, conversation in conversations.items():
                 f.write(f"{handle_id}:{conversation['last_rowid']}\n")
+        await watcher.close()
+        get_chat_db().close()
+        await agent.close()
         logger.info("iMessage agent integration shutdown complete")
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+"""
+Shared setup for the imessage_agent tests.
+
+Puts imessage_agent/ on the path the way the benchmarks do, so tests import the agent
+module and the benchmark fixtures (a synthetic chat.db and an osascript stand-in). Run
+from the repository root or imessage_agent/:
+    python -m pytest imessage_agent/tests
+"""
+
+import os
+import sys
+
+import pytest
+
+IMESSAGE_AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(IMESSAGE_AGENT_DIR)
+
+import imessage_agent
+from benchmarks.chat_db_fixture import create_chat_db
+from benchmarks.osascript_stub import install
+
+
+@pytest.fixture
+def chat_db(tmp_path, monkeypatch):
+    """A chat.db with 4 handles that each sent the greeting and got one reply; the agent polls it."""
+    path = str(tmp_path / "chat.db")
+    create_chat_db(path, handles=4, messages=2)
+    monkeypatch.setattr(imessage_agent, "DB_PATH", path)
+    monkeypatch.setattr(imessage_agent, "conversations", {})
+    monkeypatch.setattr(imessage_agent, "deferred_greetings", {})
+    yield path
+    imessage_agent.get_chat_db().close()
+
+
+@pytest.fixture
+def osascript(tmp_path, monkeypatch):
+    """An osascript stand-in first on PATH; returns the file its sent messages are logged to."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    install(str(bin_dir))
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    log = tmp_path / "sent.jsonl"
+    monkeypatch.setenv("OSASCRIPT_STUB_LOG", str(log))
+    return log
@@ -0,0 +1,188 @@
+"""Polling ticks against a synthetic chat.db: watermarks, dedupe, deferral and resending."""
+
+import asyncio
+import sqlite3
+from typing import Dict, List, Tuple
+
+import pytest
+
+import imessage_agent
+from adaptive_chat.src.admission import AdmissionRejected
+from benchmarks.chat_db_fixture import GREETING, add_incoming, handle_ids
+
+
+class ScriptedAgent:
+    """Stand-in for SeriesAIAgent that records every message it processes."""
+
+    def __init__(self):
+        self.processed: List[Tuple[str, str]] = []
+        self.reject = 0
+
+    def _turn(self, text: str, handle_id: str) -> str:
+        if self.reject:
+            self.reject -= 1
+            raise AdmissionRejected("queue full", 1)
+        self.processed.append((handle_id, text))
+        return f"got {text}\n\nwhat next?"
+
+    async def process_message(self, text: str, handle_id: str) -> str:
+        return self._turn(text, handle_id)
+
+    async def process_message_stream(self, text: str, handle_id: str):
+        for chunk in self._turn(text, handle_id).split(" "):
+            yield chunk + " "
+
+
+class Outbox:
+    """Records sent messages; texts in `failing` fail that many times before going out."""
+
+    def __init__(self):
+        self.sent: List[Tuple[str, str]] = []
+        self.failing: Dict[str, int] = {}
+
+    async def send_message(self, handle_id: str, text: str) -> bool:
+        if self.failing.get(text):
+            self.failing[text] -= 1
+            return False
+        self.sent.append((handle_id, text))
+        return True
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    outbox = Outbox()
+    monkeypatch.setattr(imessage_agent.iMessageClient, "send_message", outbox.send_message)
+    return outbox
+
+
+def start_conversations(path: str) -> None:
+    """Track every handle in the database with its watermark on its latest message."""
+    with sqlite3.connect(path) as db:
+        rows = db.execute(
+            "SELECT h.id, max(m.ROWID) FROM message AS m JOIN handle AS h ON m.handle_id = h.ROWID GROUP BY h.id"
+        ).fetchall()
+    for handle_id, last_rowid in rows:
+        imessage_agent.conversations[handle_id] = {"last_rowid": last_rowid, "last_message_time": None}
+
+
+async def tick(dispatcher: imessage_agent.ConversationDispatcher) -> None:
+    """One poll of ongoing conversations, waiting until every reply is done."""
+    await imessage_agent.handle_ongoing_conversations(dispatcher)
+    await dispatcher.join()
+
+
+def test_each_message_is_answered_once_across_ticks(chat_db, outbox):
+    start_conversations(chat_db)
+    first, second = handle_ids(2)
+    agent = ScriptedAgent()
+
+    async def scenario():
+        dispatcher = imessage_agent.ConversationDispatcher(agent)
+        rowids = add_incoming(chat_db, [1, 2], "hi")
+        await tick(dispatcher)
+        assert sorted(agent.processed) == [(first, "hi"), (second, "hi")]
+        assert imessage_agent.conversations[first]["last_rowid"] == rowids[0]
+        assert imessage_agent.conversations[second]["last_rowid"] == rowids[1]
+
+        # Nothing new: nothing is processed or sent again
+        sent = len(outbox.sent)
+        await tick(dispatcher)
+        assert len(agent.processed) == 2 and len(outbox.sent) == sent
+
+        # Two more from one handle are answered in order
+        add_incoming(chat_db, [1], "one")
+        add_incoming(chat_db, [1], "two")
+        await tick(dispatcher)
+        await tick(dispatcher)
+        assert agent.processed[2:] == [(first, "one"), (first, "two")]
+        assert [text for handle_id, text in outbox.sent if handle_id == first] == [
+            "got hi", "what next?", "got one", "what next?", "got two", "what next?",
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_unsent_reply_is_resent_without_processing_the_message_again(chat_db, outbox):
+    start_conversations(chat_db)
+    handle_id = handle_ids(1)[0]
+    agent = ScriptedAgent()
+    outbox.failing["got hi"] = 1
+
+    async def scenario():
+        dispatcher = imessage_agent.ConversationDispatcher(agent)
+        rowid = add_incoming(chat_db, [1], "hi")[0]
+        await tick(dispatcher)
+        # The turn is recorded and the watermark moves on, but nothing went out out of order
+        assert imessage_agent.conversations[handle_id]["last_rowid"] == rowid
+        assert outbox.sent == []
+        assert dispatcher.undelivered_handles() == [handle_id]
+
+        await tick(dispatcher)
+        assert outbox.sent == [(handle_id, "got hi"), (handle_id, "what next?")]
+        assert agent.processed == [(handle_id, "hi")]
+        assert dispatcher.undelivered_handles() == []
+
+    asyncio.run(scenario())
+
+
+def test_unsendable_reply_is_dropped_after_its_attempts(chat_db, outbox, monkeypatch):
+    monkeypatch.setenv("IMESSAGE_SEND_ATTEMPTS", "3")
+    monkeypatch.setattr(imessage_agent, "STREAM_REPLIES", False)
+    start_conversations(chat_db)
+    handle_id = handle_ids(1)[0]
+    agent = ScriptedAgent()
+    outbox.failing["got hi\n\nwhat next?"] = 10
+
+    async def scenario():
+        dispatcher = imessage_agent.ConversationDispatcher(agent)
+        add_incoming(chat_db, [1], "hi")
+        for _ in range(3):
+            await tick(dispatcher)
+        assert dispatcher.undelivered_handles() == []
+
+        # The conversation carries on with the next message
+        add_incoming(chat_db, [1], "still there?")
+        await tick(dispatcher)
+        assert agent.processed == [(handle_id, "hi"), (handle_id, "still there?")]
+        assert outbox.sent == [(handle_id, "got still there?\n\nwhat next?")]
+
+    asyncio.run(scenario())
+
+
+def test_deferred_message_keeps_its_watermark(chat_db, outbox):
+    start_conversations(chat_db)
+    handle_id = handle_ids(1)[0]
+    watermark = imessage_agent.conversations[handle_id]["last_rowid"]
+    agent = ScriptedAgent()
+    agent.reject = 1
+
+    async def scenario():
+        dispatcher = imessage_agent.ConversationDispatcher(agent)
+        rowid = add_incoming(chat_db, [1], "hi")[0]
+        await tick(dispatcher)
+        assert imessage_agent.conversations[handle_id]["last_rowid"] == watermark
+        assert outbox.sent == []
+
+        await tick(dispatcher)
+        assert imessage_agent.conversations[handle_id]["last_rowid"] == rowid
+        assert agent.processed == [(handle_id, "hi")]
+
+    asyncio.run(scenario())
+
+
+def test_greeting_starts_one_conversation(chat_db, outbox):
+    agent = ScriptedAgent()
+
+    async def scenario():
+        # The fixture's greetings all start conversations on the first poll
+        await imessage_agent.handle_new_conversations(agent)
+        assert sorted(imessage_agent.conversations) == handle_ids(4)
+        welcomed = len(outbox.sent)
+
+        # A handle greeting again is not welcomed twice
+        add_incoming(chat_db, [1], GREETING)
+        await imessage_agent.handle_new_conversations(agent)
+        assert len(outbox.sent) == welcomed == 4
+        assert len(agent.processed) == 4
+
+    asyncio.run(scenario())
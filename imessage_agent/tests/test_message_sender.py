@@ -0,0 +1,77 @@
+"""MessageSender against the osascript stand-in: per-message results and worker restarts."""
+
+import asyncio
+import json
+import signal
+
+import imessage_agent
+
+
+def sent_texts(log) -> list:
+    return [json.loads(line)["text"] for line in log.read_text().splitlines()] if log.exists() else []
+
+
+def test_rejected_message_fails_alone(osascript, monkeypatch):
+    monkeypatch.setenv("OSASCRIPT_STUB_FAIL", "undeliverable")
+
+    async def scenario():
+        sender = imessage_agent.MessageSender(mode="worker")
+        texts = ["first", "undeliverable one", "third"]
+        results = await asyncio.gather(*(sender.send("+15550000000", text) for text in texts))
+        await sender.close()
+        return sender, results
+
+    sender, results = asyncio.run(scenario())
+    assert results == [True, False, True]
+    assert sent_texts(osascript) == ["first", "third"]
+    # A rejected message is the worker's answer, not a reason to restart it
+    assert sender.spawns == 1
+    assert (sender.sent, sender.failed) == (2, 1)
+
+
+def test_worker_restarts_after_it_exits(osascript):
+    async def scenario():
+        sender = imessage_agent.MessageSender(mode="worker")
+        assert await sender.send("+15550000000", "before")
+        sender._process.kill()
+        await sender._process.wait()
+        assert await sender.send("+15550000000", "after")
+        await sender.close()
+        return sender
+
+    sender = asyncio.run(scenario())
+    assert sender.spawns == 2
+    assert sent_texts(osascript) == ["before", "after"]
+
+
+def test_worker_that_stops_answering_is_replaced(osascript, monkeypatch):
+    monkeypatch.setenv("IMESSAGE_SEND_TIMEOUT", "0.5")
+
+    async def scenario():
+        sender = imessage_agent.MessageSender(mode="worker")
+        assert await sender.send("+15550000000", "before")
+        # A hung worker: alive, but never reads its next request
+        sender._process.send_signal(signal.SIGSTOP)
+        hung = sender._process
+        assert not await sender.send("+15550000000", "lost")
+        assert await sender.send("+15550000000", "after")
+        await sender.close()
+        return sender, hung
+
+    sender, hung = asyncio.run(scenario())
+    assert hung.returncode is not None
+    assert sender.spawns == 2
+    assert sent_texts(osascript) == ["before", "after"]
+
+
+def test_script_mode_reports_each_message(osascript, monkeypatch):
+    monkeypatch.setenv("OSASCRIPT_STUB_FAIL", "undeliverable")
+
+    async def scenario():
+        sender = imessage_agent.MessageSender(mode="script")
+        results = await asyncio.gather(*(sender.send("+15550000000", text) for text in ["ok", "undeliverable"]))
+        await sender.close()
+        return results
+
+    assert asyncio.run(scenario()) == [True, False]
+    assert sent_texts(osascript) == ["ok"]